@@ -0,0 +1,134 @@
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework import status
+from rest_framework.response import Response
+
+HEADER = "Idempotency-Key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+KEY_PREFIX = "idempotency"
+MAX_KEY_LENGTH = 255
+POLL_INTERVAL = 0.05
+
+
+def cache_keys(user_id, key):
+    """The stored response and in-flight lock keys for a user's key."""
+    digest = hashlib.sha256(key.encode()).hexdigest()
+    return (
+        f"{KEY_PREFIX}:entry:{user_id}:{digest}",
+        f"{KEY_PREFIX}:lock:{user_id}:{digest}",
+    )
+
+
+def request_fingerprint(request):
+    """Hash of what the key was first used for, to reject reuse on another call."""
+    digest = hashlib.sha256()
+    digest.update(request.method.encode())
+    digest.update(request.get_full_path().encode())
+    digest.update(request.body)
+    return digest.hexdigest()
+
+
+def _replay(entry, fingerprint):
+    if entry["fingerprint"] != fingerprint:
+        return Response(
+            {"detail": f"{HEADER} was already used for a different request."},
+            status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+        )
+    return Response(
+        entry["data"], status=entry["status"], headers={REPLAYED_HEADER: "true"}
+    )
+
+
+def _wait_for_entry(entry_key, lock_key):
+    deadline = time.monotonic() + settings.IDEMPOTENCY_LOCK_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(POLL_INTERVAL)
+        entry = cache.get(entry_key)
+        if entry is not None or cache.get(lock_key) is None:
+            return entry
+    return None
+
+
+def idempotent(view_method):
+    """
+    Makes a view method safe to retry with an `Idempotency-Key` header.
+
+    The first successful response for a key is stored in the cache (Redis in
+    production) once the request transaction commits, and retries with the
+    same key get it back with an `Idempotent-Replayed` header instead of
+    running the view again. While the first request is in flight, duplicates
+    hold on a short lock and then replay its response, or get a 409 if it
+    takes longer than `IDEMPOTENCY_LOCK_WAIT`. Errors are not stored, so a
+    failed request can be retried with the same key.
+
+    Keys are scoped per user. Reusing one for a different method, path or
+    body is rejected with a 422. Requests without the header are not
+    affected.
+    """
+
+    @wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        if not key:
+            return view_method(self, request, *args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return Response(
+                {"detail": f"{HEADER} must be at most {MAX_KEY_LENGTH} characters."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        fingerprint = request_fingerprint(request)
+        entry_key, lock_key = cache_keys(request.user.pk, key)
+        entry = cache.get(entry_key)
+        if entry is not None:
+            return _replay(entry, fingerprint)
+
+        acquired = cache.add(lock_key, fingerprint, settings.IDEMPOTENCY_LOCK_TIMEOUT)
+        if acquired is None:
+            # the cache swallowed an error (django-redis IGNORE_EXCEPTIONS),
+            # serve the request rather than failing checkout
+            return view_method(self, request, *args, **kwargs)
+        if not acquired:
+            entry = _wait_for_entry(entry_key, lock_key)
+            if entry is None:
+                return Response(
+                    {"detail": f"A request with this {HEADER} is in progress."},
+                    status=status.HTTP_409_CONFLICT,
+                )
+            return _replay(entry, fingerprint)
+
+        # stored by a request that released the lock since our first read
+        entry = cache.get(entry_key)
+        if entry is not None:
+            cache.delete(lock_key)
+            return _replay(entry, fingerprint)
+
+        try:
+            response = view_method(self, request, *args, **kwargs)
+        except BaseException:
+            cache.delete(lock_key)
+            raise
+        if not status.is_success(response.status_code):
+            cache.delete(lock_key)
+            return response
+
+        entry = {
+            "fingerprint": fingerprint,
+            "status": response.status_code,
+            "data": response.data,
+        }
+
+        def store():
+            cache.set(entry_key, entry, settings.IDEMPOTENCY_KEY_TTL)
+            cache.delete(lock_key)
+
+        # a rolled back transaction drops the callback and the lock expires
+        transaction.on_commit(store)
+        return response
+
+    return wrapper
@@ -39,4 +39,4 @@ class RequestIDMiddleware(MiddlewareMixin):
         # Calculate duration in milliseconds
         duration_ms = (time.time() - start_time) * 1000
         duration_ctx.set(str(round(duration_ms, 2)))
-        return super().__call__(request)
+        return response
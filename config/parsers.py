@@ -0,0 +1,34 @@
+import codecs
+import re
+from io import BytesIO
+
+import orjson
+from django.conf import settings
+from rest_framework.parsers import JSONParser
+
+# orjson turns integers beyond 64 bits into floats, json keeps them exact
+LONG_NUMBER = re.compile(rb"\d{20}")
+
+
+class ORJSONParser(JSONParser):
+    """
+    JSONParser backed by orjson for UTF-8 bodies.
+
+    Other charsets, bodies with integers beyond 64 bits and anything orjson
+    rejects (invalid JSON, NaN) go through the stdlib parser, so results and
+    error messages stay the same as JSONParser's.
+    """
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get("encoding", settings.DEFAULT_CHARSET)
+        if codecs.lookup(encoding).name != "utf-8":
+            return super().parse(stream, media_type, parser_context)
+
+        body = stream.read()
+        if LONG_NUMBER.search(body):
+            return super().parse(BytesIO(body), media_type, parser_context)
+        try:
+            return orjson.loads(body)
+        except orjson.JSONDecodeError:
+            return super().parse(BytesIO(body), media_type, parser_context)
@@ -0,0 +1,49 @@
+import orjson
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+# orjson serializes these natively, DRF's JSONEncoder formats them differently
+# (e.g. datetimes are cut to milliseconds), so they go through `default`
+ORJSON_OPTIONS = (
+    orjson.OPT_PASSTHROUGH_DATETIME
+    | orjson.OPT_PASSTHROUGH_DATACLASS
+    | orjson.OPT_NON_STR_KEYS
+)
+
+
+class ORJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer backed by orjson, with byte-identical output.
+
+    Types orjson can't or shouldn't encode itself (Decimal, datetimes, lazy
+    strings, querysets...) are handed to DRF's JSONEncoder, like the stdlib
+    renderer does. Indented output (the browsable API) and anything orjson
+    rejects, such as integers beyond 64 bits, fall back to the stdlib
+    renderer. The one difference: NaN and infinities render as null instead
+    of raising under STRICT_JSON.
+    """
+
+    encoder = JSONEncoder()
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        renderer_context = renderer_context or {}
+        if (
+            self.get_indent(accepted_media_type, renderer_context)
+            or self.ensure_ascii
+            or not self.compact
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(
+                data, default=self.encoder.default, option=ORJSON_OPTIONS
+            )
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        # same escaping as JSONRenderer, these break JavaScript string literals
+        if b"\xe2\x80\xa8" in ret or b"\xe2\x80\xa9" in ret:
+            ret = ret.replace(b"\xe2\x80\xa8", b"\\u2028").replace(
+                b"\xe2\x80\xa9", b"\\u2029"
+            )
+        return ret
@@ -4,6 +4,7 @@
 from pathlib import Path
 
 import environ
+from corsheaders.defaults import default_headers
 from datetime import timedelta
 import logging
 from concurrent_log_handler import ConcurrentRotatingFileHandler
@@ -75,6 +76,7 @@ DJANGO_APPS = [
     "django.contrib.staticfiles",
     # "django.contrib.humanize", # Handy template tags
     "django.contrib.admin",
+    "django.contrib.postgres",
     "django.forms",
 ]
 THIRD_PARTY_APPS = [
@@ -400,12 +402,22 @@ REST_FRAMEWORK = {
     "DEFAULT_PERMISSION_CLASSES": (
         "rest_framework.permissions.IsAuthenticatedOrReadOnly",
     ),
+    "DEFAULT_RENDERER_CLASSES": (
+        "config.renderers.ORJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ),
+    "DEFAULT_PARSER_CLASSES": (
+        "config.parsers.ORJSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    ),
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
     "DEFAULT_FILTER_BACKENDS": ("django_filters.rest_framework.DjangoFilterBackend",),
 }
 
 # django-cors-headers - https://github.com/adamchainz/django-cors-headers#setup
 CORS_URLS_REGEX = r"^/api/.*$"
+CORS_ALLOW_HEADERS = (*default_headers, "idempotency-key")
 
 # By Default swagger ui is available only to admin user(s). You can change permission classes to change that
 # See more configuration options at https://drf-spectacular.readthedocs.io/en/latest/settings.html#settings
@@ -424,6 +436,67 @@ SIMPLE_JWT = {
     "REFRESH_TOKEN_LIFETIME": timedelta(days=10),
 }
 
+# Product catalog cache
+# ------------------------------------------------------------------------------
+PRODUCT_LIST_CACHE_TIMEOUT = env.int("PRODUCT_LIST_CACHE_TIMEOUT", default=60 * 5)
+CATEGORY_TREE_CACHE_TIMEOUT = env.int("CATEGORY_TREE_CACHE_TIMEOUT", default=60 * 60)
+
+# Order numbers
+# ------------------------------------------------------------------------------
+# e.g. ORD-261018-000042, the counter restarts every day unless DAILY is off.
+# The whole number must fit the 20 characters of order_number (check order.E001)
+ORDER_NUMBER_PREFIX = env("ORDER_NUMBER_PREFIX", default="ORD")
+ORDER_NUMBER_DAILY = env.bool("ORDER_NUMBER_DAILY", default=True)
+ORDER_NUMBER_DIGITS = env.int("ORDER_NUMBER_DIGITS", default=6)
+# closed orders older than this many whole months move to the archive table
+ORDER_ARCHIVE_KEEP_MONTHS = env.int("ORDER_ARCHIVE_KEEP_MONTHS", default=12)
+# pending orders unpaid and untouched for this many hours are cancelled and
+# their stock released by shopping.order.tasks.expire_unpaid_orders
+ORDER_PENDING_EXPIRY_HOURS = env.int("ORDER_PENDING_EXPIRY_HOURS", default=24)
+
+# Idempotency keys
+# ------------------------------------------------------------------------------
+# how long a response is replayed, and how long duplicates of an in-flight
+# request hold the lock / wait for it (seconds)
+IDEMPOTENCY_KEY_TTL = env.int("IDEMPOTENCY_KEY_TTL", default=60 * 60 * 24)
+IDEMPOTENCY_LOCK_TIMEOUT = env.int("IDEMPOTENCY_LOCK_TIMEOUT", default=30)
+IDEMPOTENCY_LOCK_WAIT = env.float("IDEMPOTENCY_LOCK_WAIT", default=5)
+
+# Cart store
+# ------------------------------------------------------------------------------
+# active carts live in Redis hashes and are written back to Postgres by
+# `manage.py flush_carts` and at checkout, the database is used when off.
+# Turning it on requires scheduling flush_carts (every minute or so)
+CART_STORE_ENABLED = env.bool("CART_STORE_ENABLED", default=False)
+# django-redis cache alias whose connection holds the carts
+CART_STORE_CACHE_ALIAS = env("CART_STORE_CACHE_ALIAS", default="default")
+# idle carts drop out of Redis after this many seconds
+CART_STORE_TTL = env.int("CART_STORE_TTL", default=60 * 60 * 24 * 7)
+# cart totals are cached per cart content for this many seconds
+CART_PRICING_TIMEOUT = env.int("CART_PRICING_TIMEOUT", default=60 * 60)
+# carts untouched for this many days are deleted by `manage.py sweep_carts`
+CART_ABANDONED_DAYS = env.int("CART_ABANDONED_DAYS", default=30)
+
+# Dashboard
+# ------------------------------------------------------------------------------
+# tables with more rows than this show the planner's estimate as their total
+DASHBOARD_EXACT_COUNT_LIMIT = env.int("DASHBOARD_EXACT_COUNT_LIMIT", default=100_000)
+# bulk writes with more rows than this run as a background job
+DASHBOARD_BULK_INLINE_ROWS = env.int("DASHBOARD_BULK_INLINE_ROWS", default=1000)
+DASHBOARD_BULK_MAX_ROWS = env.int("DASHBOARD_BULK_MAX_ROWS", default=50_000)
+# how long a background job's progress and report can be polled (seconds)
+DASHBOARD_BULK_JOB_TTL = env.int("DASHBOARD_BULK_JOB_TTL", default=60 * 60 * 24)
+# background threads running the jobs, 0 runs them inline
+DASHBOARD_BULK_WORKERS = env.int("DASHBOARD_BULK_WORKERS", default=1)
+# a queued or running job whose process stopped refreshing it for this long
+# is reported failed (seconds)
+DASHBOARD_BULK_JOB_STALE = env.int("DASHBOARD_BULK_JOB_STALE", default=60 * 15)
+
+# Product search
+# ------------------------------------------------------------------------------
+# https://www.postgresql.org/docs/current/textsearch-configuration.html
+PRODUCT_SEARCH_CONFIG = env("PRODUCT_SEARCH_CONFIG", default="english")
+
 # File Storage
 # ------------------------------------------------------------------------------
 STORAGES = {
@@ -474,6 +547,24 @@ MINIO_STORAGE_STATIC_URL = (
     f"{MINIO_STORAGE_ENDPOINT}/{MINIO_STORAGE_STATIC_BUCKET_NAME}/"
 )
 
+# Image derivatives (shopping/product/images.py)
+# Widths the thumbnails are generated at, each as WebP and JPEG
+IMAGE_DERIVATIVE_WIDTHS = env.list(
+    "IMAGE_DERIVATIVE_WIDTHS", cast=int, default=[160, 320, 640, 1280]
+)
+# Background threads generating them after upload, 0 generates inline
+IMAGE_DERIVATIVE_WORKERS = env.int("IMAGE_DERIVATIVE_WORKERS", default=2)
+
+# Media URLs (shopping/product/media.py)
+# Public or CDN base that object keys are appended to without touching storage
+MEDIA_PUBLIC_URL = env("MEDIA_PUBLIC_URL", default=MINIO_STORAGE_MEDIA_URL)
+# Private buckets: serve presigned URLs, memoized per key for a TTL window
+MINIO_STORAGE_MEDIA_USE_PRESIGNED = env.bool(
+    "MINIO_STORAGE_MEDIA_USE_PRESIGNED", default=False
+)
+MEDIA_PRESIGNED_URL_TTL = env.int("MEDIA_PRESIGNED_URL_TTL", default=60 * 60)
+MEDIA_URL_CACHE_SIZE = env.int("MEDIA_URL_CACHE_SIZE", default=10_000)
+
 
 import sentry_sdk
 from sentry_sdk.integrations.django import DjangoIntegration
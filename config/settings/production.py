@@ -32,6 +32,13 @@ CACHES = {
     },
 }
 
+# Cart store
+# ------------------------------------------------------------------------------
+# off until `manage.py flush_carts` (or shopping.cart.tasks.flush_cart_store)
+# runs on a schedule well inside CART_STORE_TTL: otherwise carts only reach
+# Postgres at checkout and one that expires or is evicted from Redis is lost
+CART_STORE_ENABLED = env.bool("CART_STORE_ENABLED", default=False)
+
 # SECURITY
 # ------------------------------------------------------------------------------
 # https://docs.djangoproject.com/en/dev/ref/settings/#secure-proxy-ssl-header
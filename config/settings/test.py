@@ -34,5 +34,10 @@ TEMPLATES[0]["OPTIONS"]["debug"] = True  # type: ignore[index]
 # ------------------------------------------------------------------------------
 # https://docs.djangoproject.com/en/dev/ref/settings/#media-url
 MEDIA_URL = "http://media.testserver/"
+# generate image derivatives inline instead of in background threads
+IMAGE_DERIVATIVE_WORKERS = 0
+# and dashboard bulk jobs
+DASHBOARD_BULK_WORKERS = 0
+
 # Your stuff...
 # ------------------------------------------------------------------------------
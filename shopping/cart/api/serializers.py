@@ -3,6 +3,17 @@ from django.db import transaction
 from rest_framework.exceptions import APIException
 
 from shopping.cart.models import Cart, CartItem
+from shopping.cart.pricing import cart_pricing
+from shopping.cart.pricing import line_key
+from shopping.cart.services import CART_OPERATIONS
+from shopping.cart.services import MAX_CART_OPERATIONS
+from shopping.cart.services import CartOperationError
+from shopping.cart.services import CartStockError
+from shopping.cart.services import apply_cart_operations
+from shopping.cart.services import touch_cart
+from shopping.cart.store import add_to_cart
+from shopping.cart.store import cart_store_enabled
+from shopping.cart.store import read_cart
 from shopping.product.models import Product, ProductVariation
 from django.db.models import F
 from shopping.order.api.serializers import ProductSerializer
@@ -60,12 +71,30 @@ class CartItemCreateSerializer(serializers.ModelSerializer):
 
 
 class CartSerializer(serializers.ModelSerializer):
+    """The cart with line totals, subtotal, tax and total, see `cart_pricing`."""
+
     items = CartItemSerializer(many=True, read_only=True)
 
     class Meta:
         model = Cart
         exclude = ("user",)
 
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        pricing = cart_pricing(instance)
+        for item, row in zip(instance.items.all(), data["items"]):
+            line = pricing["lines"][line_key(item.product_id, item.variation_id)]
+            row["unit_price"] = _decimal(line["unit_price"])
+            row["line_total"] = _decimal(line["line_total"])
+        for field in ("subtotal", "tax_rate", "tax", "total"):
+            data[field] = _decimal(pricing[field])
+        return data
+
+
+def _decimal(value):
+    # rendered like the model DecimalFields
+    return None if value is None else str(value)
+
 
 class CartCreateSerializer(serializers.ModelSerializer):
     items = CartItemCreateSerializer(many=True)
@@ -117,7 +146,38 @@ class CartCreateSerializer(serializers.ModelSerializer):
                     )
         return cart
 
+    def update_store(self, instance, validated_data):
+        """
+        Applies the quantity changes to the cart store.
+
+        `instance` comes from `read_cart`, so stock is checked against the
+        stored quantities without touching CartItem.
+        """
+        quantities = {
+            (item.product_id, item.variation_id): item.quantity
+            for item in instance.items.all()
+        }
+        lines = []
+        for item in validated_data.pop("items", []):
+            product = item["product"]
+            variation = item.get("variation")
+            quantity = item["quantity"]
+            line = (product.pk, variation.pk if variation else None)
+
+            new_quantity = quantities.get(line, 0) + quantity
+            stock = variation.stock if variation else product.stock
+            if new_quantity > 0 and stock < new_quantity:
+                raise StockValidationError()
+            quantities[line] = new_quantity
+            lines.append((*line, quantity))
+
+        if lines:
+            add_to_cart(instance.user_id, lines)
+        return read_cart(instance.user_id)
+
     def update(self, instance, validated_data):
+        if cart_store_enabled():
+            return self.update_store(instance, validated_data)
         if "items" in validated_data:
             items_data = validated_data.pop("items")
             with transaction.atomic():
@@ -163,5 +223,31 @@ class CartCreateSerializer(serializers.ModelSerializer):
                                 cart=instance,
                                 quantity=quantity,
                             )
+                touch_cart(instance.pk)
 
         return instance
+
+
+class CartOperationSerializer(serializers.Serializer):
+    op = serializers.ChoiceField(choices=CART_OPERATIONS)
+    product = serializers.IntegerField()
+    variation = serializers.IntegerField()
+    quantity = serializers.IntegerField(min_value=0, max_value=32767)
+
+
+class CartBatchSerializer(serializers.Serializer):
+    operations = CartOperationSerializer(
+        many=True, allow_empty=False, max_length=MAX_CART_OPERATIONS
+    )
+
+    def create(self, validated_data):
+        operations = [
+            (item["op"], item["product"], item["variation"], item["quantity"])
+            for item in validated_data["operations"]
+        ]
+        try:
+            return apply_cart_operations(validated_data["user"].pk, operations)
+        except CartStockError as error:
+            raise StockValidationError() from error
+        except CartOperationError as error:
+            raise serializers.ValidationError({"operations": [str(error)]}) from error
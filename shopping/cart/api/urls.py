@@ -1,9 +1,11 @@
 from django.urls import path
 
 from shopping.cart.api.views import CartAPIView
+from shopping.cart.api.views import CartBatchAPIView
 
 app_name = "cart"
 
 urlpatterns = [
     path("", CartAPIView.as_view(), name="cart"),
+    path("batch/", CartBatchAPIView.as_view(), name="cart-batch"),
 ]
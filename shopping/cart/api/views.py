@@ -8,14 +8,19 @@ from rest_framework.views import APIView
 from django.db import transaction
 from django.shortcuts import get_object_or_404
 
+from config.idempotency import idempotent
 from shopping import cart
 from shopping.cart.api.serializers import (
+    CartBatchSerializer,
     CartSerializer,
     CartCreateSerializer,
     CartItemSerializer,
     CartItemCreateSerializer,
 )
 from shopping.cart.models import Cart, CartItem
+from shopping.cart.store import cart_store_enabled
+from shopping.cart.store import clear_cart
+from shopping.cart.store import read_cart
 
 
 class CartAPIView(generics.RetrieveUpdateDestroyAPIView):
@@ -23,6 +28,8 @@ class CartAPIView(generics.RetrieveUpdateDestroyAPIView):
     serializer_class = CartSerializer
 
     def get_object(self):
+        if cart_store_enabled():
+            return read_cart(self.request.user.pk)
         cart, _ = Cart.objects.get_or_create(user=self.request.user)
         cart = Cart.objects.prefetch_related(
             "items__product",
@@ -34,3 +41,37 @@ class CartAPIView(generics.RetrieveUpdateDestroyAPIView):
         if self.request.method in ["POST", "PUT", "PATCH"]:
             return CartCreateSerializer
         return CartSerializer
+
+    def perform_destroy(self, instance):
+        if cart_store_enabled():
+            clear_cart(instance.user_id)
+            Cart.objects.filter(user_id=instance.user_id).delete()
+            return
+        instance.delete()
+
+    @idempotent
+    def patch(self, request, *args, **kwargs):
+        return super().patch(request, *args, **kwargs)
+
+    @idempotent
+    def put(self, request, *args, **kwargs):
+        return super().put(request, *args, **kwargs)
+
+
+class CartBatchAPIView(generics.GenericAPIView):
+    """
+    Applies many `add`/`remove`/`set` operations to the cart at once and
+    returns the updated cart.
+    """
+
+    permission_classes = [IsAuthenticated]
+    serializer_class = CartBatchSerializer
+
+    @idempotent
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        cart = serializer.save(user=request.user)
+        return Response(
+            CartSerializer(cart, context=self.get_serializer_context()).data
+        )
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class CartConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "shopping.cart"
+
+    def ready(self):
+        from shopping.cart import signals
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+from django.core.management.base import CommandError
+
+from shopping.cart.store import cart_store_enabled
+from shopping.cart.store import flush_dirty_carts
+
+
+class Command(BaseCommand):
+    help = (
+        "Writes the carts changed in the Redis cart store back to Cart and "
+        "CartItem. Meant to run every minute or so."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Changed carts taken from the queue at a time.",
+        )
+
+    def handle(self, *args, **options):
+        if not cart_store_enabled():
+            raise CommandError("The cart store is off (CART_STORE_ENABLED).")
+        flushed = flush_dirty_carts(options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Flushed {flushed} carts"))
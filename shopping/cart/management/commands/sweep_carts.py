@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand
+
+from shopping.cart.sweeper import SWEEP_BATCH_SIZE
+from shopping.cart.sweeper import abandoned_carts
+from shopping.cart.sweeper import abandoned_cutoff
+from shopping.cart.sweeper import sweep_carts
+
+
+class Command(BaseCommand):
+    help = "Deletes the carts (and their items) nobody has touched for a while."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            help="Days a cart must be idle, defaults to CART_ABANDONED_DAYS.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=SWEEP_BATCH_SIZE,
+            help="Carts deleted per transaction.",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only count the carts that would be deleted.",
+        )
+
+    def handle(self, *args, **options):
+        cutoff = abandoned_cutoff(options["days"])
+        if options["dry_run"]:
+            count = abandoned_carts(cutoff).count()
+            self.stdout.write(f"{count} carts idle since before {cutoff} to delete")
+            return
+
+        metrics = sweep_carts(cutoff, options["batch_size"])
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Deleted {metrics['carts']} carts and {metrics['items']} items "
+                f"idle since before {cutoff} in {metrics['batches']} batches "
+                f"({metrics['seconds']}s)"
+            )
+        )
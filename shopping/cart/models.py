@@ -10,6 +10,12 @@ class Cart(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # finds the idle carts for the sweeper
+            models.Index(fields=["updated_at"], name="cart_updated_idx"),
+        ]
+
     def __str__(self):
         return f"Cart for {self.user.username}"
 
@@ -0,0 +1,124 @@
+import hashlib
+import json
+from collections import defaultdict
+from decimal import ROUND_HALF_UP
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Sum
+
+from shopping.accounting.models import Tax
+from shopping.order.services import unit_price
+from shopping.product.cache import current_versions
+from shopping.product.cache import product_scope
+
+KEY_PREFIX = "cart:pricing"
+# bumped when a Tax changes, see shopping.cart.signals
+TAX_SCOPE = "tax"
+CENT = Decimal("0.01")
+
+
+def pricing_key(user_id):
+    return f"{KEY_PREFIX}:{user_id}"
+
+
+def line_key(product_id, variation_id):
+    return f"{product_id}:{variation_id or 0}"
+
+
+def money(value):
+    return value.quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def content_hash(lines):
+    """
+    Digest of `(product_id, variation_id, quantity)` lines and everything
+    their price depends on.
+
+    Repeated lines are summed. The version of every product (bumped when
+    the product or one of its variations is saved) and of the taxes are
+    part of the digest, so a repricing changes it too.
+    """
+    lines = list(lines)
+    quantities = defaultdict(int)
+    for product_id, variation_id, quantity in lines:
+        quantities[line_key(product_id, variation_id)] += quantity
+    versions = current_versions(
+        {TAX_SCOPE, *(product_scope(product_id) for product_id, _, _ in lines)}
+    )
+    payload = json.dumps([sorted(quantities.items()), sorted(versions.items())])
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def tax_rate():
+    """The combined rate, in percent, of the active taxes."""
+    rate = Tax.objects.filter(is_active=True).aggregate(rate=Sum("rate"))["rate"]
+    return rate or Decimal(0)
+
+
+def price_items(items):
+    """
+    Prices cart items with their product and variation already loaded.
+
+    Returns the unit price and total of every line keyed by `line_key()`,
+    the subtotal, the tax on it and the total. A product without a price
+    has no line total and doesn't count in the subtotal.
+    """
+    lines = {}
+    subtotal = Decimal(0)
+    for item in items:
+        price = None
+        total = None
+        if item.product.discounted_price is not None:
+            price = unit_price(item.product, item.variation)
+            total = price * item.quantity
+            subtotal += total
+        lines[line_key(item.product_id, item.variation_id)] = {
+            "unit_price": price,
+            "line_total": total,
+        }
+    return {"lines": lines, **price_totals(subtotal)}
+
+
+def price_totals(subtotal):
+    """The subtotal, the tax of the active taxes on it and the total."""
+    rate = tax_rate()
+    tax = money(subtotal * rate / 100)
+    return {
+        "subtotal": money(subtotal),
+        "tax_rate": rate,
+        "tax": tax,
+        "total": money(subtotal) + tax,
+    }
+
+
+def cart_pricing(cart):
+    """
+    The pricing of `cart`, computed once per change of its content.
+
+    `cart.items` should be prefetched with their products and variations.
+    The result is cached per user under the cart's `content_hash()`.
+    """
+    items = list(cart.items.all())
+    digest = content_hash(
+        (item.product_id, item.variation_id, item.quantity) for item in items
+    )
+    key = pricing_key(cart.user_id)
+    cached = cache.get(key)
+    if cached is not None and cached["hash"] == digest:
+        return cached["pricing"]
+    pricing = price_items(items)
+    cache.set(key, {"hash": digest, "pricing": pricing}, settings.CART_PRICING_TIMEOUT)
+    return pricing
+
+
+def cached_pricing(user_id, lines):
+    """
+    The `cart_pricing()` of the cart of `user_id` if it was computed for
+    exactly `lines`, otherwise None.
+    """
+    cached = cache.get(pricing_key(user_id))
+    if cached is None or cached["hash"] != content_hash(lines):
+        return None
+    return cached["pricing"]
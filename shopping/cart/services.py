@@ -0,0 +1,152 @@
+from django.db import transaction
+from django.utils import timezone
+
+from shopping.cart.models import Cart
+from shopping.cart.models import CartItem
+from shopping.cart.store import cart_store_enabled
+from shopping.cart.store import read_cart
+from shopping.cart.store import update_cart
+from shopping.product.models import ProductVariation
+
+CART_OPERATIONS = ("add", "remove", "set")
+MAX_CART_OPERATIONS = 100
+
+
+class CartOperationError(Exception):
+    """An operation can't be applied, the message is safe to show to the client."""
+
+
+class CartStockError(CartOperationError):
+    pass
+
+
+def touch_cart(cart_id):
+    # line changes don't save the Cart, the sweeper goes by its updated_at
+    Cart.objects.filter(pk=cart_id).update(updated_at=timezone.now())
+
+
+def resolve_variations(operations):
+    """
+    The variations of `(op, product_id, variation_id, quantity)` operations.
+
+    Loaded with their products in one query, and each one must belong to
+    the product it is given with.
+    """
+    variations = ProductVariation.objects.select_related("product").in_bulk(
+        {variation_id for _, _, variation_id, _ in operations}
+    )
+    for _, product_id, variation_id, _ in operations:
+        variation = variations.get(variation_id)
+        if variation is None or variation.product_id != product_id:
+            raise CartOperationError(
+                f"Variation {variation_id} does not exist for product {product_id}"
+            )
+    return variations
+
+
+def fold_operations(current, operations):
+    """
+    Folds the operations, in order, into the changes to make per line.
+
+    `current` maps `(product_id, variation_id)` to the quantity in the cart.
+    Returns the increments of lines only added to or removed from, the
+    quantities of lines that were set (later adds count on top of the set
+    value), and the resulting quantity of every touched line.
+    """
+    changes = {}
+    for op, product_id, variation_id, quantity in operations:
+        line = (product_id, variation_id)
+        if op == "set":
+            changes[line] = ("set", quantity)
+            continue
+        kind, value = changes.get(line, ("add", 0))
+        changes[line] = (kind, value + (quantity if op == "add" else -quantity))
+
+    increments = []
+    quantities = []
+    result = {}
+    for line, (kind, value) in changes.items():
+        if kind == "set":
+            quantities.append((*line, value))
+            result[line] = value
+        else:
+            increments.append((*line, value))
+            result[line] = current.get(line, 0) + value
+    return increments, quantities, result
+
+
+def _check_stock(result, variations):
+    for (_, variation_id), quantity in result.items():
+        stock = variations[variation_id].stock
+        if quantity > 0 and stock < quantity:
+            raise CartStockError(
+                f"Not enough stock for variation {variation_id}. "
+                f"Available: {stock}, Requested: {quantity}"
+            )
+
+
+def apply_cart_operations(user_id, operations):
+    """
+    Applies a batch of `(op, product_id, variation_id, quantity)` operations
+    to the cart of `user_id` and returns the updated cart.
+
+    `add` and `remove` change a line by `quantity` and `set` replaces it,
+    a line at zero or below is removed. Either every operation is applied
+    or none is. Variations are resolved in one query and the lines are
+    written with one bulk insert, one bulk update and one delete, or in
+    two Redis round trips when the cart store is on.
+    """
+    variations = resolve_variations(operations)
+
+    if cart_store_enabled():
+        cart = read_cart(user_id)
+        current = {
+            (item.product_id, item.variation_id): item.quantity
+            for item in cart.items.all()
+        }
+        increments, quantities, result = fold_operations(current, operations)
+        _check_stock(result, variations)
+        update_cart(user_id, increments, quantities)
+        return read_cart(user_id)
+
+    with transaction.atomic():
+        cart, _ = Cart.objects.get_or_create(user_id=user_id)
+        existing = {
+            (item.product_id, item.variation_id): item
+            for item in CartItem.objects.filter(cart=cart).select_for_update()
+        }
+        current = {line: item.quantity for line, item in existing.items()}
+        _, _, result = fold_operations(current, operations)
+        _check_stock(result, variations)
+
+        created = []
+        updated = []
+        removed = []
+        for (product_id, variation_id), quantity in result.items():
+            item = existing.get((product_id, variation_id))
+            if item is None:
+                if quantity > 0:
+                    created.append(
+                        CartItem(
+                            cart=cart,
+                            product_id=product_id,
+                            variation_id=variation_id,
+                            quantity=quantity,
+                        )
+                    )
+            elif quantity <= 0:
+                removed.append(item.pk)
+            elif quantity != item.quantity:
+                item.quantity = quantity
+                updated.append(item)
+
+        CartItem.objects.bulk_create(created)
+        CartItem.objects.bulk_update(updated, ["quantity"])
+        if removed:
+            CartItem.objects.filter(pk__in=removed).delete()
+        touch_cart(cart.pk)
+
+    return Cart.objects.prefetch_related(
+        "items__product",
+        "items__variation__attribute__attribute_type",
+    ).get(pk=cart.pk)
@@ -0,0 +1,15 @@
+from django.db import transaction
+from django.db.models.signals import post_delete
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from shopping.accounting.models import Tax
+from shopping.cart.pricing import TAX_SCOPE
+from shopping.product.cache import bump_versions
+
+
+@receiver(post_save, sender=Tax)
+@receiver(post_delete, sender=Tax)
+def invalidate_cart_pricing(sender, instance, **kwargs):
+    # every cached cart pricing includes the tax version in its hash
+    transaction.on_commit(lambda: bump_versions(TAX_SCOPE))
@@ -0,0 +1,274 @@
+from datetime import datetime
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django_redis import get_redis_connection
+
+from shopping.cart.models import Cart
+from shopping.cart.models import CartItem
+from shopping.product.models import Product
+from shopping.product.models import ProductVariation
+
+KEY_PREFIX = "cart"
+DIRTY_KEY = f"{KEY_PREFIX}:dirty"
+# hash fields: `q:<product>:<variation>` quantities, `i:<product>:<variation>`
+# CartItem ids once persisted, and the cart row metadata below
+WARM_FIELD = "_warm"
+ID_FIELD = "_id"
+CREATED_FIELD = "_created"
+UPDATED_FIELD = "_updated"
+
+
+def cart_store_enabled():
+    return settings.CART_STORE_ENABLED
+
+
+def get_client():
+    return get_redis_connection(settings.CART_STORE_CACHE_ALIAS)
+
+
+def cart_key(user_id):
+    return f"{KEY_PREFIX}:{user_id}"
+
+
+def _line(product_id, variation_id):
+    return f"{product_id}:{variation_id or 0}"
+
+
+def _parse_line(line):
+    product_id, variation_id = line.split(":")
+    return int(product_id), int(variation_id) or None
+
+
+def _decode(raw):
+    return {key.decode(): value.decode() for key, value in raw.items()}
+
+
+def _lines(fields, prefix):
+    return {
+        _parse_line(field[len(prefix) :]): int(value)
+        for field, value in fields.items()
+        if field.startswith(prefix)
+    }
+
+
+def warm_cart(user_id, client=None):
+    """
+    The raw cart hash of `user_id`, loaded from the database on a miss.
+
+    Fields are written with HSETNX so a change made while another request
+    warms the same cart is never overwritten. Reads refresh the TTL.
+    """
+    client = client or get_client()
+    key = cart_key(user_id)
+    fields = _decode(client.hgetall(key))
+    if WARM_FIELD in fields:
+        client.expire(key, settings.CART_STORE_TTL)
+        return fields
+
+    # the row is created up front (once per user) so the cart keeps one id
+    cart = Cart.objects.filter(user_id=user_id).order_by("id").first()
+    if cart is None:
+        cart = Cart.objects.create(user_id=user_id)
+    mapping = {
+        WARM_FIELD: "1",
+        ID_FIELD: cart.pk,
+        CREATED_FIELD: cart.created_at.isoformat(),
+        UPDATED_FIELD: cart.updated_at.isoformat(),
+    }
+    for pk, product_id, variation_id, quantity in cart.items.values_list(
+        "pk", "product_id", "variation_id", "quantity"
+    ):
+        mapping[f"q:{_line(product_id, variation_id)}"] = quantity
+        mapping[f"i:{_line(product_id, variation_id)}"] = pk
+
+    pipe = client.pipeline()
+    for field, value in mapping.items():
+        pipe.hsetnx(key, field, value)
+    pipe.expire(key, settings.CART_STORE_TTL)
+    pipe.hgetall(key)
+    return _decode(pipe.execute()[-1])
+
+
+def cart_quantities(fields):
+    """`{(product_id, variation_id): quantity}` of a raw cart hash."""
+    return _lines(fields, "q:")
+
+
+def read_cart(user_id, client=None):
+    """
+    The cart of `user_id` served from the store.
+
+    Returns a Cart whose `items.all()` are CartItems built from the hash,
+    with products and variations resolved in one query each.
+    """
+    fields = warm_cart(user_id, client)
+    quantities = cart_quantities(fields)
+    item_ids = _lines(fields, "i:")
+    products = Product.objects.in_bulk({product for product, _ in quantities})
+    variations = ProductVariation.objects.select_related(
+        "attribute__attribute_type"
+    ).in_bulk({variation for _, variation in quantities if variation})
+
+    cart = Cart(
+        id=int(fields[ID_FIELD]),
+        user_id=user_id,
+        created_at=_datetime(fields.get(CREATED_FIELD)),
+        updated_at=_datetime(fields.get(UPDATED_FIELD)),
+    )
+    items = [
+        CartItem(
+            id=item_ids.get(line),
+            cart=cart,
+            product=products[line[0]],
+            variation=variations.get(line[1]),
+            quantity=quantity,
+        )
+        for line, quantity in sorted(quantities.items())
+        if line[0] in products
+    ]
+    # served through the related manager, like a prefetch
+    cart._prefetched_objects_cache = {"items": items}
+    return cart
+
+
+def _datetime(value):
+    return datetime.fromisoformat(value) if value else None
+
+
+def add_to_cart(user_id, lines, client=None):
+    """
+    Applies `(product_id, variation_id, delta)` lines to the stored cart.
+
+    Quantities move with HINCRBY so concurrent adds never overwrite each
+    other, and lines that drop to zero or below are removed. The cart is
+    queued for `flush_cart`.
+    """
+    update_cart(user_id, increments=lines, client=client)
+
+
+def update_cart(user_id, increments=(), quantities=(), client=None):
+    """
+    `add_to_cart` that also takes `(product_id, variation_id, quantity)`
+    lines to set outright, all in two round trips.
+    """
+    client = client or get_client()
+    key = cart_key(user_id)
+    warm_cart(user_id, client)
+
+    pipe = client.pipeline()
+    fields = [
+        _line(product_id, variation_id) for product_id, variation_id, _ in increments
+    ]
+    for field, (_, _, delta) in zip(fields, increments):
+        pipe.hincrby(key, f"q:{field}", delta)
+    for product_id, variation_id, quantity in quantities:
+        if quantity > 0:
+            pipe.hset(key, f"q:{_line(product_id, variation_id)}", quantity)
+    results = pipe.execute()[: len(fields)]
+
+    pipe = client.pipeline()
+    for field, quantity in zip(fields, results):
+        if quantity <= 0:
+            pipe.hdel(key, f"q:{field}")
+    for product_id, variation_id, quantity in quantities:
+        if quantity <= 0:
+            pipe.hdel(key, f"q:{_line(product_id, variation_id)}")
+    _touch(pipe, user_id)
+    pipe.execute()
+
+
+def _touch(pipe, user_id):
+    key = cart_key(user_id)
+    pipe.hset(key, UPDATED_FIELD, timezone.now().isoformat())
+    pipe.expire(key, settings.CART_STORE_TTL)
+    pipe.sadd(DIRTY_KEY, user_id)
+
+
+def clear_cart(user_id, client=None):
+    client = client or get_client()
+    pipe = client.pipeline()
+    pipe.delete(cart_key(user_id))
+    pipe.srem(DIRTY_KEY, user_id)
+    pipe.execute()
+
+
+def stored_cart_users(user_ids, client=None):
+    """The users among `user_ids` whose cart is held in the store."""
+    client = client or get_client()
+    pipe = client.pipeline()
+    for user_id in user_ids:
+        pipe.exists(cart_key(user_id))
+    return {user_id for user_id, held in zip(user_ids, pipe.execute()) if held}
+
+
+def flush_cart(user_id, client=None):
+    """
+    Writes the stored cart of `user_id` back to Cart/CartItem.
+
+    One transaction with a bulk insert, a bulk update and a single delete,
+    whatever the number of lines. Changes made while it runs queue the cart
+    again.
+    """
+    client = client or get_client()
+    key = cart_key(user_id)
+    client.srem(DIRTY_KEY, user_id)
+    fields = _decode(client.hgetall(key))
+    if WARM_FIELD not in fields:
+        return None
+    quantities = cart_quantities(fields)
+
+    with transaction.atomic():
+        cart = None
+        if ID_FIELD in fields:
+            cart = Cart.objects.filter(pk=fields[ID_FIELD], user_id=user_id).first()
+        if cart is None:
+            cart = Cart.objects.create(user_id=user_id)
+        existing = {
+            (item.product_id, item.variation_id): item
+            for item in CartItem.objects.filter(cart=cart)
+        }
+        created = [
+            CartItem(
+                cart=cart,
+                product_id=product_id,
+                variation_id=variation_id,
+                quantity=quantity,
+            )
+            for (product_id, variation_id), quantity in quantities.items()
+            if (product_id, variation_id) not in existing
+        ]
+        updated = []
+        for line, item in existing.items():
+            if line in quantities and item.quantity != quantities[line]:
+                item.quantity = quantities[line]
+                updated.append(item)
+        removed = {
+            line: item.pk for line, item in existing.items() if line not in quantities
+        }
+
+        CartItem.objects.bulk_create(created)
+        CartItem.objects.bulk_update(updated, ["quantity"])
+        CartItem.objects.filter(pk__in=removed.values()).delete()
+        Cart.objects.filter(pk=cart.pk).update(updated_at=timezone.now())
+
+    pipe = client.pipeline()
+    pipe.hset(key, ID_FIELD, cart.pk)
+    for item in created:
+        pipe.hset(key, f"i:{_line(item.product_id, item.variation_id)}", item.pk)
+    for line in removed:
+        pipe.hdel(key, f"i:{_line(*line)}")
+    pipe.execute()
+    return cart
+
+
+def flush_dirty_carts(batch_size=500, client=None):
+    """Flushes every queued cart, returns how many were written."""
+    client = client or get_client()
+    flushed = 0
+    while user_ids := client.spop(DIRTY_KEY, batch_size):
+        for user_id in user_ids:
+            flush_cart(int(user_id), client)
+            flushed += 1
+    return flushed
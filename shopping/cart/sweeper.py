@@ -0,0 +1,100 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection
+from django.db import transaction
+from django.utils import timezone
+
+from shopping.cart.models import Cart
+from shopping.cart.models import CartItem
+from shopping.cart.store import cart_store_enabled
+from shopping.cart.store import flush_dirty_carts
+from shopping.cart.store import stored_cart_users
+
+SWEEP_BATCH_SIZE = 1000
+
+
+def abandoned_cutoff(days=None, now=None):
+    """Carts last touched before this are abandoned."""
+    if days is None:
+        days = settings.CART_ABANDONED_DAYS
+    return (now or timezone.now()) - timedelta(days=days)
+
+
+def abandoned_carts(cutoff):
+    # carts written before carts were touched on every change may have
+    # newer lines than their own updated_at
+    return Cart.objects.filter(updated_at__lt=cutoff).exclude(
+        items__updated_at__gte=cutoff
+    )
+
+
+def sweep_batch(cutoff, batch_size=SWEEP_BATCH_SIZE):
+    """
+    Deletes up to `batch_size` abandoned carts and their lines.
+
+    One short transaction: the carts are picked off `cart_updated_idx` and
+    locked, skipping any a request holds, then their lines go with them.
+    With the cart store on, carts still held in Redis are in use whatever
+    their `updated_at` says; they are touched and kept instead. Returns
+    `(carts, items, kept)`.
+    """
+    cart_table = connection.ops.quote_name(Cart._meta.db_table)
+    item_table = connection.ops.quote_name(CartItem._meta.db_table)
+    where = (
+        f"FROM {cart_table} WHERE updated_at < %s "
+        f"AND NOT EXISTS (SELECT 1 FROM {item_table} "
+        f"WHERE cart_id = {cart_table}.id AND updated_at >= %s) "
+        "ORDER BY updated_at LIMIT %s FOR UPDATE SKIP LOCKED"
+    )
+    with transaction.atomic(), connection.cursor() as cursor:
+        kept = []
+        if cart_store_enabled():
+            cursor.execute(f"SELECT id, user_id {where}", [cutoff, cutoff, batch_size])
+            rows = cursor.fetchall()
+            live = stored_cart_users([user_id for _, user_id in rows])
+            kept = [pk for pk, user_id in rows if user_id in live]
+            ids = [pk for pk, user_id in rows if user_id not in live]
+            if kept:
+                Cart.objects.filter(pk__in=kept).update(updated_at=timezone.now())
+            cursor.execute(f"DELETE FROM {cart_table} WHERE id = ANY(%s)", [ids])
+        else:
+            # the cart_id foreign key is only checked at commit, by which
+            # time the lines are gone too
+            cursor.execute(
+                f"DELETE FROM {cart_table} WHERE id IN (SELECT id {where}) "
+                "RETURNING id",
+                [cutoff, cutoff, batch_size],
+            )
+            ids = [row[0] for row in cursor.fetchall()]
+        if not ids:
+            return 0, 0, len(kept)
+        cursor.execute(f"DELETE FROM {item_table} WHERE cart_id = ANY(%s)", [ids])
+        return len(ids), cursor.rowcount, len(kept)
+
+
+def sweep_carts(cutoff=None, batch_size=SWEEP_BATCH_SIZE):
+    """
+    Deletes every cart abandoned before `cutoff`, one batch at a time.
+
+    With the cart store on, pending changes are flushed first so no cart
+    is judged by a stale `updated_at`. Returns the run's metrics: carts and
+    items reclaimed, carts kept because they are in the store, batches and
+    seconds taken.
+    """
+    cutoff = cutoff or abandoned_cutoff()
+    started = time.monotonic()
+    if cart_store_enabled():
+        flush_dirty_carts()
+    metrics = {"cutoff": cutoff, "carts": 0, "items": 0, "kept": 0, "batches": 0}
+    while True:
+        carts, items, kept = sweep_batch(cutoff, batch_size)
+        if not carts and not kept:
+            break
+        metrics["carts"] += carts
+        metrics["items"] += items
+        metrics["kept"] += kept
+        metrics["batches"] += 1
+    metrics["seconds"] = round(time.monotonic() - started, 3)
+    return metrics
@@ -0,0 +1,36 @@
+import logging
+
+from shopping.cart.store import cart_store_enabled
+from shopping.cart.store import flush_dirty_carts
+from shopping.cart.sweeper import sweep_carts
+
+logger = logging.getLogger("django")
+
+
+def sweep_abandoned_carts():
+    """
+    Deletes the carts idle for longer than CART_ABANDONED_DAYS.
+
+    Meant to be scheduled (daily is plenty) by dotted path; the metrics of
+    the run are logged and returned as the task result.
+    """
+    metrics = sweep_carts()
+    logger.info(
+        f"cart sweep reclaimed {metrics['carts']} carts and {metrics['items']} "
+        f"items in {metrics['batches']} batches ({metrics['seconds']}s)"
+    )
+    return metrics
+
+
+def flush_cart_store():
+    """
+    Writes the carts changed in the Redis cart store back to Postgres.
+
+    Must be scheduled (every minute or so) whenever CART_STORE_ENABLED is
+    on, see `manage.py flush_carts`. Returns the number of carts written.
+    """
+    if not cart_store_enabled():
+        return 0
+    flushed = flush_dirty_carts()
+    logger.info(f"cart store flushed {flushed} carts")
+    return flushed
@@ -1,3 +1,372 @@
-from django.test import TestCase
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
 
-# Create your tests here.
+import fakeredis
+import pytest
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from shopping.accounting.models import Tax
+from shopping.cart import store
+from shopping.cart.models import Cart
+from shopping.cart.models import CartItem
+from shopping.cart.sweeper import sweep_carts
+from shopping.cart.tasks import flush_cart_store
+from shopping.cart.tasks import sweep_abandoned_carts
+from shopping.order.api import serializers as order_serializers
+from shopping.order.management.commands.benchmark_order_create import order_payload
+from shopping.product.models import Product
+from shopping.product.models import ProductVariation
+from shopping.users.tests.factories import UserFactory
+
+
+@pytest.fixture
+def redis_store(settings, monkeypatch):
+    settings.CART_STORE_ENABLED = True
+    client = fakeredis.FakeRedis()
+    monkeypatch.setattr(store, "get_client", lambda: client)
+    return client
+
+
+@pytest.fixture
+def variations(product):
+    return [
+        ProductVariation.objects.create(product=product, price_modifier=0, stock=5)
+        for _ in range(2)
+    ]
+
+
+def patch_cart(user, items):
+    client = APIClient()
+    client.force_authenticate(user)
+    return client.patch("/api/cart/", {"items": items}, format="json")
+
+
+def db_lines(user):
+    return sorted(
+        CartItem.objects.filter(cart__user=user).values_list("variation_id", "quantity")
+    )
+
+
+class TestCartStore:
+    def test_warms_from_the_database_once(self, user, product, variations, redis_store):
+        cart = Cart.objects.create(user=user)
+        CartItem.objects.create(
+            cart=cart, product=product, variation=variations[0], quantity=2
+        )
+
+        first = store.read_cart(user.pk)
+        with CaptureQueriesContext(connection) as queries:
+            second = store.read_cart(user.pk)
+        assert first.pk == second.pk == cart.pk
+        assert [(item.variation, item.quantity) for item in second.items.all()] == [
+            (variations[0], 2)
+        ]
+        # products and variations only, the cart comes from Redis
+        assert not any("cart" in query["sql"] for query in queries)
+
+    def test_changes_are_written_behind(self, user, product, variations, redis_store):
+        first, second = variations
+        response = patch_cart(
+            user,
+            [
+                {"product": product.pk, "variation": first.pk, "quantity": 2},
+                {"product": product.pk, "variation": second.pk, "quantity": 1},
+            ],
+        )
+        assert response.status_code == 200
+        assert db_lines(user) == []
+
+        store.flush_dirty_carts()
+        assert db_lines(user) == [(first.pk, 2), (second.pk, 1)]
+
+        patch_cart(
+            user,
+            [
+                {"product": product.pk, "variation": first.pk, "quantity": 1},
+                {"product": product.pk, "variation": second.pk, "quantity": -1},
+            ],
+        )
+        with CaptureQueriesContext(connection) as queries:
+            store.flush_cart(user.pk)
+        assert db_lines(user) == [(first.pk, 3)]
+        writes = [
+            query["sql"]
+            for query in queries
+            if query["sql"].startswith(("INSERT", "UPDATE", "DELETE"))
+        ]
+        assert len(writes) == 3
+
+    def test_stock_is_checked_against_the_stored_quantity(
+        self, user, product, variations, redis_store
+    ):
+        line = {"product": product.pk, "variation": variations[0].pk, "quantity": 3}
+        assert patch_cart(user, [line]).status_code == 200
+        assert patch_cart(user, [line]).status_code == 403
+        cart = store.read_cart(user.pk)
+        assert [item.quantity for item in cart.items.all()] == [3]
+
+    def test_delete_clears_both(self, user, product, variations, redis_store):
+        line = {"product": product.pk, "variation": variations[0].pk, "quantity": 1}
+        patch_cart(user, [line])
+        store.flush_dirty_carts()
+
+        client = APIClient()
+        client.force_authenticate(user)
+        assert client.delete("/api/cart/").status_code == 204
+        assert not Cart.objects.filter(user=user).exists()
+        assert not redis_store.exists(store.cart_key(user.pk))
+
+    def test_flush_command(self, user, product, variations, redis_store):
+        line = {"product": product.pk, "variation": variations[0].pk, "quantity": 1}
+        patch_cart(user, [line])
+        out = StringIO()
+        call_command("flush_carts", stdout=out)
+        assert "Flushed 1 carts" in out.getvalue()
+        assert db_lines(user) == [(variations[0].pk, 1)]
+
+    def test_flush_task(self, user, product, variations, redis_store):
+        line = {"product": product.pk, "variation": variations[0].pk, "quantity": 2}
+        patch_cart(user, [line])
+        assert flush_cart_store() == 1
+        assert db_lines(user) == [(variations[0].pk, 2)]
+        assert flush_cart_store() == 0
+
+
+class TestCartBatch:
+    def batch(self, user, operations):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client.post(
+            "/api/cart/batch/", {"operations": operations}, format="json"
+        )
+
+    def operations(self, product, variations):
+        first, second = variations
+        return [
+            {"op": "add", "product": product.pk, "variation": first.pk, "quantity": 2},
+            {"op": "set", "product": product.pk, "variation": second.pk, "quantity": 4},
+            {"op": "add", "product": product.pk, "variation": first.pk, "quantity": 1},
+        ]
+
+    def test_applies_in_bulk(self, user, product, variations):
+        first, second = variations
+        cart = Cart.objects.create(user=user)
+        CartItem.objects.create(cart=cart, product=product, variation=first, quantity=1)
+        CartItem.objects.create(
+            cart=cart, product=product, variation=second, quantity=1
+        )
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.batch(user, self.operations(product, variations))
+        assert response.status_code == 200
+        assert [
+            (item["variation"]["id"], item["quantity"])
+            for item in response.data["items"]
+        ] == [(first.pk, 4), (second.pk, 4)]
+        writes = [
+            query["sql"]
+            for query in queries
+            if query["sql"].startswith(("INSERT", "UPDATE", "DELETE"))
+        ]
+        # the lines in one UPDATE, plus the cart's updated_at
+        assert len(writes) == 2
+
+        response = self.batch(
+            user,
+            [
+                {
+                    "op": "remove",
+                    "product": product.pk,
+                    "variation": first.pk,
+                    "quantity": 4,
+                },
+                {
+                    "op": "set",
+                    "product": product.pk,
+                    "variation": second.pk,
+                    "quantity": 0,
+                },
+            ],
+        )
+        assert response.data["items"] == []
+        assert db_lines(user) == []
+
+    def test_all_or_nothing(self, user, product, variations):
+        operations = self.operations(product, variations)
+        operations[-1]["quantity"] = 4
+        assert self.batch(user, operations).status_code == 403
+        assert db_lines(user) == []
+
+        operations[-1].update(quantity=1, product=product.pk + 1)
+        response = self.batch(user, operations)
+        assert response.status_code == 400
+        assert db_lines(user) == []
+
+    def test_uses_the_cart_store(self, user, product, variations, redis_store):
+        first, second = variations
+        response = self.batch(user, self.operations(product, variations))
+        assert [item["quantity"] for item in response.data["items"]] == [3, 4]
+        assert db_lines(user) == []
+
+        store.flush_dirty_carts()
+        assert db_lines(user) == [(first.pk, 3), (second.pk, 4)]
+
+
+class TestCartSweeper:
+    @pytest.fixture
+    def carts(self, product, variations):
+        now = timezone.now()
+        carts = []
+        for days in (40, 35, 31, 2):
+            cart = Cart.objects.create(user=UserFactory())
+            CartItem.objects.create(
+                cart=cart, product=product, variation=variations[0], quantity=1
+            )
+            idle_since = now - timedelta(days=days)
+            Cart.objects.filter(pk=cart.pk).update(updated_at=idle_since)
+            CartItem.objects.filter(cart=cart).update(updated_at=idle_since)
+            carts.append(cart)
+        # an old cart whose line changed recently is still in use
+        CartItem.objects.filter(cart=carts[2]).update(updated_at=now)
+        return carts
+
+    def test_deletes_idle_carts_in_batches(self, carts):
+        metrics = sweep_carts(batch_size=1)
+        assert (metrics["carts"], metrics["items"], metrics["batches"]) == (2, 2, 2)
+        assert set(Cart.objects.values_list("pk", flat=True)) == {
+            carts[2].pk,
+            carts[3].pk,
+        }
+        assert CartItem.objects.count() == 2
+
+    def test_cart_changes_keep_it_alive(self, user, product, variations):
+        cart = Cart.objects.create(user=user)
+        Cart.objects.filter(pk=cart.pk).update(
+            updated_at=timezone.now() - timedelta(days=60)
+        )
+        line = {"product": product.pk, "variation": variations[0].pk, "quantity": 1}
+        patch_cart(user, [line])
+        assert sweep_carts()["carts"] == 0
+
+    def test_keeps_carts_held_in_the_store(self, carts, redis_store, variations):
+        # read since its last flush: in use though its row looks idle
+        store.warm_cart(carts[0].user_id)
+        # changed but not flushed yet: flushed before the sweep
+        line = (variations[0].product_id, variations[0].pk, 3)
+        store.update_cart(carts[1].user_id, quantities=[line])
+
+        metrics = sweep_carts(batch_size=1)
+        assert (metrics["carts"], metrics["kept"]) == (0, 1)
+        assert Cart.objects.count() == 4
+        assert CartItem.objects.get(cart=carts[1]).quantity == 3
+        touched = Cart.objects.get(pk=carts[0].pk).updated_at
+        assert touched > timezone.now() - timedelta(minutes=1)
+
+        store.clear_cart(carts[0].user_id)
+        Cart.objects.filter(pk=carts[0].pk).update(
+            updated_at=timezone.now() - timedelta(days=40)
+        )
+        assert sweep_carts()["carts"] == 1
+
+    def test_task_and_command(self, carts):
+        out = StringIO()
+        call_command("sweep_carts", "--dry-run", stdout=out)
+        assert out.getvalue().startswith("2 carts")
+        assert Cart.objects.count() == 4
+
+        call_command("sweep_carts", "--days", "33", stdout=out)
+        assert "Deleted 2 carts and 2 items" in out.getvalue()
+        assert sweep_abandoned_carts()["carts"] == 0
+        assert Cart.objects.count() == 2
+
+
+class TestCartPricing:
+    @pytest.fixture
+    def priced(self, product, variations, django_capture_on_commit_callbacks):
+        Product.objects.filter(pk=product.pk).update(discounted_price=Decimal("10"))
+        ProductVariation.objects.filter(pk=variations[1].pk).update(
+            price_modifier=Decimal("2.50")
+        )
+        with django_capture_on_commit_callbacks(execute=True):
+            tax = Tax.objects.create(name="VAT", rate=Decimal("10"))
+        return tax
+
+    def get_cart(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get("/api/cart/")
+        assert response.status_code == 200
+        return response.data, [q["sql"] for q in queries]
+
+    def test_totals_are_priced_once_per_change(
+        self, user, product, variations, priced, django_capture_on_commit_callbacks
+    ):
+        patch_cart(
+            user,
+            [
+                {"product": product.pk, "variation": variations[0].pk, "quantity": 2},
+                {"product": product.pk, "variation": variations[1].pk, "quantity": 1},
+            ],
+        )
+        data, queries = self.get_cart(user)
+        assert [(item["unit_price"], item["line_total"]) for item in data["items"]] == [
+            ("10.00", "20.00"),
+            ("12.50", "12.50"),
+        ]
+        assert (data["subtotal"], data["tax_rate"], data["tax"], data["total"]) == (
+            "32.50",
+            "10.00",
+            "3.25",
+            "35.75",
+        )
+        assert any("accounting_tax" in sql for sql in queries)
+
+        data, queries = self.get_cart(user)
+        assert data["total"] == "35.75"
+        assert not any("accounting_tax" in sql for sql in queries)
+
+        with django_capture_on_commit_callbacks(execute=True):
+            priced.rate = Decimal("20")
+            priced.save()
+        data, _ = self.get_cart(user)
+        assert (data["tax"], data["total"]) == ("6.50", "39.00")
+
+    def test_checkout_reuses_the_cart_pricing(
+        self, user, product, variations, priced, monkeypatch
+    ):
+        lines = [
+            {"product": product.pk, "variation": variation.pk, "quantity": 1}
+            for variation in variations
+        ]
+        patch_cart(user, lines)
+        cart, _ = self.get_cart(user)
+
+        priced_again = []
+        unit_price = order_serializers.unit_price
+        monkeypatch.setattr(
+            order_serializers,
+            "unit_price",
+            lambda *args: priced_again.append(args) or unit_price(*args),
+        )
+        client = APIClient()
+        client.force_authenticate(user)
+        response = client.post(
+            "/api/order/v1/", order_payload(variations, 2), format="json"
+        )
+        assert response.status_code == 201
+        # tax included, the order costs what the cart showed
+        assert response.data["total_amount"] == cart["total"] == "24.75"
+        assert priced_again == []
+
+        # other lines than the cart's are priced from the catalog, the same way
+        response = client.post(
+            "/api/order/v1/", order_payload(variations, 1), format="json"
+        )
+        assert len(priced_again) == 1
+        assert response.data["total_amount"] == "11.00"
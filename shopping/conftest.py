@@ -1,5 +1,7 @@
 import pytest
 
+from shopping.product.models import Category
+from shopping.product.models import Product
 from shopping.users.models import User
 from shopping.users.tests.factories import UserFactory
 
@@ -12,3 +14,19 @@ def _media_storage(settings, tmpdir) -> None:
 @pytest.fixture
 def user(db) -> User:
     return UserFactory()
+
+
+@pytest.fixture
+def category(db) -> Category:
+    return Category.objects.create(name="Shoes", slug="shoes")
+
+
+@pytest.fixture
+def product(category: Category, user: User) -> Product:
+    return Product.objects.create(
+        name="Runner",
+        slug="runner",
+        description="Running shoe",
+        category=category,
+        vendor=user,
+    )
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:44
+
+import django.contrib.postgres.indexes
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        # pg_trgm
+        ("product", "0005_product_search_vector"),
+        ("crm", "0003_pipelinestage_lead_opportunity_interaction"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="contact",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["name"],
+                name="contact_name_trgm_gin",
+                opclasses=["gin_trgm_ops"],
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="contact",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["email"],
+                name="contact_email_trgm_gin",
+                opclasses=["gin_trgm_ops"],
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="contact",
+            index=models.Index(
+                fields=["phone"],
+                name="contact_phone_pattern_idx",
+                opclasses=["text_pattern_ops"],
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="contact",
+            index=models.Index(
+                fields=["mobile"],
+                name="contact_mobile_pattern_idx",
+                opclasses=["text_pattern_ops"],
+            ),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:48
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("crm", "0004_dashboard_search_indexes"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="contact",
+            index=models.Index(fields=["name", "id"], name="contact_name_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="contact",
+            index=models.Index(fields=["created_at", "id"], name="contact_created_idx"),
+        ),
+    ]
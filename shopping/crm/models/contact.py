@@ -1,3 +1,4 @@
+from django.contrib.postgres.indexes import GinIndex
 from django.db import models
 from django.conf import settings
 
@@ -95,5 +96,33 @@ class Contact(models.Model):
     )
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # dashboard search: fuzzy names/emails, phone number prefixes
+            GinIndex(
+                fields=["name"],
+                name="contact_name_trgm_gin",
+                opclasses=["gin_trgm_ops"],
+            ),
+            GinIndex(
+                fields=["email"],
+                name="contact_email_trgm_gin",
+                opclasses=["gin_trgm_ops"],
+            ),
+            models.Index(
+                fields=["phone"],
+                name="contact_phone_pattern_idx",
+                opclasses=["text_pattern_ops"],
+            ),
+            models.Index(
+                fields=["mobile"],
+                name="contact_mobile_pattern_idx",
+                opclasses=["text_pattern_ops"],
+            ),
+            # dashboard sorts, id breaks ties for the cursor
+            models.Index(fields=["name", "id"], name="contact_name_idx"),
+            models.Index(fields=["created_at", "id"], name="contact_created_idx"),
+        ]
+
     def __str__(self):
         return self.name
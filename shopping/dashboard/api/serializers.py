@@ -1,4 +1,7 @@
+from django.conf import settings
 from rest_framework import serializers
+from shopping.crm.models import Contact
+from shopping.order.models import ArchivedOrder
 from shopping.order.models import Order
 
 
@@ -14,3 +17,81 @@ class DashboardOrderListSerializer(serializers.ModelSerializer):
             "updated_at",
             "total_amount",
         ]
+
+
+class DashboardArchivedOrderListSerializer(serializers.ModelSerializer):
+
+    class Meta:
+        model = ArchivedOrder
+        fields = [
+            "pk",
+            "status",
+            "order_number",
+            "created_at",
+            "archived_at",
+            "total_amount",
+        ]
+
+
+class DashboardOrderWriteSerializer(serializers.ModelSerializer):
+
+    class Meta:
+        model = Order
+        fields = [
+            "status",
+            "phone",
+            "shipping_address",
+            "billing_address",
+            "note",
+        ]
+
+
+class DashboardContactListSerializer(serializers.ModelSerializer):
+
+    class Meta:
+        model = Contact
+        fields = [
+            "pk",
+            "name",
+            "is_company",
+            "company",
+            "email",
+            "phone",
+            "mobile",
+            "city",
+            "created_at",
+        ]
+
+
+class DashboardContactWriteSerializer(serializers.ModelSerializer):
+
+    class Meta:
+        model = Contact
+        fields = [
+            "name",
+            "is_company",
+            "parent",
+            "company",
+            "email",
+            "phone",
+            "mobile",
+            "website",
+            "street",
+            "city",
+            "state",
+            "country",
+            "zip_code",
+            "job_title",
+            "notes",
+        ]
+
+
+class DashboardBulkSerializer(serializers.Serializer):
+    model = serializers.CharField()
+    action = serializers.ChoiceField(choices=("create", "update", "delete"))
+    rows = serializers.ListField(
+        child=serializers.JSONField(),
+        allow_empty=False,
+        max_length=settings.DASHBOARD_BULK_MAX_ROWS,
+    )
+    background = serializers.BooleanField(default=False)
@@ -1,6 +1,16 @@
 from django.urls import path
+from shopping.dashboard.api.views import DashboardBulkAPI
+from shopping.dashboard.api.views import DashboardBulkJobAPI
 from shopping.dashboard.api.views import DashboardTableAPI
 
 
 app_name = "dashboard"
-urlpatterns = [path("v1/model-list/", DashboardTableAPI.as_view(), name="model_list")]
+urlpatterns = [
+    path("v1/model-list/", DashboardTableAPI.as_view(), name="model_list"),
+    path("v1/model-bulk/", DashboardBulkAPI.as_view(), name="model_bulk"),
+    path(
+        "v1/model-bulk/<str:job_id>/",
+        DashboardBulkJobAPI.as_view(),
+        name="model_bulk_job",
+    ),
+]
@@ -1,102 +1,156 @@
+from rest_framework.permissions import IsAdminUser
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework import status
-from django.db.models import Q
-from shopping.dashboard.utils import get_model_properties
-from django.core.exceptions import ObjectDoesNotExist
+from django.conf import settings
+from django.urls import reverse
+from shopping.dashboard.api.serializers import DashboardBulkSerializer
+from shopping.dashboard.bulk import bulk_write
+from shopping.dashboard.bulk import get_bulk_job
+from shopping.dashboard.bulk import start_bulk_job
 from shopping.dashboard.paginations import DashboardPagination
+from shopping.dashboard.registry import get_table
 
 
 class DashboardTableAPI(APIView):
+    permission_classes = [IsAdminUser]
     pagination_class = DashboardPagination
 
     def get(self, request):
-        model_name = request.query_params.get("model")
-        search = request.query_params.get("search")
+        table = get_table(request.query_params.get("model"))
+        search = request.query_params.get("search", "").strip()
         sort = request.query_params.get("sort")
         method = request.query_params.get("method", "list")
-        page_size = int(request.query_params.get("page_size", 15))
 
-        Model, serializer = get_model_properties(model_name, method)
-        if not Model:
+        if table is None:
             return Response(
                 {"error": "Invalid model"}, status=status.HTTP_400_BAD_REQUEST
             )
-        qs = Model.objects.all()
+        serializer_class = table.get_serializer_class(method)
+        if serializer_class is None:
+            return Response(
+                {"error": "Invalid method"}, status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            self.ordering = table.get_ordering(sort, method)
+        except ValueError as error:
+            return Response({"error": str(error)}, status=status.HTTP_400_BAD_REQUEST)
+        qs = table.get_queryset(method)
 
-        # Search in all Char/Text fields
+        # indexed search over the table's declared fields, best match first
         if search:
-            search_fields = [
-                f.name
-                for f in Model._meta.fields
-                if f.get_internal_type() in ["CharField", "TextField"]
-            ]
-            q_objects = Q()
-            for field in search_fields:
-                q_objects |= Q(**{f"{field}__icontains": search})
-            qs = qs.filter(q_objects)
-
-        # Sorting
-        if sort:
-            qs = qs.order_by(sort)
-
-        # Pagination
-        paginator = self.pagination_class()
-        paginator.page_size = page_size
-        result_page = paginator.paginate_queryset(qs, request)
-
-        data = [
-            {field.name: getattr(obj, field.name) for field in Model._meta.fields}
-            for obj in result_page
-        ]
-        serializer = serializer(qs, many=True)
-        return Response(serializer.data)
+            qs = table.search(qs, search)
+            if not sort:
+                self.ordering = table.search_ordering
 
-        # return paginator.get_paginated_response(data.data)
-
-    def post(self, request):
-        """Create a new record"""
-        model_name = request.data.get("model")
-        Model = get_model_properties(model_name)
-        if not Model:
-            return Response(
+        # only the page is fetched and serialized
+        paginator = self.pagination_class()
+        result_page = paginator.paginate_queryset(qs, request, view=self)
+        serializer = serializer_class(
+            result_page, many=True, context={"request": request}
+        )
+        return paginator.get_paginated_response(serializer.data)
+
+    def _write(self, request, action, rows):
+        table = get_table(request.data.get("model"))
+        if table is None:
+            return None, Response(
                 {"error": "Invalid model"}, status=status.HTTP_400_BAD_REQUEST
             )
+        if action not in table.write_actions:
+            return None, Response(
+                {"error": "Invalid action"}, status=status.HTTP_400_BAD_REQUEST
+            )
+        return bulk_write(table, action, rows)["results"], None
 
-        obj = Model.objects.create(**request.data.get("data", {}))
-        return Response({"id": obj.pk, "message": "Created successfully"})
+    def post(self, request):
+        """Create a new record"""
+        results, error = self._write(request, "create", [request.data.get("data", {})])
+        if error:
+            return error
+        if results[0]["status"] != "created":
+            return Response(results[0]["errors"], status=status.HTTP_400_BAD_REQUEST)
+        return Response({"id": results[0]["id"], "message": "Created successfully"})
 
     def put(self, request):
         """Edit an existing record"""
-        model_name = request.data.get("model")
-        obj_id = request.data.get("id")
-        Model = get_model_properties(model_name)
-        if not Model:
-            return Response(
-                {"error": "Invalid model"}, status=status.HTTP_400_BAD_REQUEST
-            )
-
-        try:
-            obj = Model.objects.get(pk=obj_id)
-        except ObjectDoesNotExist:
+        data = request.data.get("data", {})
+        row = {**data, "id": request.data.get("id")} if isinstance(data, dict) else {}
+        results, error = self._write(request, "update", [row])
+        if error:
+            return error
+        if results[0]["status"] == "not_found":
             return Response(
                 {"error": "Object not found"}, status=status.HTTP_404_NOT_FOUND
             )
-
-        for k, v in request.data.get("data", {}).items():
-            setattr(obj, k, v)
-        obj.save()
+        if results[0]["status"] not in ("updated", "unchanged"):
+            return Response(results[0]["errors"], status=status.HTTP_400_BAD_REQUEST)
         return Response({"message": "Updated successfully"})
 
     def delete(self, request):
         """Delete record(s)"""
-        model_name = request.data.get("model")
         ids = request.data.get("ids", [])
-        Model = get_model_properties(model_name)
-        if not Model:
+        if not isinstance(ids, list):
+            return Response(
+                {"error": "ids must be a list"}, status=status.HTTP_400_BAD_REQUEST
+            )
+        results, error = self._write(request, "delete", ids)
+        if error:
+            return error
+        failed = [result for result in results if result["status"] == "failed"]
+        if failed:
+            return Response(failed[0]["errors"], status=status.HTTP_400_BAD_REQUEST)
+        deleted = sum(result["status"] == "deleted" for result in results)
+        return Response({"message": f"Deleted {deleted} records"})
+
+
+class DashboardBulkAPI(APIView):
+    """
+    Creates, updates or deletes many rows of a dashboard table.
+
+    `{"model": "order:order", "action": "update", "rows": [{"id": 1,
+    "status": "shipped"}, ...]}`; deletes take ids or `{"id": ...}` rows.
+    Returns a per-row report. Batches over DASHBOARD_BULK_INLINE_ROWS, or
+    sent with `"background": true`, run as a job polled at the returned url.
+    """
+
+    permission_classes = [IsAdminUser]
+
+    def post(self, request):
+        serializer = DashboardBulkSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        table = get_table(data["model"])
+        if table is None:
             return Response(
                 {"error": "Invalid model"}, status=status.HTTP_400_BAD_REQUEST
             )
+        if data["action"] not in table.write_actions:
+            return Response(
+                {"error": "Invalid action"}, status=status.HTTP_400_BAD_REQUEST
+            )
 
-        deleted, _ = Model.objects.filter(pk__in=ids).delete()
-        return Response({"message": f"Deleted {deleted} records"})
+        rows = data["rows"]
+        if data["background"] or len(rows) > settings.DASHBOARD_BULK_INLINE_ROWS:
+            job = start_bulk_job(data["model"], data["action"], rows, request.user.pk)
+            url = reverse("dashboard:model_bulk_job", args=[job["id"]])
+            return Response(
+                {"id": job["id"], "status": job["status"], "url": url},
+                status=status.HTTP_202_ACCEPTED,
+            )
+        return Response(bulk_write(table, data["action"], rows))
+
+
+class DashboardBulkJobAPI(APIView):
+    """Progress of a background bulk job, with its report once done."""
+
+    permission_classes = [IsAdminUser]
+
+    def get(self, request, job_id):
+        job = get_bulk_job(job_id)
+        if job is None or job["user_id"] != request.user.pk:
+            return Response(
+                {"error": "Job not found"}, status=status.HTTP_404_NOT_FOUND
+            )
+        job = {key: value for key, value in job.items() if key != "user_id"}
+        return Response(job)
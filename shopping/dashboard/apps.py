@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class DashboardConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "shopping.dashboard"
+
+    def ready(self):
+        from shopping.dashboard import checks
@@ -0,0 +1,327 @@
+import logging
+import threading
+import time
+import uuid
+from collections import Counter
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db import DatabaseError
+from django.db import connections
+from django.db import transaction
+from django.db.models import ProtectedError
+from django.utils import timezone
+
+from shopping.dashboard.registry import get_table
+
+logger = logging.getLogger("django")
+
+BULK_ACTIONS = ("create", "update", "delete")
+BULK_CHUNK_SIZE = 500
+JOB_KEY_PREFIX = "dashboard:bulk"
+
+_executor = None
+_executor_lock = threading.Lock()
+# ids of the jobs queued or running in this process, see _heartbeat
+_held = set()
+
+
+def _result(index, pk, status, errors=None):
+    result = {"index": index, "id": pk, "status": status}
+    if errors:
+        result["errors"] = errors
+    return result
+
+
+def _row_pk(table, row):
+    value = row.get("id") if isinstance(row, dict) else row
+    try:
+        return table.model._meta.pk.to_python(value)
+    except ValidationError:
+        return None
+
+
+def _assign(instance, validated_data):
+    """Sets the values that differ, returns the names of the changed fields."""
+    changed = []
+    for name, value in validated_data.items():
+        field = instance._meta.get_field(name)
+        new = value.pk if field.is_relation and value is not None else value
+        if getattr(instance, field.attname) != new:
+            setattr(instance, name, value)
+            changed.append(name)
+    return changed
+
+
+def _failed(results, statuses, error):
+    # the chunk's transaction rolled back, none of its writes happened
+    for result in results:
+        if result["status"] in statuses:
+            result["status"] = "failed"
+            result["errors"] = {"non_field_errors": [str(error)]}
+
+
+def _create(table, rows, offset):
+    serializer_class = table.get_serializer_class("write")
+    results = []
+    instances = []
+    for index, row in enumerate(rows, offset):
+        serializer = serializer_class(data=row)
+        if not serializer.is_valid():
+            results.append(_result(index, None, "invalid", serializer.errors))
+            continue
+        instances.append((table.model(**serializer.validated_data), len(results)))
+        results.append(_result(index, None, "created"))
+
+    try:
+        with transaction.atomic():
+            table.model._default_manager.bulk_create(
+                [instance for instance, _ in instances]
+            )
+    except DatabaseError as error:
+        _failed(results, ("created",), error)
+        return results
+    for instance, position in instances:
+        results[position]["id"] = instance.pk
+    return results
+
+
+def _update(table, rows, offset):
+    serializer_class = table.get_serializer_class("write")
+    model = table.model
+    pks = [_row_pk(table, row) for row in rows]
+    found = model._default_manager.in_bulk([pk for pk in pks if pk is not None])
+
+    results = []
+    # one bulk_update per set of changed fields, so no row rewrites a column
+    # it didn't change
+    groups = defaultdict(list)
+    seen = set()
+    for index, (row, pk) in enumerate(zip(rows, pks), offset):
+        instance = found.get(pk)
+        if instance is None or not isinstance(row, dict):
+            results.append(_result(index, pk, "not_found"))
+            continue
+        if pk in seen:
+            errors = {"id": ["Appears more than once in the batch."]}
+            results.append(_result(index, pk, "invalid", errors))
+            continue
+        seen.add(pk)
+        data = {name: value for name, value in row.items() if name != "id"}
+        serializer = serializer_class(instance, data=data, partial=True)
+        if not serializer.is_valid():
+            results.append(_result(index, pk, "invalid", serializer.errors))
+            continue
+        changed = _assign(instance, serializer.validated_data)
+        if not changed:
+            results.append(_result(index, pk, "unchanged"))
+            continue
+        groups[frozenset(changed)].append(instance)
+        results.append(_result(index, pk, "updated"))
+
+    # bulk_update skips pre_save, so auto_now fields are stamped here
+    auto_now = [
+        field
+        for field in model._meta.concrete_fields
+        if getattr(field, "auto_now", False)
+    ]
+    try:
+        with transaction.atomic():
+            for fields, instances in groups.items():
+                for instance in instances:
+                    for field in auto_now:
+                        field.pre_save(instance, add=False)
+                model._default_manager.bulk_update(
+                    instances, [*fields, *(field.name for field in auto_now)]
+                )
+            table.after_bulk_update(
+                [instance for instances in groups.values() for instance in instances]
+            )
+    except DatabaseError as error:
+        _failed(results, ("updated",), error)
+    return results
+
+
+def _delete(table, rows, offset):
+    model = table.model
+    pks = [_row_pk(table, row) for row in rows]
+    found = set(
+        model._default_manager.filter(
+            pk__in=[pk for pk in pks if pk is not None]
+        ).values_list("pk", flat=True)
+    )
+    results = [
+        _result(index, pk, "deleted" if pk in found else "not_found")
+        for index, pk in enumerate(pks, offset)
+    ]
+    try:
+        with transaction.atomic():
+            # a regular delete: cascades and model signals still apply
+            model._default_manager.filter(pk__in=found).delete()
+    except (DatabaseError, ProtectedError) as error:
+        _failed(results, ("deleted",), error)
+    return results
+
+
+_WRITERS = {"create": _create, "update": _update, "delete": _delete}
+
+
+def bulk_write(table, action, rows, chunk_size=BULK_CHUNK_SIZE, progress=None):
+    """
+    Creates, updates or deletes `rows` of a dashboard table in chunks.
+
+    Every row is validated by the table's `write` serializer; updates and
+    deletes identify rows by `id`. Each chunk is written in its own
+    transaction with one bulk_create, one bulk_update per set of changed
+    fields or one delete, so a bad chunk doesn't undo the others.
+
+    Returns a report with one result per row, in input order: its index,
+    id and status (created, updated, unchanged, deleted, invalid,
+    not_found or failed) plus the errors of rows that weren't written.
+    `progress(done)` is called after every chunk.
+    """
+    write = _WRITERS[action]
+    results = []
+    for offset in range(0, len(rows), chunk_size):
+        results += write(table, rows[offset : offset + chunk_size], offset)
+        if progress is not None:
+            progress(len(results))
+    return {
+        "action": action,
+        "total": len(rows),
+        "counts": dict(Counter(result["status"] for result in results)),
+        "results": results,
+    }
+
+
+def job_key(job_id):
+    return f"{JOB_KEY_PREFIX}:{job_id}"
+
+
+def alive_key(job_id):
+    return f"{job_key(job_id)}:alive"
+
+
+def _keep_alive(*job_ids):
+    cache.set_many(
+        {alive_key(job_id): True for job_id in job_ids},
+        settings.DASHBOARD_BULK_JOB_STALE,
+    )
+
+
+def get_bulk_job(job_id):
+    """
+    The job, marked failed if the process running it is gone.
+
+    While a process holds a job, queued or running, it refreshes the job's
+    alive key every third of DASHBOARD_BULK_JOB_STALE from a thread of its
+    own, however long a chunk takes. A key that expired means the job was
+    lost to a restart or a crash and will not finish.
+    """
+    job = cache.get(job_key(job_id))
+    if job is None or job["status"] not in ("queued", "running"):
+        return job
+    if cache.get(alive_key(job_id)) is None:
+        job["status"] = "failed"
+        _save_job(job)
+    return job
+
+
+def _save_job(job):
+    cache.set(job_key(job["id"]), job, settings.DASHBOARD_BULK_JOB_TTL)
+
+
+def start_bulk_job(app_model, action, rows, user_id):
+    """
+    Runs `bulk_write` in the background and returns the job to poll.
+
+    Progress and the final report live in the cache (Redis in production)
+    for DASHBOARD_BULK_JOB_TTL, so any worker can answer the polling. Jobs
+    are not retried: one lost to a restart is reported failed by
+    `get_bulk_job()` and has to be sent again.
+    """
+    job = {
+        "id": uuid.uuid4().hex,
+        "user_id": user_id,
+        "model": app_model,
+        "action": action,
+        "status": "queued",
+        "total": len(rows),
+        "processed": 0,
+        "report": None,
+        "started_at": None,
+    }
+    _save_job(job)
+    # alive until the request commits and the pool takes over, a rolled
+    # back request leaves a job that fails once this expires
+    _keep_alive(job["id"])
+    # queued once the request commits, its own writes are visible by then
+    transaction.on_commit(lambda: _enqueue(job["id"], rows))
+    return job
+
+
+def _enqueue(job_id, rows):
+    # a pool of its own: a big batch doesn't hold up the image derivatives
+    # and the rows are never logged
+    global _executor
+    if not settings.DASHBOARD_BULK_WORKERS:
+        return run_bulk_job(job_id, rows)
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.DASHBOARD_BULK_WORKERS,
+                thread_name_prefix="dashboard-bulk",
+            )
+            threading.Thread(
+                target=_heartbeat, name="dashboard-bulk-heartbeat", daemon=True
+            ).start()
+        _held.add(job_id)
+    return _executor.submit(_run, job_id, rows)
+
+
+def _heartbeat():
+    # keeps the jobs of this process alive, it dies with the process
+    while True:
+        with _executor_lock:
+            held = list(_held)
+        if held:
+            _keep_alive(*held)
+        time.sleep(settings.DASHBOARD_BULK_JOB_STALE / 3)
+
+
+def _run(job_id, rows):
+    try:
+        run_bulk_job(job_id, rows)
+    finally:
+        # the alive key is left to expire: a poll that read the job just
+        # before it finished must still find it alive
+        with _executor_lock:
+            _held.discard(job_id)
+        # the thread got its own connection, don't leak it
+        connections.close_all()
+
+
+def run_bulk_job(job_id, rows):
+    job = get_bulk_job(job_id)
+    # gone, or given up on while it waited for a worker
+    if job is None or job["status"] != "queued":
+        return
+    job["status"] = "running"
+    job["started_at"] = timezone.now()
+    _save_job(job)
+
+    def progress(done):
+        job["processed"] = done
+        _save_job(job)
+
+    try:
+        table = get_table(job["model"])
+        job["report"] = bulk_write(table, job["action"], rows, progress=progress)
+        job["status"] = "done"
+    except Exception:
+        logger.exception(f"dashboard bulk job {job_id} failed")
+        job["status"] = "failed"
+    _save_job(job)
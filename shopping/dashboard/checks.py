@@ -0,0 +1,69 @@
+from django.core.checks import Error
+from django.core.checks import Tags
+from django.core.checks import Warning
+from django.core.checks import register
+from django.db import connections
+
+from shopping.dashboard.registry import registered_tables
+
+
+def _index_columns(connection, cursor, db_table):
+    constraints = connection.introspection.get_constraints(cursor, db_table)
+    return [
+        constraint["columns"]
+        for constraint in constraints.values()
+        # B-tree only, GIN/trigram indexes can't return rows in order
+        if constraint["primary_key"]
+        or constraint["unique"]
+        or (constraint["index"] and constraint.get("type") == "idx")
+    ]
+
+
+@register(Tags.database)
+def check_sort_indexes(app_configs=None, databases=None, **kwargs):
+    """
+    Every declared dashboard sort has an index to walk in the live database.
+
+    Database checks only run on request, e.g. `manage.py check --database
+    default --fail-level WARNING` after migrating. They also run before
+    `migrate`, which is why a missing index is a warning: an error would
+    block the migration adding it.
+    """
+    errors = []
+    for alias in databases or ():
+        connection = connections[alias]
+        with connection.cursor() as cursor:
+            for table in registered_tables():
+                meta = table.model._meta
+                indexes = _index_columns(connection, cursor, meta.db_table)
+                for name in table.sort_fields:
+                    columns = table.sort_index_columns(name)
+                    if not any(index[: len(columns)] == columns for index in indexes):
+                        errors.append(
+                            Warning(
+                                f"Sorting {meta.label} on {name} has no index on "
+                                f"({', '.join(columns)}) in the {alias} database.",
+                                hint="Add a models.Index or drop it from sort_fields.",
+                                obj=type(table),
+                                id="dashboard.W001",
+                            )
+                        )
+    return errors
+
+
+@register()
+def check_sort_projections(app_configs=None, **kwargs):
+    errors = []
+    for table in registered_tables():
+        projection = table.projections.get("list", ())
+        for name in table.sort_fields:
+            if projection and name not in projection:
+                errors.append(
+                    Error(
+                        f"Sort field {name} of {table.model._meta.label} isn't "
+                        "in the list projection, the cursor needs its value.",
+                        obj=type(table),
+                        id="dashboard.E002",
+                    )
+                )
+    return errors
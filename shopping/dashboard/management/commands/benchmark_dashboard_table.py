@@ -0,0 +1,115 @@
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db import transaction
+from django.test.utils import CaptureQueriesContext
+from django.test.utils import override_settings
+from rest_framework.test import APIClient
+
+from shopping.dashboard.api.serializers import DashboardOrderListSerializer
+from shopping.order.models import Order
+from shopping.users.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        "Fills the orders table with --rows orders inside a rolled back "
+        "transaction and times the dashboard table's first and deep pages."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--rows", type=int, default=1_000_000, help="Orders inserted."
+        )
+        parser.add_argument(
+            "--pages", type=int, default=50, help="Pages walked for the deep page."
+        )
+        parser.add_argument(
+            "--repeat", type=int, default=5, help="Requests per case, best is kept."
+        )
+        parser.add_argument(
+            "--legacy",
+            action="store_true",
+            help="Also time serializing the whole table, as the endpoint used to.",
+        )
+
+    @override_settings(ALLOWED_HOSTS=["testserver"])
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self.benchmark(options)
+            transaction.set_rollback(True)
+
+    def fill(self, rows):
+        suffix = uuid.uuid4().hex[:8]
+        user = User.objects.create(
+            email=f"benchmark-{suffix}@example.com", is_staff=True
+        )
+        table = connection.ops.quote_name(Order._meta.db_table)
+        statuses = [status for status, _ in Order.OrderStatus.choices]
+        started = time.perf_counter()
+        with connection.cursor() as cursor:
+            # straight SQL: a million rows through the ORM would dwarf the run
+            cursor.execute(
+                f"INSERT INTO {table} (user_id, order_number, status, "
+                "shipping_address, billing_address, phone, note, created_at, "
+                "updated_at, total_amount) "
+                "SELECT %s, %s || g, (%s::text[])[1 + g %% %s], "
+                "repeat('Benchmark street ', 20), repeat('Benchmark street ', 20), "
+                "'000', '', now() - g * interval '1 minute', now(), g %% 1000 "
+                "FROM generate_series(1, %s) g",
+                [user.pk, f"B{suffix}-", statuses, len(statuses), rows],
+            )
+            cursor.execute(f"ANALYZE {table}")
+        elapsed = time.perf_counter() - started
+        self.stdout.write(f"inserted {rows} orders in {elapsed:.1f} s")
+        return user
+
+    def measure(self, label, run, repeat):
+        best, queries = None, None
+        for _ in range(repeat):
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                result = run()
+                elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+            queries = len(captured)
+        self.stdout.write(f"{label}: {queries} queries, {best * 1000:.1f} ms")
+        return result
+
+    def benchmark(self, options):
+        user = self.fill(options["rows"])
+        client = APIClient()
+        client.force_authenticate(user)
+        url = "/api/dashboard/v1/model-list/?model=order:order"
+
+        response = self.measure(
+            "first page", lambda: client.get(url), options["repeat"]
+        )
+        self.stdout.write(
+            f"  count {response.data['count']} "
+            f"(estimate: {response.data['count_is_estimate']})"
+        )
+
+        for _ in range(options["pages"] - 1):
+            response = client.get(response.data["next"])
+        self.measure(
+            f"page {options['pages'] + 1}",
+            lambda: client.get(response.data["next"]),
+            options["repeat"],
+        )
+        self.measure(
+            "sorted by total",
+            lambda: client.get(f"{url}&sort=-total_amount"),
+            options["repeat"],
+        )
+
+        if options["legacy"]:
+            self.measure(
+                "whole table",
+                lambda: DashboardOrderListSerializer(
+                    Order.objects.all(), many=True
+                ).data,
+                1,
+            )
@@ -1,6 +1,76 @@
-from rest_framework.pagination import PageNumberPagination
+import json
 
+from django.conf import settings
+from django.db import connections
+from rest_framework.response import Response
 
-class DashboardPagination(PageNumberPagination):
-    page_size_query_param = "page_size"
-    page_query_param = "page"
+from shopping.product.paginations import KeysetPagination
+
+
+def estimated_count(queryset):
+    """
+    `(count, is_estimate)` for the rows of `queryset`.
+
+    Small tables are counted exactly. Past DASHBOARD_EXACT_COUNT_LIMIT rows
+    the planner's numbers are used instead of a COUNT that would scan the
+    whole table: `pg_class.reltuples` when nothing is filtered, the row
+    estimate of the query plan otherwise.
+    """
+    if queryset.query.is_empty():
+        return 0, False
+    connection = connections[queryset.db]
+    table = connection.ops.quote_name(queryset.model._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass", [table]
+        )
+        rows = cursor.fetchone()[0]
+        # -1 until the table is first analyzed
+        if rows < settings.DASHBOARD_EXACT_COUNT_LIMIT:
+            return queryset.count(), False
+        if not queryset.query.where:
+            return rows, True
+        sql, params = queryset.order_by().values("pk").query.sql_with_params()
+        cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+        plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return plan[0]["Plan"]["Plan Rows"], True
+
+
+class DashboardPagination(KeysetPagination):
+    """
+    Keyset pages of a dashboard table, in the order the view picked.
+
+    The envelope also carries the (possibly estimated) total for the table
+    footer.
+    """
+
+    ordering = ("-id",)
+    page_size = 15
+
+    def get_ordering(self, request, queryset, view):
+        return getattr(view, "ordering", None) or self.ordering
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.count, self.count_is_estimate = estimated_count(queryset)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        return Response(
+            {
+                "count": self.count,
+                "count_is_estimate": self.count_is_estimate,
+                "next": self.get_next_link(),
+                "previous": self.get_previous_link(),
+                "results": data,
+            }
+        )
+
+    def get_paginated_response_schema(self, schema):
+        response_schema = super().get_paginated_response_schema(schema)
+        response_schema["properties"].update(
+            count={"type": "integer"},
+            count_is_estimate={"type": "boolean"},
+        )
+        return response_schema
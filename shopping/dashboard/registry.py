@@ -0,0 +1,204 @@
+from django.contrib.postgres.search import TrigramWordSimilarity
+from django.db import transaction
+from django.db.models import Case
+from django.db.models import FloatField
+from django.db.models import Q
+from django.db.models import Value
+from django.db.models import When
+from django.db.models.functions import Cast
+from django.db.models.functions import Coalesce
+from django.db.models.functions import Greatest
+
+from shopping.crm.models import Contact
+from shopping.dashboard.api.serializers import DashboardArchivedOrderListSerializer
+from shopping.dashboard.api.serializers import DashboardContactListSerializer
+from shopping.dashboard.api.serializers import DashboardContactWriteSerializer
+from shopping.dashboard.api.serializers import DashboardOrderListSerializer
+from shopping.dashboard.api.serializers import DashboardOrderWriteSerializer
+from shopping.order.models import ArchivedOrder
+from shopping.order.models import Order
+from shopping.order.services import orders_bulk_updated
+
+_tables = {}
+# shorter terms have no trigram to look up in the index
+TRIGRAM_MIN_LENGTH = 3
+
+
+class DashboardTable:
+    """
+    How the generic dashboard table serves one model.
+
+    `serializers` maps the `method` query param to a serializer class and
+    `projections` the fields loaded with `.only()` for that method, so a
+    list never reads the wide columns it doesn't show. `ordering` is the
+    default keyset order and must end on `id`.
+
+    `sort_fields` are the only columns the `sort` param accepts, each one
+    backed by an index on `(field, id)`, or on the field alone when it is
+    unique; `manage.py check --database default` verifies them.
+
+    Writes go through the `write` serializer and are limited to
+    `write_actions`. They are saved in bulk, without save() or model
+    signals, so a model with side effects hooks into `after_bulk_update`.
+
+    Search only looks at the declared fields, each backed by an index:
+    `search_prefix_fields` (exact codes, a `text_pattern_ops` B-tree) and
+    `search_trigram_fields` (free text, a `gin_trgm_ops` GIN index).
+    """
+
+    model = None
+    serializers = {}
+    projections = {}
+    ordering = ("-id",)
+    search_ordering = ("-rank", "-id")
+    sort_fields = ("id",)
+    write_actions = ("create", "update", "delete")
+    search_prefix_fields = ()
+    search_trigram_fields = ()
+
+    def get_serializer_class(self, method="list"):
+        return self.serializers.get(method)
+
+    def get_queryset(self, method="list"):
+        queryset = self.model._default_manager.all()
+        if method in self.projections:
+            queryset = queryset.only(*self.projections[method])
+        return queryset
+
+    def get_ordering(self, sort=None, method="list"):
+        """The keyset ordering for a `sort` param like `-created_at`."""
+        if not sort:
+            return self.ordering
+        name = sort.removeprefix("-")
+        if name not in self.sort_fields:
+            raise ValueError(f"Can't sort on {name}")
+        if self.model._meta.get_field(name).unique:
+            return (sort,)
+        return (sort, "-id" if sort.startswith("-") else "id")
+
+    def sort_index_columns(self, name):
+        """The leading columns of the index a sort on `name` walks."""
+        field = self.model._meta.get_field(name)
+        if field.unique:
+            return [field.column]
+        return [field.column, self.model._meta.pk.column]
+
+    def after_bulk_update(self, instances):
+        """Called in the transaction that bulk updated `instances`."""
+
+    def search(self, queryset, term):
+        """
+        Filters `queryset` by `term` and annotates a relevance `rank`.
+
+        A prefix match ranks 1, above any trigram word similarity (typos and
+        partial words included, case doesn't matter). Every condition is an
+        index lookup, so the cost follows the matches, not the table size.
+        """
+        condition = Q()
+        ranks = []
+        for field in self.search_prefix_fields:
+            match = Q(**{f"{field}__startswith": term})
+            condition |= match
+            ranks.append(Case(When(match, then=Value(1.0)), default=Value(0.0)))
+        if len(term) >= TRIGRAM_MIN_LENGTH:
+            for field in self.search_trigram_fields:
+                condition |= Q(**{f"{field}__trigram_word_similar": term})
+                ranks.append(TrigramWordSimilarity(term, field))
+        if not ranks:
+            return queryset.none()
+        rank = Greatest(*ranks) if len(ranks) > 1 else ranks[0]
+        return queryset.filter(condition).annotate(
+            # float8 so the rank survives the pagination cursor round trip
+            rank=Cast(Coalesce(rank, Value(0.0)), FloatField())
+        )
+
+
+def register(table_class):
+    """Class decorator making a table available as `app_label:model_name`."""
+    meta = table_class.model._meta
+    _tables[f"{meta.app_label}:{meta.model_name}"] = table_class()
+    return table_class
+
+
+def registered_tables():
+    return list(_tables.values())
+
+
+def get_table(app_model):
+    """The registered table for `app_label:model_name`, or None."""
+    if not app_model:
+        return None
+    return _tables.get(app_model.strip().lower())
+
+
+@register
+class OrderTable(DashboardTable):
+    model = Order
+    serializers = {
+        "list": DashboardOrderListSerializer,
+        "write": DashboardOrderWriteSerializer,
+    }
+    projections = {
+        "list": (
+            "id",
+            "status",
+            "order_number",
+            "created_at",
+            "updated_at",
+            "total_amount",
+        )
+    }
+    sort_fields = ("id", "order_number", "created_at", "total_amount")
+    search_prefix_fields = ("order_number", "phone")
+    search_trigram_fields = ("shipping_address",)
+    # orders are only created at checkout
+    write_actions = ("update", "delete")
+
+    def after_bulk_update(self, instances):
+        orders_bulk_updated(instances)
+
+
+@register
+class ArchivedOrderTable(DashboardTable):
+    """Orders of closed months, see `shopping.order.archive`. Read only."""
+
+    model = ArchivedOrder
+    serializers = {"list": DashboardArchivedOrderListSerializer}
+    projections = {
+        "list": (
+            "id",
+            "status",
+            "order_number",
+            "created_at",
+            "archived_at",
+            "total_amount",
+        )
+    }
+    sort_fields = ("id", "order_number", "created_at")
+    search_prefix_fields = ("order_number",)
+    write_actions = ()
+
+
+@register
+class ContactTable(DashboardTable):
+    model = Contact
+    serializers = {
+        "list": DashboardContactListSerializer,
+        "write": DashboardContactWriteSerializer,
+    }
+    projections = {
+        "list": (
+            "id",
+            "name",
+            "is_company",
+            "company",
+            "email",
+            "phone",
+            "mobile",
+            "city",
+            "created_at",
+        )
+    }
+    sort_fields = ("id", "name", "created_at")
+    search_prefix_fields = ("phone", "mobile")
+    search_trigram_fields = ("name", "email")
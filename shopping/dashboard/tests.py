@@ -0,0 +1,319 @@
+import threading
+import time
+from datetime import datetime
+from datetime import timedelta
+
+import pytest
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from shopping.crm.models import Company
+from shopping.crm.models import Contact
+from shopping.dashboard import bulk as bulk_module
+from shopping.dashboard.bulk import alive_key
+from shopping.dashboard.bulk import run_bulk_job
+from shopping.dashboard.checks import check_sort_indexes
+from shopping.dashboard.checks import check_sort_projections
+from shopping.dashboard.registry import OrderTable
+from shopping.dashboard.registry import get_table
+from shopping.order.archive import archive_batch
+from shopping.order.models import DailyOrderStats
+from shopping.order.models import Order
+from shopping.order.stats import rebuild_daily_order_stats
+from shopping.users.tests.factories import UserFactory
+
+URL = "/api/dashboard/v1/model-list/"
+BULK_URL = "/api/dashboard/v1/model-bulk/"
+
+
+@pytest.fixture
+def staff(db):
+    return UserFactory(is_staff=True)
+
+
+@pytest.fixture
+def orders(user):
+    start = datetime(2026, 10, 1, 12)
+    return Order.objects.bulk_create(
+        Order(
+            user=user,
+            order_number=f"D-{index:03}",
+            shipping_address="Street 1",
+            billing_address="Street 1",
+            phone="000",
+            created_at=start + timedelta(hours=index),
+            total_amount=index,
+        )
+        for index in range(40)
+    )
+
+
+def get(user, url=URL, **params):
+    client = APIClient()
+    client.force_authenticate(user)
+    return client.get(url, params)
+
+
+def table(user, **params):
+    return get(user, model="order:order", **params)
+
+
+class TestDashboardTable:
+    def test_serializes_only_the_page(self, staff, orders):
+        with CaptureQueriesContext(connection) as queries:
+            response = table(staff, page_size=15)
+        assert response.status_code == 200
+        assert response.data["count"] == 40
+        assert response.data["count_is_estimate"] is False
+        assert [row["pk"] for row in response.data["results"]] == [
+            order.pk for order in orders[::-1][:15]
+        ]
+        page = next(q["sql"] for q in queries if '"order_order"."id"' in q["sql"])
+        assert "shipping_address" not in page and "LIMIT 16" in page
+
+        seen = [row["pk"] for row in response.data["results"]]
+        while response.data["next"]:
+            response = get(staff, response.data["next"])
+            seen += [row["pk"] for row in response.data["results"]]
+        assert seen == [order.pk for order in orders[::-1]]
+
+    def test_sort_keeps_the_keyset(self, staff, orders):
+        response = table(staff, sort="total_amount", page_size=5)
+        assert [row["total_amount"] for row in response.data["results"]] == [
+            "0.00",
+            "1.00",
+            "2.00",
+            "3.00",
+            "4.00",
+        ]
+        response = get(staff, response.data["next"])
+        assert response.data["results"][0]["total_amount"] == "5.00"
+        assert table(staff, sort="shipping_address").status_code == 400
+
+    def test_large_tables_get_an_estimate(self, staff, orders, settings):
+        settings.DASHBOARD_EXACT_COUNT_LIMIT = 10
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE order_order")
+        response = table(staff)
+        assert response.data["count_is_estimate"] is True
+        assert response.data["count"] == 40
+
+        response = table(staff, search="D-00")
+        assert response.data["count_is_estimate"] is True
+        assert len(response.data["results"]) == 10
+
+    def test_staff_only(self, user, orders):
+        assert table(user).status_code == 403
+        assert get(UserFactory(is_staff=True), model="order:nothing").status_code == 400
+
+
+class TestDashboardSearch:
+    def test_prefix_matches_rank_first(self, staff, orders):
+        Order.objects.filter(pk=orders[5].pk).update(shipping_address="D-01 Tower")
+        response = table(staff, search="D-01")
+        assert [row["order_number"] for row in response.data["results"]][:10] == [
+            f"D-{index:03}" for index in range(19, 9, -1)
+        ]
+        assert response.data["results"][-1]["order_number"] == "D-005"
+
+    def test_trigram_fields_tolerate_typos(self, staff, orders):
+        Order.objects.filter(pk=orders[3].pk).update(
+            shipping_address="12 Enghelab Street, Tehran"
+        )
+        response = table(staff, search="enghlab")
+        assert [row["pk"] for row in response.data["results"]] == [orders[3].pk]
+        # too short for a trigram lookup, prefix fields only
+        assert table(staff, search="en").data["results"] == []
+
+    def test_uses_the_indexes(self, orders):
+        search = get_table("order:order").search
+        with connection.cursor() as cursor:
+            cursor.execute("SET LOCAL enable_seqscan = off")
+        plan = search(Order.objects.all(), "09").explain()
+        assert "order_phone_pattern_idx" in plan
+        assert "Seq Scan" not in plan
+        # word similarity is the operator gin_trgm_ops indexes
+        queryset = search(Order.objects.all(), "Tehran")
+        assert '"shipping_address" %> ' in str(queryset.query)
+
+    def test_contacts(self, staff, user):
+        company = Company.objects.create(name="Acme")
+        contact = Contact.objects.create(
+            name="Sara Ahmadi", email="sara@example.com", company=company
+        )
+        Contact.objects.create(name="Reza Karimi", phone="0912", company=company)
+        response = get(staff, model="crm:contact", search="ahmadi")
+        assert [row["pk"] for row in response.data["results"]] == [contact.pk]
+
+
+class TestDashboardSort:
+    def test_only_declared_sorts(self, staff, orders):
+        response = table(staff, sort="-order_number", page_size=3)
+        assert [row["order_number"] for row in response.data["results"]] == [
+            "D-039",
+            "D-038",
+            "D-037",
+        ]
+        response = table(staff, sort="updated_at")
+        assert response.status_code == 400
+        assert response.data == {"error": "Can't sort on updated_at"}
+
+    def test_check_finds_the_indexes(self, db, monkeypatch):
+        assert check_sort_indexes(databases=["default"]) == []
+        assert check_sort_projections() == []
+
+        monkeypatch.setattr(OrderTable, "sort_fields", ("updated_at", "note"))
+        errors = check_sort_indexes(databases=["default"])
+        assert [error.id for error in errors] == ["dashboard.W001"] * 2
+        assert "(updated_at, id)" in errors[0].msg
+        assert [error.id for error in check_sort_projections()] == ["dashboard.E002"]
+
+
+def bulk(user, **data):
+    client = APIClient()
+    client.force_authenticate(user)
+    return client.post(BULK_URL, data, format="json")
+
+
+class TestDashboardBulk:
+    def test_update_writes_only_changed_fields(
+        self, staff, orders, django_capture_on_commit_callbacks
+    ):
+        rebuild_daily_order_stats()
+        rows = [{"id": order.pk, "status": "shipped"} for order in orders[:30]]
+        rows.append({"id": orders[30].pk, "status": "pending"})
+        with django_capture_on_commit_callbacks(execute=True):
+            with CaptureQueriesContext(connection) as queries:
+                response = bulk(staff, model="order:order", action="update", rows=rows)
+        assert response.status_code == 200
+        assert response.data["counts"] == {"updated": 30, "unchanged": 1}
+        updates = [q["sql"] for q in queries if q["sql"].startswith("UPDATE")]
+        assert len(updates) == 1
+        assert (
+            'SET "status" = (CASE' in updates[0]
+            and "shipping_address" not in updates[0]
+        )
+        assert Order.objects.filter(status="shipped").count() == 30
+
+        live = {
+            (row.date, row.status): row.order_count
+            for row in DailyOrderStats.objects.filter(order_count__gt=0)
+        }
+        rebuild_daily_order_stats()
+        assert live == {
+            (row.date, row.status): row.order_count
+            for row in DailyOrderStats.objects.filter(order_count__gt=0)
+        }
+
+    def test_reports_every_row(self, staff, orders):
+        rows = [
+            {"id": orders[0].pk, "status": "lost"},
+            {"id": 0, "status": "shipped"},
+            {"id": orders[1].pk, "phone": "0912"},
+            {"id": orders[1].pk, "phone": "0913"},
+        ]
+        response = bulk(staff, model="order:order", action="update", rows=rows)
+        results = response.data["results"]
+        assert [result["status"] for result in results] == [
+            "invalid",
+            "not_found",
+            "updated",
+            "invalid",
+        ]
+        assert "status" in results[0]["errors"]
+        assert Order.objects.get(pk=orders[1].pk).phone == "0912"
+
+    def test_create_and_delete(self, staff):
+        company = Company.objects.create(name="Acme")
+        rows = [
+            {"name": f"Contact {index}", "company": company.pk} for index in range(3)
+        ]
+        response = bulk(staff, model="crm:contact", action="create", rows=rows + [{}])
+        assert response.data["counts"] == {"created": 3, "invalid": 1}
+        ids = [result["id"] for result in response.data["results"][:3]]
+        assert Contact.objects.filter(pk__in=ids, company=company).count() == 3
+
+        response = bulk(staff, model="crm:contact", action="delete", rows=ids + [0])
+        assert response.data["counts"] == {"deleted": 3, "not_found": 1}
+        assert not Contact.objects.exists()
+
+    def test_orders_are_not_created(self, staff):
+        response = bulk(staff, model="order:order", action="create", rows=[{}])
+        assert response.status_code == 400
+        assert response.data == {"error": "Invalid action"}
+
+    def test_background_job(
+        self, staff, orders, settings, django_capture_on_commit_callbacks
+    ):
+        settings.DASHBOARD_BULK_INLINE_ROWS = 10
+        rows = [{"id": order.pk, "note": "checked"} for order in orders]
+        with django_capture_on_commit_callbacks(execute=True):
+            response = bulk(staff, model="order:order", action="update", rows=rows)
+        assert response.status_code == 202
+
+        job = get(staff, response.data["url"])
+        assert job.status_code == 200
+        assert job.data["status"] == "done"
+        assert job.data["processed"] == job.data["total"] == 40
+        assert job.data["report"]["counts"] == {"updated": 40}
+        assert Order.objects.filter(note="checked").count() == 40
+
+        other = UserFactory(is_staff=True)
+        assert get(other, response.data["url"]).status_code == 404
+
+    def test_lost_job_is_reported_failed(self, staff, orders, settings):
+        settings.DASHBOARD_BULK_INLINE_ROWS = 10
+        rows = [{"id": order.pk, "note": "checked"} for order in orders]
+        # never enqueued, as if the worker restarted before picking it up
+        response = bulk(staff, model="order:order", action="update", rows=rows)
+        assert get(staff, response.data["url"]).data["status"] == "queued"
+
+        # its process is gone: nothing refreshes the alive key anymore
+        cache.delete(alive_key(response.data["id"]))
+        assert get(staff, response.data["url"]).data["status"] == "failed"
+        run_bulk_job(response.data["id"], rows)
+        assert not Order.objects.filter(note="checked").exists()
+
+    def test_long_chunk_stays_alive(
+        self, staff, settings, monkeypatch, django_capture_on_commit_callbacks
+    ):
+        settings.DASHBOARD_BULK_WORKERS = 1
+        settings.DASHBOARD_BULK_JOB_STALE = 0.3
+        release = threading.Event()
+
+        def slow_write(table, action, rows, progress=None):
+            release.wait(5)
+            return {"action": action, "total": len(rows)}
+
+        monkeypatch.setattr(bulk_module, "bulk_write", slow_write)
+        with django_capture_on_commit_callbacks(execute=True):
+            response = bulk(
+                staff, model="crm:contact", action="delete", rows=[1], background=True
+            )
+        url = response.data["url"]
+        # several timeouts into a single chunk
+        time.sleep(1)
+        assert get(staff, url).data["status"] == "running"
+
+        release.set()
+        for _ in range(50):
+            if get(staff, url).data["status"] != "running":
+                break
+            time.sleep(0.1)
+        assert get(staff, url).data["status"] == "done"
+
+
+class TestArchivedOrderTable:
+    def test_lists_archived_orders_read_only(self, staff, orders):
+        order = orders[0]
+        Order.objects.filter(pk=order.pk).update(status=Order.OrderStatus.COMPLETED)
+        archive_batch([order.pk], before=datetime(2026, 11, 1))
+
+        response = get(staff, model="order:archivedorder", search="D-000")
+        assert [row["pk"] for row in response.data["results"]] == [order.pk]
+        assert response.data["results"][0]["status"] == "completed"
+
+        response = bulk(staff, model="order:archivedorder", action="delete", rows=[1])
+        assert response.status_code == 400
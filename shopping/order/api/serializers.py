@@ -3,11 +3,25 @@ from django.db import transaction
 from django.utils import timezone
 from datetime import timedelta
 from django.db.models import F
+from django.db.models import Sum
 
 from shopping.order.models import Order, Payment, Product, Shipping, Refund, OrderItem
 from shopping.product.api.serializers import VendorSerializer
+from shopping.product.media import media_srcset
+from shopping.product.media import media_url
 from shopping.product.models import Product, ProductVariation
 from shopping.cart.models import CartItem
+from shopping.cart.pricing import cached_pricing
+from shopping.cart.pricing import line_key
+from shopping.cart.pricing import price_totals
+from shopping.cart.store import cart_store_enabled
+from shopping.cart.store import flush_cart
+from shopping.order.exports import EXPORT_FORMATS
+from shopping.order.services import StockReservationError
+from shopping.order.services import check_stock
+from shopping.order.services import next_order_number
+from shopping.order.services import reserve_stock
+from shopping.order.services import unit_price
 
 
 class PaymentSerializer(serializers.ModelSerializer):
@@ -39,6 +53,7 @@ class RefundSerializer(serializers.ModelSerializer):
 
 class ProductSerializer(serializers.ModelSerializer):
     image = serializers.SerializerMethodField()
+    image_srcset = serializers.SerializerMethodField()
 
     class Meta:
         model = Product
@@ -49,22 +64,26 @@ class ProductSerializer(serializers.ModelSerializer):
             "discounted_price",
             "available",
             "image",
+            "image_srcset",
         ]
 
-    def get_image(self, obj):
-        request = self.context.get("request")
+    def _featured_image(self, obj):
         # Use prefetched data if available, otherwise fallback to query
         try:
             image = getattr(obj, "image", [])[0] if getattr(obj, "image", []) else None
         except (IndexError, AttributeError):
             image = obj.images.order_by("-is_featured").first()
-        if image and hasattr(image.image, "url"):
-            return (
-                request.build_absolute_uri(image.image.url)
-                if request
-                else image.image.url
-            )
-        return None
+        return image
+
+    def get_image(self, obj):
+        request = self.context.get("request")
+        image = self._featured_image(obj)
+        return media_url(image.image, request) if image else None
+
+    def get_image_srcset(self, obj):
+        request = self.context.get("request")
+        image = self._featured_image(obj)
+        return media_srcset(image.image_derivatives, request) if image else {}
 
 
 class StockValidationError(serializers.ValidationError):
@@ -72,6 +91,25 @@ class StockValidationError(serializers.ValidationError):
         super().__init__({"result": "error", "message": message, "status_code": 403})
 
 
+def stock_lines(items_data):
+    """`(product_id, variation_id, quantity)` lines for the stock services."""
+    return [
+        (
+            item["product"].id,
+            item["variation"].id if item.get("variation") else None,
+            item["quantity"],
+        )
+        for item in items_data
+    ]
+
+
+def reserve_items_stock(items_data):
+    try:
+        reserve_stock(stock_lines(items_data))
+    except StockReservationError as error:
+        raise StockValidationError(str(error)) from error
+
+
 class OrderItemSerializer(serializers.ModelSerializer):
     class VariationSerializer(serializers.ModelSerializer):
         attribute_name = serializers.CharField(
@@ -122,51 +160,59 @@ class OrderSerializer(serializers.ModelSerializer):
         }
 
     def validate_items(self, items_data):
-        # Track quantities for each product+variation combination
-        quantity_totals = {}
+        try:
+            check_stock(stock_lines(items_data))
+        except StockReservationError as error:
+            raise StockValidationError(str(error)) from error
+        return items_data
 
-        for item in items_data:
-            product = item["product"]
-            variation = item.get("variation")
-            quantity = item["quantity"]
-
-            # Create unique key for product+variation combination
-            key = f"{product.id}_{variation.id if variation else 'none'}"
-
-            # Add to total quantity for this combination
-            if key in quantity_totals:
-                quantity_totals[key] += quantity
-            else:
-                quantity_totals[key] = quantity
-
-            # Check if variation exists for product
-            if variation:
-                if not ProductVariation.objects.filter(
-                    id=variation.id, product=product
-                ).exists():
-                    raise StockValidationError(
-                        f"Variation {variation.id} does not exist for product {product.id}"
-                    )
 
-                # Check if total quantity exceeds variation stock
-                if variation.stock < quantity_totals[key]:
-                    raise StockValidationError(
-                        f"Not enough stock for variation {variation.id}. Available: {variation.stock}, Requested: {quantity_totals[key]}"
-                    )
-            else:
-                # Check if total quantity exceeds product stock
-                if product.stock < quantity_totals[key]:
-                    raise StockValidationError(
-                        f"Not enough stock for product {product.id}. Available: {product.stock}, Requested: {quantity_totals[key]}"
-                    )
+class OrderSummarySerializer(serializers.ModelSerializer):
+    item_count = serializers.SerializerMethodField()
+    image = serializers.SerializerMethodField()
+    image_srcset = serializers.SerializerMethodField()
 
-        return items_data
+    class Meta:
+        model = Order
+        fields = (
+            "id",
+            "order_number",
+            "status",
+            "total_amount",
+            "created_at",
+            "item_count",
+            "image",
+            "image_srcset",
+        )
+
+    def get_item_count(self, obj):
+        # order_summaries() annotates the count, fall back to a query
+        if hasattr(obj, "item_count"):
+            return obj.item_count
+        return obj.items.aggregate(count=Sum("quantity"))["count"] or 0
+
+    def _first_image(self, obj):
+        if hasattr(obj, "image"):
+            return obj.image, obj.image_derivatives
+        item = obj.items.order_by("id").first()
+        image = item and item.product.images.order_by("-is_featured", "id").first()
+        return (image.image, image.image_derivatives) if image else (None, None)
+
+    def get_image(self, obj):
+        image, _ = self._first_image(obj)
+        return media_url(image, self.context.get("request"))
+
+    def get_image_srcset(self, obj):
+        _, derivatives = self._first_image(obj)
+        return media_srcset(derivatives, self.context.get("request"))
 
 
 class OrderItemCreateSerializer(serializers.ModelSerializer):
-    product = serializers.PrimaryKeyRelatedField(queryset=Product.objects.all())
-    variation = serializers.PrimaryKeyRelatedField(
-        queryset=ProductVariation.objects.all(), required=False, allow_null=True
+    # plain ids, OrderCreateSerializer.validate_items resolves all of them in
+    # two queries instead of one per line and field
+    product = serializers.IntegerField(source="product_id")
+    variation = serializers.IntegerField(
+        source="variation_id", required=False, allow_null=True
     )
 
     class Meta:
@@ -185,6 +231,60 @@ class OrderCreateSerializer(serializers.ModelSerializer):
     class Meta:
         model = Order
         exclude = ("user",)
+        extra_kwargs = {
+            "order_number": {"read_only": True},
+            "total_amount": {"read_only": True},
+        }
+
+    def validate_items(self, items_data):
+        products = Product.objects.in_bulk({item["product_id"] for item in items_data})
+        variations = ProductVariation.objects.in_bulk(
+            {item["variation_id"] for item in items_data if item.get("variation_id")}
+        )
+        for item in items_data:
+            product_id = item.pop("product_id")
+            variation_id = item.pop("variation_id", None)
+            product = products.get(product_id)
+            if product is None:
+                raise serializers.ValidationError(
+                    f"Product {product_id} does not exist."
+                )
+            if product.discounted_price is None:
+                raise serializers.ValidationError(f"Product {product.id} has no price.")
+            item["product"] = product
+            if variation_id:
+                variation = variations.get(variation_id)
+                if variation is None or variation.product_id != product.id:
+                    raise StockValidationError(
+                        f"Variation {variation_id} does not exist for product {product.id}"
+                    )
+                item["variation"] = variation
+        return items_data
+
+    def build_items(self, order, items_data, prices=None):
+        """
+        Unsaved OrderItems priced from the catalog, never from the payload.
+
+        `prices` are unit prices by `line_key()` already worked out for the
+        same lines by the cart pricing, used instead of recomputing them.
+        """
+        items = []
+        for item in items_data:
+            product = item["product"]
+            variation = item.get("variation")
+            price = (prices or {}).get(line_key(product.id, variation and variation.id))
+            if price is None:
+                price = unit_price(product, variation)
+            items.append(
+                OrderItem(
+                    order=order,
+                    product=product,
+                    variation=variation,
+                    quantity=item["quantity"],
+                    price=price,
+                )
+            )
+        return items
 
     def create(self, validated_data):
         with transaction.atomic():
@@ -193,25 +293,32 @@ class OrderCreateSerializer(serializers.ModelSerializer):
             shipping_data = validated_data.pop("shipping")
             payment_data_list = validated_data.pop("payments")
 
-            # Create order
-            order = Order.objects.create(**validated_data)
-
-            # Create shipping
-            Shipping.objects.create(order=order, **shipping_data)
-
-            # Create payments
-            for payment_data in payment_data_list:
-                Payment.objects.create(order=order, **payment_data)
-
-            # Create order items
-            for item_data in items_data:
-                OrderItem.objects.create(
-                    order=order,
-                    product=item_data["product"],
-                    variation=item_data.get("variation"),
-                    quantity=item_data["quantity"],
-                    price=item_data["price"],
+            reserve_items_stock(items_data)
+
+            # Create order, lines are built in memory and inserted in bulk
+            order = Order(**validated_data, order_number=next_order_number())
+            # checking out the cart as it was last shown reuses its pricing,
+            # so the order costs what the cart said
+            pricing = cached_pricing(order.user_id, stock_lines(items_data))
+            prices = pricing and {
+                key: line["unit_price"] for key, line in pricing["lines"].items()
+            }
+            items = self.build_items(order, items_data, prices)
+            if pricing is None:
+                pricing = price_totals(
+                    sum(item.price * item.quantity for item in items)
                 )
+            order.total_amount = pricing["total"]
+            order.save()
+            Shipping.objects.create(order=order, **shipping_data)
+            Payment.objects.bulk_create(
+                Payment(order=order, **payment_data)
+                for payment_data in payment_data_list
+            )
+            OrderItem.objects.bulk_create(items)
+            # the stored cart is persisted at checkout at the latest
+            if cart_store_enabled():
+                flush_cart(order.user_id)
 
             return order
 
@@ -240,68 +347,26 @@ class OrderCreateSerializer(serializers.ModelSerializer):
             # Update items if provided
             if "items" in self.validated_data:
                 items_data = self.validated_data.pop("items")
-                # Track processed items to handle duplicates
-                processed_items = {}
+                reserve_items_stock(items_data)
 
+                # merge into the existing lines, duplicates in the payload too
+                order_items = {
+                    (item.product_id, item.variation_id): item
+                    for item in instance.items.all()
+                }
                 for item_data in items_data:
-                    product = item_data["product"]
-                    variation = item_data.get("variation").id
-                    variation = ProductVariation.objects.get(id=variation)
-                    quantity = item_data["quantity"]
-
-                    # Create unique key for product+variation combination
-                    key = f"{product.id}_{variation.id}"
-
-                    try:
-                        # Try to find existing order item
-                        order_item = OrderItem.objects.get(
-                            order=instance, product=product, variation=variation
-                        )
-                        # Check if adding quantity would exceed stock
-                        if variation.stock < quantity:
-                            raise StockValidationError(
-                                f"Adding {quantity} would exceed variation stock. Available: {variation.stock}"
-                            )
-                        # Reduce stock
-                        variation.stock = variation.stock - quantity
-                        variation.save()
-
-                        # Update quantity
-                        order_item.quantity = order_item.quantity + quantity
-                        order_item.save()
-                        processed_items[key] = order_item
-
-                    except OrderItem.DoesNotExist:
-                        if key not in processed_items:
-                            # Check if product has enough stock
-                            if variation.stock < quantity:
-                                raise StockValidationError(
-                                    f"Not enough stock for variation {variation.id}. Available: {variation.stock}"
-                                )
-                            # Reduce stock
-                            variation.stock = variation.stock - quantity
-                            variation.save()
-
-                            # Create new order item
-                            order_item = OrderItem.objects.create(
-                                order=instance, **item_data
-                            )
-                            processed_items[key] = order_item
-                        else:
-                            # Update existing item's quantity
-                            order_item = processed_items[key]
-
-                            # Check if adding quantity would exceed stock
-                            if variation.stock < quantity:
-                                raise StockValidationError(
-                                    f"Adding {quantity} would exceed variation stock. Available: {variation.stock}"
-                                )
-                            # Reduce stock
-                            variation.stock = variation.stock - quantity
-                            variation.save()
-
-                            order_item.quantity = order_item.quantity + quantity
-                            order_item.save()
+                    variation = item_data.get("variation")
+                    key = (item_data["product"].id, variation.id if variation else None)
+                    order_item = order_items.get(key)
+                    if order_item is None:
+                        (order_items[key],) = self.build_items(instance, [item_data])
+                        order_items[key].save()
+                    else:
+                        order_item.quantity = F("quantity") + item_data["quantity"]
+                        order_item.save(update_fields=["quantity"])
+                instance.total_amount = instance.items.aggregate(
+                    total=Sum(F("price") * F("quantity"))
+                )["total"]
 
             instance.save()
 
@@ -310,6 +375,21 @@ class OrderCreateSerializer(serializers.ModelSerializer):
             return instance
 
 
+class OrderExportParamsSerializer(serializers.Serializer):
+    type = serializers.ChoiceField(choices=sorted(EXPORT_FORMATS), default="csv")
+    start = serializers.DateField(required=False)
+    end = serializers.DateField(required=False)
+    status = serializers.ListField(
+        child=serializers.ChoiceField(choices=Order.OrderStatus.choices),
+        required=False,
+    )
+
+    def validate(self, attrs):
+        if attrs.get("start") and attrs.get("end") and attrs["start"] > attrs["end"]:
+            raise serializers.ValidationError("start must not be after end.")
+        return attrs
+
+
 class OrderChartDataSerializer(serializers.Serializer):
     class SellDaySerializer(serializers.Serializer):
         day = serializers.DateField()
@@ -1,6 +1,7 @@
 from shopping.order.api.views import (
     OrderAPIViewSet,
     AdminOrderAPI,
+    OrderExportAPIView,
     DashboardLastOrderList,
 )
 from rest_framework.routers import DefaultRouter
@@ -15,4 +16,5 @@ app_name = "order"
 urlpatterns = [
     path("dashboard/chart-data/", AdminOrderAPI.as_view(), name="chart_data"),
     path("dashboard/last-orders/", DashboardLastOrderList.as_view(), name="last_order"),
+    path("dashboard/export/", OrderExportAPIView.as_view(), name="export"),
 ] + router.urls
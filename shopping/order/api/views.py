@@ -4,16 +4,22 @@ from rest_framework.views import APIView
 from rest_framework.viewsets import ModelViewSet
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from django.db import transaction
+from django.http import Http404
+from django.shortcuts import get_object_or_404
 from django.db.models import F, Q
 from shopping.order.api.serializers import (
     OrderSerializer,
     OrderCreateSerializer,
+    OrderSummarySerializer,
     StockValidationError,
     ShippingSerializer,
     OrderChartDataSerializer,
+    OrderExportParamsSerializer,
     DashboardLastOrderSerializer,
 )
 from shopping.order.models import (
+    ArchivedOrder,
+    DailyOrderStats,
     Order,
     Payment,
     Refund,
@@ -21,16 +27,24 @@ from shopping.order.models import (
     ProductVariation,
     Shipping,
 )
+from shopping.order.archive import restore_order
+from shopping.order.exports import archived_export_queryset
+from shopping.order.exports import export_queryset
+from shopping.order.exports import export_response
+from shopping.order.exports import order_records
+from shopping.order.paginations import OrderCursorPagination
+from shopping.order.selectors import archived_order_summaries
+from shopping.order.selectors import order_summaries
 from shopping.product.models import ProductImage
 
 from rest_framework import status
 from rest_framework.response import Response
 from datetime import date, timedelta
 from collections import defaultdict
-from django.db.models import Count, Sum
-from django.db.models.functions import TruncDate
 import logging
 
+from config.idempotency import idempotent
+
 logger = logging.getLogger("django")
 
 
@@ -39,8 +53,11 @@ class OrderAPIViewSet(ModelViewSet):
     permission_classes = [IsAuthenticated]
     lookup_url_kwarg = "pk"
     queryset = Order.objects.all()
+    pagination_class = OrderCursorPagination
 
     def get_serializer_class(self):
+        if self.action == "list":
+            return OrderSummarySerializer
         return (
             OrderCreateSerializer
             if self.action == "create" or self.action == "partial_update"
@@ -48,15 +65,23 @@ class OrderAPIViewSet(ModelViewSet):
         )
 
     def get_queryset(self):
+        if self.action == "list":
+            # the customer's own history, flat summaries only
+            return order_summaries(self.request.user)
+
         # Get the filtered queryset first
         queryset = super().get_queryset()
+        if not self.request.user.is_staff:
+            queryset = queryset.filter(user=self.request.user)
         prefetch_args = []
 
         # Always prefetch items and their related data
         prefetch_args.append(
             Prefetch(
                 "items",
-                queryset=OrderItem.objects.select_related("product", "variation"),
+                queryset=OrderItem.objects.select_related(
+                    "product", "variation__attribute__attribute_type"
+                ).prefetch_related("refunds"),
             )
         )
 
@@ -81,20 +106,37 @@ class OrderAPIViewSet(ModelViewSet):
 
         return queryset.select_related("shipping", "user")
 
-    def list(self, request, *args, **kwargs):
-        import time
+    def get_archived_queryset(self):
+        # archived history continues the list, see OrderCursorPagination
+        if self.action == "list":
+            return archived_order_summaries(self.request.user)
+        return None
 
-        # time.sleep()
-        print("testsssssssssss")
-        logger.warning("test me")
-        return super().list(request, *args, **kwargs)
+    def retrieve(self, request, *args, **kwargs):
+        try:
+            return super().retrieve(request, *args, **kwargs)
+        except Http404:
+            pass
+        # an order of a closed month, served from its archived snapshot
+        archived = ArchivedOrder.objects.all()
+        if not request.user.is_staff:
+            archived = archived.filter(user=request.user)
+        archived = get_object_or_404(archived, pk=kwargs[self.lookup_url_kwarg])
+        serializer = OrderSerializer(
+            restore_order(archived), context=self.get_serializer_context()
+        )
+        return Response(serializer.data)
 
+    @idempotent
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         order = serializer.save(user=self.request.user)
+        # reload with the list prefetches instead of lazy loading every line
+        order = self.get_queryset().get(pk=order.pk)
         return Response(OrderSerializer(order).data, status=status.HTTP_201_CREATED)
 
+    @idempotent
     def partial_update(self, request, *args, **kwargs):
         instance = self.get_object()
         serializer = self.get_serializer(instance, data=request.data, partial=True)
@@ -119,6 +161,8 @@ class AdminOrderAPI(ListAPIView):
                 "7d": timedelta(days=7),
                 "30d": timedelta(days=30),
                 "90d": timedelta(days=90),
+                "180d": timedelta(days=180),
+                "365d": timedelta(days=365),
             },
         )
         duration_key = request.query_params.get("period", "7d")
@@ -128,28 +172,25 @@ class AdminOrderAPI(ListAPIView):
             period = today - time_filter[duration_key]
         last_period = period - time_filter[duration_key]
 
-        queryset = (
-            Order.objects.filter(
-                created_at__gte=period, status=Order.OrderStatus.COMPLETED.value
-            )
-            .annotate(day=TruncDate("created_at"))
-            .values("day")  # Group by day
-            .annotate(count=Count("id"))  # Count orders per day
-            .order_by("day")  # order by day ascending (optional)
-        )
-        total_count = sum(item["count"] for item in queryset)
-        last_period_qs = Order.objects.filter(
-            created_at__gte=last_period,
-            created_at__lt=period,
+        # one rollup row per day covers both periods, whatever the volume
+        rows = DailyOrderStats.objects.filter(
+            date__gte=last_period,
             status=Order.OrderStatus.COMPLETED.value,
-        ).aggregate(count=Count("id"))
-        last_count = last_period_qs["count"] or 0
+            order_count__gt=0,
+        ).order_by("date")
+        days = [
+            {"day": row.date, "count": row.order_count}
+            for row in rows
+            if row.date >= period
+        ]
+        total_count = sum(item["count"] for item in days)
+        last_count = sum(row.order_count for row in rows if row.date < period)
         growth_percent = 0
         if last_count > 0:
             growth_percent = ((total_count - last_count) / last_count) * 100
 
         data = {
-            "days": list(queryset),
+            "days": days,
             "total_count": total_count,
             "growth_percent": int(growth_percent),
         }
@@ -159,6 +200,33 @@ class AdminOrderAPI(ListAPIView):
         return Response(serializer.data)
 
 
+class OrderExportAPIView(APIView):
+    """
+    Streams orders with their items, payments and shipping for the back office.
+
+    `?type=csv|ndjson&start=YYYY-MM-DD&end=YYYY-MM-DD&status=...` (status can
+    be repeated). Rows are read through a server-side cursor and written as
+    they come, so memory stays flat whatever the range. Archived orders are
+    included.
+    """
+
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        params = OrderExportParamsSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        params = params.validated_data
+        filters = (params.get("start"), params.get("end"), params.get("status"))
+        records = order_records(
+            export_queryset(*filters), archived=archived_export_queryset(*filters)
+        )
+        span = "-".join(
+            str(params[bound]) for bound in ("start", "end") if bound in params
+        )
+        filename = f"orders{'-' + span if span else ''}.{params['type']}"
+        return export_response(request, params["type"], records, filename)
+
+
 class ShippingListAPIView(ListAPIView):
     serializer_class = ShippingSerializer
     queryset = Shipping.objects.all()
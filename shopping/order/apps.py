@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class OrderConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "shopping.order"
+
+    def ready(self):
+        from shopping.order import checks
+        from shopping.order import signals
@@ -0,0 +1,175 @@
+from datetime import date
+
+from django.conf import settings
+from django.db import connection
+from django.db import transaction
+from django.db.models import Prefetch
+
+from shopping.order.models import ArchivedOrder
+from shopping.order.models import Order
+from shopping.order.models import OrderItem
+from shopping.order.models import Payment
+from shopping.order.models import Refund
+from shopping.order.models import Shipping
+from shopping.product.models import Product
+from shopping.product.models import ProductVariation
+
+# orders nothing will happen to anymore, open ones stay live whatever their age
+CLOSED_STATUSES = (
+    Order.OrderStatus.DELIVERED,
+    Order.OrderStatus.COMPLETED,
+    Order.OrderStatus.CANCELLED,
+    Order.OrderStatus.REFUNDED,
+)
+ARCHIVE_BATCH_SIZE = 1000
+
+
+def archive_cutoff(keep_months=None, today=None):
+    """First day of the oldest month kept live, every month before it is closed."""
+    if keep_months is None:
+        keep_months = settings.ORDER_ARCHIVE_KEEP_MONTHS
+    today = today or date.today()
+    months = today.year * 12 + today.month - 1 - keep_months
+    return date(months // 12, months % 12 + 1, 1)
+
+
+def archivable_orders(before, statuses=CLOSED_STATUSES):
+    return Order.objects.filter(created_at__lt=before, status__in=statuses)
+
+
+def _row(instance):
+    return {
+        field.attname: getattr(instance, field.attname)
+        for field in instance._meta.concrete_fields
+    }
+
+
+def archive_document(order):
+    """The order and everything hanging off it, as stored in ArchivedOrder.data."""
+    shipping = getattr(order, "shipping", None)
+    return {
+        **_row(order),
+        "items": [_row(item) for item in order.items.all()],
+        "payments": [_row(payment) for payment in order.payments.all()],
+        "shipping": _row(shipping) if shipping else None,
+        "refunds": [_row(refund) for refund in order.refunds.all()],
+    }
+
+
+def _instance(model, row):
+    return model(
+        **{
+            field.attname: field.to_python(row[field.attname])
+            for field in model._meta.concrete_fields
+            if field.attname in row
+        }
+    )
+
+
+def restore_order(archived):
+    """
+    The Order of an `archive_document()`, rebuilt in memory.
+
+    Its items, payments, shipping and refunds are set up as if prefetched,
+    so the order serializers read it like a live order. Products and
+    variations still in the catalog are loaded in one query each.
+    """
+    return restore_orders([archived])[0]
+
+
+def restore_orders(archived_orders):
+    """`restore_order()` of many archived orders, sharing the catalog queries."""
+    restored = []
+    for archived in archived_orders:
+        data = archived.data
+        order = _instance(Order, data)
+        items = [_instance(OrderItem, row) for row in data["items"]]
+        refunds = [_instance(Refund, row) for row in data["refunds"]]
+        for item in items:
+            item.order = order
+            item._prefetched_objects_cache = {
+                "refunds": [r for r in refunds if r.order_item_id == item.pk]
+            }
+        order._prefetched_objects_cache = {
+            "items": items,
+            "payments": [_instance(Payment, row) for row in data["payments"]],
+            "refunds": refunds,
+        }
+        shipping = data["shipping"]
+        order._state.fields_cache["shipping"] = (
+            _instance(Shipping, shipping) if shipping else None
+        )
+        restored.append(order)
+
+    items = [item for order in restored for item in order.items.all()]
+    products = Product.objects.prefetch_related("images").in_bulk(
+        {item.product_id for item in items}
+    )
+    variations = ProductVariation.objects.select_related(
+        "attribute__attribute_type"
+    ).in_bulk({item.variation_id for item in items if item.variation_id})
+    for item in items:
+        item._state.fields_cache["product"] = products.get(item.product_id)
+        item._state.fields_cache["variation"] = variations.get(item.variation_id)
+    return restored
+
+
+def _delete(model, column, ids):
+    # plain DELETEs: no signals, so DailyOrderStats keeps counting the
+    # archived orders, and no Refund PROTECT check since refunds go too
+    table = connection.ops.quote_name(model._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {table} WHERE {column} = ANY(%s)", [ids])
+        return cursor.rowcount
+
+
+@transaction.atomic
+def archive_batch(order_ids, before, statuses=CLOSED_STATUSES):
+    """
+    Moves the given orders into ArchivedOrder in one transaction.
+
+    The orders are locked and re-checked first, so one reopened concurrently
+    stays live.
+    """
+    orders = list(
+        archivable_orders(before, statuses)
+        .filter(pk__in=order_ids)
+        .select_for_update(of=("self",))
+        .select_related("shipping")
+        .prefetch_related(
+            Prefetch("items", queryset=OrderItem.objects.order_by("id")),
+            Prefetch("payments", queryset=Payment.objects.order_by("id")),
+            Prefetch("refunds", queryset=Refund.objects.order_by("id")),
+        )
+        .order_by("pk")
+    )
+    if not orders:
+        return 0
+    ArchivedOrder.objects.bulk_create(
+        ArchivedOrder(
+            id=order.pk,
+            user_id=order.user_id,
+            order_number=order.order_number,
+            status=order.status,
+            created_at=order.created_at,
+            total_amount=order.total_amount,
+            data=archive_document(order),
+        )
+        for order in orders
+    )
+    ids = [order.pk for order in orders]
+    for model in (Refund, Payment, Shipping, OrderItem):
+        _delete(model, "order_id", ids)
+    return _delete(Order, "id", ids)
+
+
+def archive_orders(before, statuses=CLOSED_STATUSES, batch_size=ARCHIVE_BATCH_SIZE):
+    """
+    Moves closed orders created before `before` out of the live tables.
+
+    Works in short batches of `batch_size` orders, each its own transaction,
+    walking `order_created_idx`. Yields the number archived per batch.
+    """
+    queryset = archivable_orders(before, statuses).order_by("created_at", "id")
+    while ids := list(queryset.values_list("pk", flat=True)[:batch_size]):
+        yield archive_batch(ids, before, statuses)
@@ -0,0 +1,27 @@
+from datetime import date
+
+from django.conf import settings
+from django.core.checks import Error
+from django.core.checks import register
+
+from shopping.order.models import Order
+from shopping.order.services import format_order_number
+
+
+@register()
+def check_order_number_length(app_configs=None, **kwargs):
+    """Generated order numbers fit `Order.order_number`."""
+    day = date.today() if settings.ORDER_NUMBER_DAILY else None
+    number = format_order_number(settings.ORDER_NUMBER_PREFIX, day, 1)
+    max_length = Order._meta.get_field("order_number").max_length
+    if len(number) <= max_length:
+        return []
+    return [
+        Error(
+            f"Order numbers like {number} are longer than the {max_length} "
+            "characters of Order.order_number, checkout would fail.",
+            hint="Shorten ORDER_NUMBER_PREFIX or lower ORDER_NUMBER_DIGITS.",
+            obj=Order,
+            id="order.E001",
+        )
+    ]
@@ -0,0 +1,58 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand
+from django.core.management.base import CommandError
+
+from shopping.order.archive import ARCHIVE_BATCH_SIZE
+from shopping.order.archive import archivable_orders
+from shopping.order.archive import archive_cutoff
+from shopping.order.archive import archive_orders
+
+
+class Command(BaseCommand):
+    help = (
+        "Moves closed orders of closed months (with their items, payments, "
+        "shipping and refunds) from the live tables into ArchivedOrder."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--keep-months",
+            type=int,
+            help="Whole months kept live, defaults to ORDER_ARCHIVE_KEEP_MONTHS.",
+        )
+        parser.add_argument(
+            "--before",
+            type=date.fromisoformat,
+            help="Archive months before this one instead (YYYY-MM-01).",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=ARCHIVE_BATCH_SIZE,
+            help="Orders moved per transaction.",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only count the orders that would be archived.",
+        )
+
+    def handle(self, *args, **options):
+        before = options["before"] or archive_cutoff(options["keep_months"])
+        if before.day != 1:
+            raise CommandError("--before must be the first day of a month.")
+
+        if options["dry_run"]:
+            count = archivable_orders(before).count()
+            self.stdout.write(f"{count} orders created before {before} to archive")
+            return
+
+        archived = 0
+        for moved in archive_orders(before, batch_size=options["batch_size"]):
+            archived += moved
+            self.stdout.write(f"Archived {archived} orders", ending="\r")
+        self.stdout.write("")
+        self.stdout.write(
+            self.style.SUCCESS(f"Archived {archived} orders created before {before}")
+        )
@@ -0,0 +1,98 @@
+import time
+import uuid
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test.utils import CaptureQueriesContext
+from django.test.utils import override_settings
+from django.db import connection
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from shopping.product.models import Category
+from shopping.product.models import Product
+from shopping.product.models import ProductVariation
+from shopping.users.models import User
+
+
+def order_payload(variations, lines):
+    return {
+        "shipping_address": "Benchmark street 1",
+        "billing_address": "Benchmark street 1",
+        "phone": "000",
+        "created_at": timezone.now().isoformat(),
+        "items": [
+            {"product": variation.product_id, "variation": variation.pk, "quantity": 1}
+            for variation in variations[:lines]
+        ],
+        "payments": [{"amount": "1.00", "payment_method": "card"}],
+        "shipping": {"carrier": "post", "estimated_delivery": "2030-01-01"},
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "Creates 1, 10 and 100-line orders through the API inside a rolled "
+        "back transaction and reports round trips and latency."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--lines",
+            type=int,
+            nargs="+",
+            default=[1, 10, 100],
+            help="Order sizes to measure.",
+        )
+        parser.add_argument(
+            "--repeat", type=int, default=5, help="Orders per size, best is kept."
+        )
+
+    @override_settings(ALLOWED_HOSTS=["testserver"])
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self.benchmark(options["lines"], options["repeat"])
+            transaction.set_rollback(True)
+
+    def benchmark(self, sizes, repeat):
+        suffix = uuid.uuid4().hex[:8]
+        user = User.objects.create(email=f"benchmark-{suffix}@example.com")
+        category = Category.objects.create(name="Benchmark", slug=f"bench-{suffix}")
+        variations = []
+        for index in range(max(sizes)):
+            product = Product.objects.create(
+                name=f"Benchmark {index}",
+                slug=f"bench-{suffix}-{index}",
+                description="",
+                category=category,
+                vendor=user,
+                discounted_price=Decimal("10.00"),
+            )
+            variations.append(
+                ProductVariation.objects.create(
+                    product=product, stock=repeat * len(sizes)
+                )
+            )
+
+        client = APIClient()
+        client.force_authenticate(user)
+        for lines in sizes:
+            best, queries = None, None
+            for _ in range(repeat):
+                with CaptureQueriesContext(connection) as captured:
+                    started = time.perf_counter()
+                    response = client.post(
+                        "/api/order/v1/",
+                        order_payload(variations, lines),
+                        format="json",
+                    )
+                    elapsed = time.perf_counter() - started
+                if response.status_code != 201:
+                    self.stderr.write(
+                        f"{lines} lines: {response.status_code} {response.content[:300]}"
+                    )
+                    return
+                best = elapsed if best is None else min(best, elapsed)
+                queries = len(captured)
+            self.stdout.write(f"{lines} lines: {queries} queries, {best * 1000:.1f} ms")
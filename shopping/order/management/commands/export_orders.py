@@ -0,0 +1,57 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from shopping.order.exports import EXPORT_CHUNK_SIZE
+from shopping.order.exports import EXPORT_FORMATS
+from shopping.order.exports import archived_export_queryset
+from shopping.order.exports import export_lines
+from shopping.order.exports import export_queryset
+from shopping.order.exports import order_records
+from shopping.order.models import Order
+
+
+class Command(BaseCommand):
+    help = (
+        "Streams orders, archived ones included, with their items, payments "
+        "and shipping as CSV or NDJSON, with constant memory."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--type", choices=sorted(EXPORT_FORMATS), default="csv")
+        parser.add_argument(
+            "--start", type=date.fromisoformat, help="First day (YYYY-MM-DD)."
+        )
+        parser.add_argument(
+            "--end", type=date.fromisoformat, help="Last day (YYYY-MM-DD)."
+        )
+        parser.add_argument(
+            "--status",
+            action="append",
+            choices=Order.OrderStatus.values,
+            help="Only orders in this status, can be repeated.",
+        )
+        parser.add_argument(
+            "--output", help="File to write to, defaults to standard output."
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=EXPORT_CHUNK_SIZE,
+            help="Orders fetched (and prefetched) per round trip.",
+        )
+
+    def handle(self, *args, **options):
+        filters = (options["start"], options["end"], options["status"])
+        records = order_records(
+            export_queryset(*filters),
+            options["chunk_size"],
+            archived=archived_export_queryset(*filters),
+        )
+        lines = export_lines(options["type"], records)
+        if options["output"]:
+            with open(options["output"], "wb") as output:
+                output.writelines(lines)
+        else:
+            for line in lines:
+                self.stdout.write(line.decode(), ending="")
@@ -0,0 +1,28 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from shopping.order.stats import rebuild_daily_order_stats
+
+
+class Command(BaseCommand):
+    help = (
+        "Recomputes the DailyOrderStats rollup from the orders, for a date "
+        "range or for all dates."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--start",
+            type=date.fromisoformat,
+            help="First date to rebuild (YYYY-MM-DD), defaults to the first order.",
+        )
+        parser.add_argument(
+            "--end",
+            type=date.fromisoformat,
+            help="Last date to rebuild (YYYY-MM-DD), defaults to the last order.",
+        )
+
+    def handle(self, *args, **options):
+        rows = rebuild_daily_order_stats(options["start"], options["end"])
+        self.stdout.write(self.style.SUCCESS(f"Wrote {rows} rollup rows"))
@@ -0,0 +1,79 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:24
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+
+
+def backfill_daily_order_stats(apps, schema_editor):
+    Order = apps.get_model("order", "Order")
+    DailyOrderStats = apps.get_model("order", "DailyOrderStats")
+    rows = (
+        Order.objects.annotate(day=TruncDate("created_at"))
+        .values("day", "status")
+        .annotate(order_count=Count("id"), revenue=Sum("total_amount"))
+        .order_by()
+    )
+    DailyOrderStats.objects.bulk_create(
+        DailyOrderStats(
+            date=row["day"],
+            status=row["status"],
+            order_count=row["order_count"],
+            revenue=row["revenue"] or 0,
+        )
+        for row in rows
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("order", "0003_alter_order_created_at"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DailyOrderStats",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("date", models.DateField()),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("pending", "Pending"),
+                            ("processing", "Processing"),
+                            ("shipped", "Shipped"),
+                            ("delivered", "Delivered"),
+                            ("canceled", "Cancelled"),
+                            ("refunded", "Refunded"),
+                            ("completed", "Completed"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                ("order_count", models.IntegerField(default=0)),
+                (
+                    "revenue",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=14),
+                ),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("date", "status"),
+                        name="daily_order_stats_date_status_uniq",
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(backfill_daily_order_stats, migrations.RunPython.noop),
+    ]
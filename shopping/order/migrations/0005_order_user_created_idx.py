@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:26
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("order", "0004_daily_order_stats"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="order",
+            index=models.Index(
+                fields=["user", "-created_at", "-id"], name="order_user_created_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:31
+
+import django.core.serializers.json
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("order", "0006_order_created_idx"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ArchivedOrder",
+            fields=[
+                ("id", models.BigIntegerField(primary_key=True, serialize=False)),
+                ("order_number", models.CharField(max_length=20, unique=True)),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("pending", "Pending"),
+                            ("processing", "Processing"),
+                            ("shipped", "Shipped"),
+                            ("delivered", "Delivered"),
+                            ("canceled", "Cancelled"),
+                            ("refunded", "Refunded"),
+                            ("completed", "Completed"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                ("created_at", models.DateTimeField()),
+                ("total_amount", models.DecimalField(decimal_places=2, max_digits=10)),
+                ("archived_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "data",
+                    models.JSONField(
+                        encoder=django.core.serializers.json.DjangoJSONEncoder
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["user", "-created_at", "-id"],
+                        name="archived_order_user_idx",
+                    ),
+                    models.Index(
+                        fields=["created_at", "id"], name="archived_order_created_idx"
+                    ),
+                ],
+            },
+        ),
+    ]
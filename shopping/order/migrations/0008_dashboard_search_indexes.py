@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:44
+
+import django.contrib.postgres.indexes
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        # pg_trgm
+        ("product", "0005_product_search_vector"),
+        ("order", "0007_archived_order"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="order",
+            index=models.Index(
+                fields=["phone"],
+                name="order_phone_pattern_idx",
+                opclasses=["text_pattern_ops"],
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="order",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["shipping_address"],
+                name="order_shipping_trgm_gin",
+                opclasses=["gin_trgm_ops"],
+            ),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:48
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("order", "0008_dashboard_search_indexes"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="order",
+            index=models.Index(fields=["total_amount", "id"], name="order_total_idx"),
+        ),
+    ]
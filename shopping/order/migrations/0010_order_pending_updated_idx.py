@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:20
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("order", "0009_dashboard_sort_indexes"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="order",
+            index=models.Index(
+                condition=models.Q(("status", "pending")),
+                fields=["updated_at"],
+                name="order_pending_updated_idx",
+            ),
+        ),
+    ]
@@ -1,5 +1,8 @@
+from datetime import datetime
 from datetime import timedelta
 
+from django.contrib.postgres.indexes import GinIndex
+from django.core.serializers.json import DjangoJSONEncoder
 from django.core.validators import MaxValueValidator
 from django.core.validators import MinValueValidator
 from django.db import models
@@ -35,12 +38,125 @@ class Order(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     total_amount = models.DecimalField(max_digits=10, decimal_places=2)
 
+    class Meta:
+        indexes = [
+            # keyset pagination of a customer's orders on (created_at, id)
+            models.Index(
+                fields=["user", "-created_at", "-id"],
+                name="order_user_created_idx",
+            ),
+            # date range scans of the back office export, in export order
+            models.Index(fields=["created_at", "id"], name="order_created_idx"),
+            # dashboard sort on the amount, id breaks ties for the cursor
+            models.Index(fields=["total_amount", "id"], name="order_total_idx"),
+            # pending orders left unpaid, see expire_pending_orders
+            models.Index(
+                fields=["updated_at"],
+                name="order_pending_updated_idx",
+                condition=models.Q(status="pending"),
+            ),
+            # dashboard search: phone prefixes (order_number's unique index
+            # already has a LIKE twin) and fuzzy address matches
+            models.Index(
+                fields=["phone"],
+                name="order_phone_pattern_idx",
+                opclasses=["text_pattern_ops"],
+            ),
+            GinIndex(
+                fields=["shipping_address"],
+                name="order_shipping_trgm_gin",
+                opclasses=["gin_trgm_ops"],
+            ),
+        ]
+
     def __str__(self):
         return f"Order {self.id} by {self.user.username}"
 
     def get_absolute_url(self):
         return reverse("order:order-detail", kwargs={"pk": self.pk})
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # remembered so DailyOrderStats can be moved by the delta on save,
+        # and stock released when the order gets cancelled or refunded
+        instance._loaded_stats = instance.stats_entry()
+        instance._loaded_status = instance.__dict__.get("status")
+        return instance
+
+    def stats_entry(self):
+        """The `(date, status, total_amount)` this order adds to the rollup."""
+        created_at, status, total_amount = (
+            self.__dict__.get(name) for name in ("created_at", "status", "total_amount")
+        )
+        if not isinstance(created_at, datetime) or None in (status, total_amount):
+            # deferred or not set yet
+            return None
+        if timezone.is_aware(created_at):
+            created_at = timezone.localtime(created_at)
+        return created_at.date(), status, total_amount
+
+
+class DailyOrderStats(models.Model):
+    """
+    Orders and revenue per creation date and status.
+
+    Kept up to date from the Order save/delete signals, so queryset
+    `update()`/`bulk_create()` calls bypass it. The `rebuild_daily_order_stats`
+    command recomputes any date range from the orders.
+    """
+
+    date = models.DateField()
+    status = models.CharField(max_length=20, choices=Order.OrderStatus.choices)
+    order_count = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            # also serves the date range scans of the dashboard chart
+            models.UniqueConstraint(
+                fields=["date", "status"], name="daily_order_stats_date_status_uniq"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.date} {self.status}: {self.order_count} orders"
+
+
+class ArchivedOrder(models.Model):
+    """
+    An order of a closed month moved out of the live tables.
+
+    `data` holds the whole order with its items, payments, shipping and
+    refunds as they were. The summary columns stay queryable and count in
+    the DailyOrderStats rebuild. See `shopping.order.archive`.
+    """
+
+    id = models.BigIntegerField(primary_key=True)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="+"
+    )
+    order_number = models.CharField(max_length=20, unique=True)
+    status = models.CharField(max_length=20, choices=Order.OrderStatus.choices)
+    created_at = models.DateTimeField()
+    total_amount = models.DecimalField(max_digits=10, decimal_places=2)
+    archived_at = models.DateTimeField(auto_now_add=True)
+    data = models.JSONField(encoder=DjangoJSONEncoder)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["user", "-created_at", "-id"],
+                name="archived_order_user_idx",
+            ),
+            models.Index(
+                fields=["created_at", "id"], name="archived_order_created_idx"
+            ),
+        ]
+
+    def __str__(self):
+        return f"Archived order {self.order_number}"
+
 
 class OrderItem(models.Model):
     order = models.ForeignKey(Order, related_name="items", on_delete=models.CASCADE)
@@ -0,0 +1,32 @@
+from shopping.product.paginations import KeysetPagination
+
+
+class OrderCursorPagination(KeysetPagination):
+    """
+    Keyset pagination over live orders and, when the view has a
+    `get_archived_queryset()`, the archived ones too.
+
+    ArchivedOrder keeps the order's id and created_at, so both tables seek
+    on the same cursor; a page reads at most a page from each and merges
+    them.
+    """
+
+    ordering = ("-created_at", "-id")
+
+    def paginate_queryset(self, queryset, request, view=None):
+        get_archived = getattr(view, "get_archived_queryset", None)
+        self.archived_queryset = get_archived() if get_archived else None
+        return super().paginate_queryset(queryset, request, view)
+
+    def fetch(self, queryset, ordering, values, limit):
+        rows = super().fetch(queryset, ordering, values, limit)
+        if self.archived_queryset is None:
+            return rows
+        rows += super().fetch(self.archived_queryset, ordering, values, limit)
+        # every field of the ordering goes the same way
+        names = [field.lstrip("-") for field in ordering]
+        rows.sort(
+            key=lambda row: tuple(getattr(row, name) for name in names),
+            reverse=ordering[0].startswith("-"),
+        )
+        return rows[:limit]
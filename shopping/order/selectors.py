@@ -0,0 +1,87 @@
+from django.db import connection
+from django.db.models import BigIntegerField
+from django.db.models import IntegerField
+from django.db.models import OuterRef
+from django.db.models import Subquery
+from django.db.models import Sum
+from django.db.models import Value
+from django.db.models.expressions import RawSQL
+from django.db.models.fields.json import KT
+from django.db.models.functions import Cast
+from django.db.models.functions import Coalesce
+
+from shopping.order.models import ArchivedOrder
+from shopping.order.models import Order
+from shopping.order.models import OrderItem
+from shopping.product.models import ProductImage
+
+ORDER_SUMMARY_FIELDS = (
+    "id",
+    "order_number",
+    "status",
+    "total_amount",
+    "created_at",
+)
+
+
+def order_summaries(user):
+    """
+    The order history of `user`, one flat row per order.
+
+    Only the summary columns are loaded. The item count and the image of
+    the first line are correlated subqueries, so a page stays a single
+    query with no prefetches, and it seeks on `order_user_created_idx`.
+    """
+    item_count = (
+        OrderItem.objects.filter(order=OuterRef("pk"))
+        .values("order")
+        .annotate(count=Sum("quantity"))
+        .values("count")
+    )
+    # featured image of the product on the first line
+    first_image = ProductImage.objects.filter(
+        product__orderitem__order=OuterRef("pk")
+    ).order_by("product__orderitem__id", "-is_featured", "id")
+    return (
+        Order.objects.filter(user=user)
+        .only(*ORDER_SUMMARY_FIELDS)
+        .annotate(
+            item_count=Coalesce(
+                Subquery(item_count), Value(0), output_field=IntegerField()
+            ),
+            image=Subquery(first_image.values("image")[:1]),
+            image_derivatives=Subquery(first_image.values("image_derivatives")[:1]),
+        )
+    )
+
+
+def archived_order_summaries(user):
+    """
+    `order_summaries()` of the archived orders of `user`.
+
+    The item count and the first line's product come out of the archived
+    document, the image is looked up like for a live order. Seeks on
+    `archived_order_user_idx`.
+    """
+    table = connection.ops.quote_name(ArchivedOrder._meta.db_table)
+    item_count = RawSQL(
+        "SELECT COALESCE(SUM((item ->> 'quantity')::integer), 0) "
+        f"FROM jsonb_array_elements({table}.data -> 'items') AS item",
+        (),
+        output_field=IntegerField(),
+    )
+    first_image = ProductImage.objects.filter(
+        product_id=OuterRef("first_product_id")
+    ).order_by("-is_featured", "id")
+    return (
+        ArchivedOrder.objects.filter(user=user)
+        .only(*ORDER_SUMMARY_FIELDS)
+        .annotate(
+            first_product_id=Cast(
+                KT("data__items__0__product_id"), output_field=BigIntegerField()
+            ),
+            item_count=item_count,
+            image=Subquery(first_image.values("image")[:1]),
+            image_derivatives=Subquery(first_image.values("image_derivatives")[:1]),
+        )
+    )
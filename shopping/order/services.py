@@ -0,0 +1,287 @@
+import re
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+from django.db import IntegrityError
+from django.db import connections
+from django.db import transaction
+from django.db.models import Case
+from django.db.models import F
+from django.db.models import Value
+from django.db.models import When
+from django.utils import timezone
+
+from shopping.order.models import Order
+from shopping.order.models import OrderItem
+from shopping.order.models import Payment
+from shopping.order.stats import apply_stats_deltas
+from shopping.order.stats import bulk_stats_deltas
+from shopping.product.cache import bump_versions
+from shopping.product.cache import product_scope
+from shopping.product.models import ProductVariation
+
+
+class StockReservationError(Exception):
+    """A line can't be reserved, the message is safe to show to the client."""
+
+
+def _aggregate(lines):
+    quantities = defaultdict(int)
+    products = {}
+    for product_id, variation_id, quantity in lines:
+        if variation_id is None:
+            # stock is tracked on variations, plain product lines are not
+            continue
+        quantities[variation_id] += quantity
+        products.setdefault(variation_id, set()).add(product_id)
+    return quantities, products
+
+
+def _load_variations(quantities, products, lock):
+    queryset = ProductVariation.objects.filter(pk__in=quantities).order_by("pk")
+    if lock:
+        # a fixed lock order keeps concurrent checkouts from deadlocking
+        queryset = queryset.select_for_update()
+    variations = {variation.pk: variation for variation in queryset}
+
+    for variation_id, quantity in quantities.items():
+        variation = variations.get(variation_id)
+        if variation is None or products[variation_id] != {variation.product_id}:
+            product_id = min(products[variation_id])
+            raise StockReservationError(
+                f"Variation {variation_id} does not exist for product {product_id}"
+            )
+        if variation.stock < quantity:
+            raise StockReservationError(
+                f"Not enough stock for variation {variation_id}. "
+                f"Available: {variation.stock}, Requested: {quantity}"
+            )
+    return variations
+
+
+def unit_price(product, variation=None):
+    """The catalog price of one unit, the product price plus the modifier."""
+    price = product.discounted_price
+    if variation is not None:
+        price += variation.price_modifier
+    return price
+
+
+def check_stock(lines):
+    """
+    Validates `(product_id, variation_id, quantity)` lines without locking.
+
+    Quantities of repeated variations are summed, and everything is loaded
+    in one query.
+    """
+    quantities, products = _aggregate(lines)
+    if quantities:
+        _load_variations(quantities, products, lock=False)
+
+
+def _invalidate_products(products):
+    # update() sends no post_save, so the cached lists showing the stock of
+    # these products are invalidated here
+    scopes = {product_scope(pk) for pks in products.values() for pk in pks}
+    transaction.on_commit(lambda: bump_versions(*scopes))
+
+
+def _quantity_case(quantities):
+    return Case(
+        *(When(pk=pk, then=Value(quantity)) for pk, quantity in quantities.items())
+    )
+
+
+@transaction.atomic
+def reserve_stock(lines):
+    """
+    Decrements variation stock for `(product_id, variation_id, quantity)` lines.
+
+    All variations are locked with one SELECT ... FOR UPDATE in primary key
+    order and validated in memory. Then a single conditional
+    `UPDATE ... SET stock = stock - n WHERE stock >= n` applies every
+    decrement. Either all lines are reserved or StockReservationError is
+    raised and nothing changes.
+    """
+    quantities, products = _aggregate(lines)
+    if not quantities:
+        return
+    _load_variations(quantities, products, lock=True)
+    quantity = _quantity_case(quantities)
+    # the stock condition is redundant under the row locks, but it never
+    # lets stock go negative
+    updated = ProductVariation.objects.filter(
+        pk__in=quantities, stock__gte=quantity
+    ).update(stock=F("stock") - quantity)
+    if updated != len(quantities):
+        raise StockReservationError("Not enough stock")
+    _invalidate_products(products)
+
+
+def release_stock(lines):
+    """Gives reserved `(product_id, variation_id, quantity)` lines back."""
+    quantities, products = _aggregate(lines)
+    if quantities:
+        ProductVariation.objects.filter(pk__in=quantities).update(
+            stock=F("stock") + _quantity_case(quantities)
+        )
+        _invalidate_products(products)
+
+
+# reserved stock goes back on the shelf when an order enters one of these
+STOCK_RELEASING_STATUSES = (
+    Order.OrderStatus.CANCELLED.value,
+    Order.OrderStatus.REFUNDED.value,
+)
+
+
+def release_order_stock(orders):
+    """
+    Gives back the stock of the `orders` that were just cancelled or refunded.
+
+    Each order is compared to the status it was loaded with, so one that is
+    cancelled and then refunded is only released once, and one loaded
+    without its status is left alone. One query loads the lines of every
+    released order and one UPDATE restocks them.
+    """
+    released = []
+    for order in orders:
+        status = order.__dict__.get("status")
+        loaded = getattr(order, "_loaded_status", None)
+        if (
+            status in STOCK_RELEASING_STATUSES
+            and loaded is not None
+            and loaded not in STOCK_RELEASING_STATUSES
+        ):
+            released.append(order.pk)
+        order._loaded_status = status
+    if released:
+        release_stock(
+            OrderItem.objects.filter(order_id__in=released).values_list(
+                "product_id", "variation_id", "quantity"
+            )
+        )
+
+
+def orders_bulk_updated(orders):
+    """
+    What the Order post_save receivers do, for orders saved by bulk_update().
+
+    Moves DailyOrderStats by the summed deltas once the transaction commits
+    and releases the stock of the cancelled or refunded ones.
+    """
+    deltas = bulk_stats_deltas(
+        (order._loaded_stats, order.stats_entry()) for order in orders
+    )
+    if deltas:
+        transaction.on_commit(lambda: apply_stats_deltas(deltas))
+    for order in orders:
+        order._loaded_stats = order.stats_entry()
+    release_order_stock(orders)
+
+
+def expire_pending_orders(cutoff, batch_size=500):
+    """
+    Cancels the pending orders untouched since `cutoff` and never paid.
+
+    Their reserved stock is released. Orders go in batches of `batch_size`,
+    each locked with SKIP LOCKED so an order a request is working on waits
+    for the next run. Returns the number of orders cancelled.
+    """
+    expired = 0
+    while True:
+        with transaction.atomic():
+            orders = list(
+                Order.objects.select_for_update(skip_locked=True)
+                .filter(status=Order.OrderStatus.PENDING.value, updated_at__lt=cutoff)
+                .exclude(payments__status=Payment.PaymentStatus.SUCCESS.value)
+                .order_by("updated_at")[:batch_size]
+            )
+            now = timezone.now()
+            for order in orders:
+                order.status = Order.OrderStatus.CANCELLED.value
+                order.updated_at = now
+            Order.objects.bulk_update(orders, ["status", "updated_at"])
+            orders_bulk_updated(orders)
+        expired += len(orders)
+        if len(orders) < batch_size:
+            return expired
+
+
+# sequences known to exist, so the hot path is a single nextval() round trip
+_known_sequences = set()
+
+
+def order_number_sequence(prefix, day=None):
+    """
+    The name of the sequence numbering orders for `prefix` (and `day`).
+
+    Every prefix gets its own counter, and daily numbering starts a fresh
+    counter per date so the numbers stay short.
+    """
+    slug = re.sub(r"[^a-z0-9]+", "_", prefix.lower()).strip("_")[:32]
+    parts = ["order_number", slug, f"{day:%Y%m%d}" if day else ""]
+    return "_".join(part for part in parts if part)
+
+
+def _ensure_sequence(name, using):
+    if (using, name) in _known_sequences:
+        return
+    # Created on a separate autocommit connection: the sequence must survive
+    # a rollback of the caller's transaction, and a concurrent CREATE must
+    # not abort it.
+    connection = connections.create_connection(using)
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"CREATE SEQUENCE IF NOT EXISTS {connection.ops.quote_name(name)}"
+            )
+    except IntegrityError:
+        # another worker created it between the existence check and insert
+        pass
+    finally:
+        connection.close()
+    _known_sequences.add((using, name))
+
+
+def allocate_order_numbers(count, prefix=None, day=None, using=DEFAULT_DB_ALIAS):
+    """
+    Reserves `count` order numbers in one round trip.
+
+    Numbers come from a Postgres sequence, so workers never collide or wait
+    on each other, there is no table scan and no unique-violation retry.
+    Sequences are not transactional: numbers taken by a rolled back order
+    leave gaps, and a block may interleave with numbers handed out
+    concurrently. Bulk imports can pass the historical `day` to number
+    orders by their own date.
+
+    Returns:
+        list[str]: e.g. `["ORD-261018-000041", "ORD-261018-000042"]`.
+    """
+    prefix = settings.ORDER_NUMBER_PREFIX if prefix is None else prefix
+    if settings.ORDER_NUMBER_DAILY:
+        day = day or timezone.now().date()
+    else:
+        day = None
+    name = order_number_sequence(prefix, day)
+    _ensure_sequence(name, using)
+
+    with connections[using].cursor() as cursor:
+        cursor.execute("SELECT nextval(%s) FROM generate_series(1, %s)", [name, count])
+        values = sorted(value for (value,) in cursor.fetchall())
+
+    return [format_order_number(prefix, day, value) for value in values]
+
+
+def format_order_number(prefix, day, value):
+    """`PREFIX-YYMMDD-000042`, without the parts that are empty."""
+    head = [prefix] if prefix else []
+    if day:
+        head.append(f"{day:%y%m%d}")
+    return "-".join([*head, f"{value:0{settings.ORDER_NUMBER_DIGITS}d}"])
+
+
+def next_order_number(prefix=None, using=DEFAULT_DB_ALIAS):
+    """The next order number, see `allocate_order_numbers`."""
+    return allocate_order_numbers(1, prefix, using=using)[0]
@@ -0,0 +1,39 @@
+from django.db import transaction
+from django.db.models.signals import post_delete
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from shopping.order.models import Order
+from shopping.order.services import release_order_stock
+from shopping.order.stats import apply_stats_deltas
+from shopping.order.stats import stats_deltas
+
+
+def _apply_on_commit(deltas):
+    # applied after the order commits, so the hot rollup row of the day is
+    # only locked for one statement instead of the whole checkout
+    if deltas:
+        transaction.on_commit(lambda: apply_stats_deltas(deltas))
+
+
+@receiver(post_save, sender=Order)
+def update_daily_stats(sender, instance, created, **kwargs):
+    new = instance.stats_entry()
+    old = None if created else getattr(instance, "_loaded_stats", None)
+    if not created and old is None:
+        # loaded with deferred fields, the previous state is unknown
+        instance._loaded_stats = new
+        return
+    _apply_on_commit(stats_deltas(old, new))
+    instance._loaded_stats = new
+
+
+@receiver(post_delete, sender=Order)
+def remove_from_daily_stats(sender, instance, **kwargs):
+    old = getattr(instance, "_loaded_stats", None) or instance.stats_entry()
+    _apply_on_commit(stats_deltas(old, None))
+
+
+@receiver(post_save, sender=Order)
+def release_cancelled_order_stock(sender, instance, **kwargs):
+    release_order_stock([instance])
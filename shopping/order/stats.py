@@ -0,0 +1,112 @@
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import connection
+from django.db import transaction
+from django.db.models import Count
+from django.db.models import Sum
+from django.db.models.functions import TruncDate
+
+from shopping.order.models import ArchivedOrder
+from shopping.order.models import DailyOrderStats
+from shopping.order.models import Order
+
+
+def stats_deltas(old, new):
+    """
+    The DailyOrderStats changes when an order goes from `old` to `new`.
+
+    Both are `Order.stats_entry()` tuples, or None for a created/deleted
+    order. Returns `{(date, status): (order_count, revenue)}` without zero
+    entries.
+    """
+    deltas = defaultdict(lambda: [0, Decimal(0)])
+    if old is not None:
+        day, status, total = old
+        deltas[day, status][0] -= 1
+        deltas[day, status][1] -= Decimal(total)
+    if new is not None:
+        day, status, total = new
+        deltas[day, status][0] += 1
+        deltas[day, status][1] += Decimal(total)
+    return {key: tuple(delta) for key, delta in deltas.items() if any(delta)}
+
+
+def bulk_stats_deltas(changes):
+    """`stats_deltas()` of many `(old, new)` changes, summed per rollup row."""
+    totals = defaultdict(lambda: [0, Decimal(0)])
+    for old, new in changes:
+        for key, (count, revenue) in stats_deltas(old, new).items():
+            totals[key][0] += count
+            totals[key][1] += revenue
+    return {key: tuple(total) for key, total in totals.items() if any(total)}
+
+
+def apply_stats_deltas(deltas):
+    """
+    Adds `stats_deltas()` to the rollup in a single upsert.
+
+    Rows are created on first use and incremented in place, and keys are
+    sorted so concurrent writers lock them in the same order.
+    """
+    if not deltas:
+        return
+    table = connection.ops.quote_name(DailyOrderStats._meta.db_table)
+    rows = sorted(deltas.items())
+    values = ", ".join(["(%s, %s, %s, %s)"] * len(rows))
+    params = [
+        param
+        for (day, status), (count, revenue) in rows
+        for param in (day, status, count, revenue)
+    ]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {table} (date, status, order_count, revenue) "
+            f"VALUES {values} "
+            "ON CONFLICT (date, status) DO UPDATE SET "
+            f"order_count = {table}.order_count + EXCLUDED.order_count, "
+            f"revenue = {table}.revenue + EXCLUDED.revenue",
+            params,
+        )
+
+
+def _daily_totals(queryset):
+    return (
+        queryset.annotate(day=TruncDate("created_at"))
+        .values("day", "status")
+        .annotate(order_count=Count("id"), revenue=Sum("total_amount"))
+        .order_by()
+    )
+
+
+@transaction.atomic
+def rebuild_daily_order_stats(start=None, end=None):
+    """
+    Recomputes the rollup for `start`..`end` (inclusive dates).
+
+    Live and archived orders are both counted. Either bound can be omitted
+    to rebuild everything before or after the other. Returns the number of
+    rollup rows written.
+    """
+    sources = [Order.objects.all(), ArchivedOrder.objects.all()]
+    stats = DailyOrderStats.objects.all()
+    if start is not None:
+        sources = [source.filter(created_at__gte=start) for source in sources]
+        stats = stats.filter(date__gte=start)
+    if end is not None:
+        until = end + timedelta(days=1)
+        sources = [source.filter(created_at__lt=until) for source in sources]
+        stats = stats.filter(date__lte=end)
+
+    totals = defaultdict(lambda: [0, Decimal(0)])
+    for source in sources:
+        for row in _daily_totals(source):
+            totals[row["day"], row["status"]][0] += row["order_count"]
+            totals[row["day"], row["status"]][1] += row["revenue"] or 0
+    stats.delete()
+    created = DailyOrderStats.objects.bulk_create(
+        DailyOrderStats(date=day, status=status, order_count=count, revenue=revenue)
+        for (day, status), (count, revenue) in sorted(totals.items())
+    )
+    return len(created)
@@ -1,28 +1,23 @@
-from django_q.tasks import async_task
+import logging
+from datetime import timedelta
+
+from django.conf import settings
 from django.utils import timezone
-from django.db.models import F
-from django.db import transaction
 
-from shopping.order.models import Order, OrderItem
-from shopping.product.models import Product, ProductVariation
+from shopping.order.services import expire_pending_orders
 
+logger = logging.getLogger("django")
 
-def restore_stock(order_id):
-    """
-    Restore stock for all items in an order if payment is not completed
+
+def expire_unpaid_orders():
     """
-    try:
-        order = Order.objects.get(id=order_id)
+    Cancels the orders left pending and unpaid for ORDER_PENDING_EXPIRY_HOURS,
+    giving their reserved stock back.
 
-        # Only restore stock if payment is not completed
-        if not order.payments.filter(status="completed").exists():
-            with transaction.atomic():
-                for item in order.items.all():
-                    if item.variation:
-                        item.variation.stock = F("stock") + item.quantity
-                        item.variation.save()
-                    else:
-                        item.product.stock = F("stock") + item.quantity
-                        item.product.save()
-    except Order.DoesNotExist:
-        pass
+    Meant to be scheduled (hourly is plenty) by dotted path; returns the
+    number of orders cancelled.
+    """
+    cutoff = timezone.now() - timedelta(hours=settings.ORDER_PENDING_EXPIRY_HOURS)
+    expired = expire_pending_orders(cutoff)
+    logger.info(f"expired {expired} unpaid orders")
+    return expired
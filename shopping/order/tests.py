@@ -1 +1,645 @@
-# Create your tests here.
+import asyncio
+import csv
+import json
+import threading
+import uuid
+from datetime import date
+from datetime import datetime
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+
+import pytest
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.db import connections
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from shopping.dashboard.bulk import bulk_write
+from shopping.dashboard.registry import get_table
+from shopping.order.management.commands.benchmark_order_create import order_payload
+from shopping.order.archive import archive_batch
+from shopping.order.archive import archive_cutoff
+from shopping.order.checks import check_order_number_length
+from shopping.order.exports import _async_batches
+from shopping.order.exports import export_queryset
+from shopping.order.exports import order_records
+from shopping.order.models import ArchivedOrder
+from shopping.order.models import DailyOrderStats
+from shopping.order.models import Order
+from shopping.order.models import OrderItem
+from shopping.order.models import Payment
+from shopping.order.models import Refund
+from shopping.order.models import Shipping
+
+from shopping.order.services import StockReservationError
+from shopping.order.services import allocate_order_numbers
+from shopping.order.services import next_order_number
+from shopping.order.services import release_stock
+from shopping.order.services import reserve_stock
+from shopping.order.stats import rebuild_daily_order_stats
+from shopping.order.tasks import expire_unpaid_orders
+from shopping.product.models import Product
+from shopping.product.models import ProductImage
+from shopping.product.models import ProductVariation
+from shopping.users.tests.factories import UserFactory
+
+
+@pytest.fixture
+def variations(product):
+    return [
+        ProductVariation.objects.create(product=product, price_modifier=0, stock=5)
+        for _ in range(2)
+    ]
+
+
+def run_concurrently(target, args_list):
+    """Runs `target(*args)` per args in its own thread and DB connection."""
+    barrier = threading.Barrier(len(args_list))
+    results = [None] * len(args_list)
+
+    def run(index, args):
+        barrier.wait()
+        try:
+            target(*args)
+            results[index] = "ok"
+        except Exception as error:
+            results[index] = error
+        finally:
+            connections.close_all()
+
+    threads = [
+        threading.Thread(target=run, args=(index, args))
+        for index, args in enumerate(args_list)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+class TestStockReservation:
+    def test_aggregates_and_locks_in_one_query(self, product, variations):
+        first, second = variations
+        lines = [
+            (product.pk, second.pk, 2),
+            (product.pk, first.pk, 1),
+            (product.pk, second.pk, 3),
+        ]
+        with CaptureQueriesContext(connection) as queries:
+            reserve_stock(lines)
+        selects = [q["sql"] for q in queries if q["sql"].startswith("SELECT")]
+        assert len(selects) == 1 and "FOR UPDATE" in selects[0]
+        assert [v.stock for v in ProductVariation.objects.order_by("pk")] == [4, 0]
+
+        release_stock(lines)
+        assert [v.stock for v in ProductVariation.objects.order_by("pk")] == [5, 5]
+
+    def test_all_or_nothing(self, product, variations):
+        first, second = variations
+        with pytest.raises(StockReservationError, match="Available: 5, Requested: 6"):
+            reserve_stock([(product.pk, first.pk, 1), (product.pk, second.pk, 6)])
+        assert [v.stock for v in ProductVariation.objects.order_by("pk")] == [5, 5]
+
+    def test_variation_must_belong_to_product(self, product, variations):
+        with pytest.raises(StockReservationError, match="does not exist"):
+            reserve_stock([(product.pk + 1, variations[0].pk, 1)])
+
+
+@pytest.mark.django_db(transaction=True)
+class TestConcurrentStockReservation:
+    def test_never_oversells(self, product, variations):
+        variation = variations[0]
+        results = run_concurrently(
+            reserve_stock, [([(product.pk, variation.pk, 1)],)] * 12
+        )
+        assert results.count("ok") == 5
+        assert all(
+            isinstance(result, StockReservationError)
+            for result in results
+            if result != "ok"
+        )
+        variation.refresh_from_db()
+        assert variation.stock == 0
+
+    def test_opposite_line_order_does_not_deadlock(self, product, variations):
+        first, second = variations
+        forward = [(product.pk, first.pk, 1), (product.pk, second.pk, 1)]
+        results = run_concurrently(reserve_stock, [(forward,), (forward[::-1],)] * 2)
+        assert results == ["ok"] * 4
+        assert [v.stock for v in ProductVariation.objects.order_by("pk")] == [1, 1]
+
+
+def fresh_prefix():
+    # sequences outlive test transactions, a new prefix starts a new counter
+    return f"T{uuid.uuid4().hex[:3].upper()}"
+
+
+@pytest.mark.django_db
+class TestOrderNumbers:
+    def test_daily_numbers(self, settings):
+        settings.ORDER_NUMBER_DAILY = True
+        prefix = fresh_prefix()
+        day = date(2026, 10, 18)
+        assert allocate_order_numbers(3, prefix, day) == [
+            f"{prefix}-261018-000001",
+            f"{prefix}-261018-000002",
+            f"{prefix}-261018-000003",
+        ]
+        assert allocate_order_numbers(1, prefix, date(2026, 10, 19)) == [
+            f"{prefix}-261019-000001"
+        ]
+
+    def test_counters_are_per_prefix(self, settings):
+        settings.ORDER_NUMBER_DAILY = False
+        first, second = fresh_prefix(), fresh_prefix()
+        assert next_order_number(first) == f"{first}-000001"
+        assert next_order_number(second) == f"{second}-000001"
+        assert next_order_number(first) == f"{first}-000002"
+
+    def test_length_is_checked_at_startup(self, settings):
+        assert check_order_number_length() == []
+        settings.ORDER_NUMBER_PREFIX = "WEBSHOP"
+        assert [error.id for error in check_order_number_length()] == ["order.E001"]
+        settings.ORDER_NUMBER_DAILY = False
+        assert check_order_number_length() == []
+
+    def test_block_is_one_query(self, settings):
+        allocate_order_numbers(1)
+        with CaptureQueriesContext(connection) as queries:
+            numbers = allocate_order_numbers(500)
+        assert len(queries) == 1
+        assert len(set(numbers)) == 500
+        assert numbers == sorted(numbers)
+
+
+@pytest.mark.django_db(transaction=True)
+def test_order_numbers_are_unique_across_connections():
+    numbers = []
+
+    def take():
+        numbers.extend(allocate_order_numbers(50, "CONC"))
+
+    results = run_concurrently(take, [()] * 8)
+    assert results == ["ok"] * 8
+    assert len(set(numbers)) == 400
+
+
+class TestOrderCreate:
+    @pytest.fixture
+    def priced_variations(self, product):
+        Product.objects.filter(pk=product.pk).update(discounted_price=Decimal("10"))
+        return [
+            ProductVariation.objects.create(
+                product=product, price_modifier=Decimal(index), stock=5
+            )
+            for index in range(12)
+        ]
+
+    def create(self, user, payload):
+        client = APIClient()
+        client.force_authenticate(user)
+        with CaptureQueriesContext(connection) as queries:
+            response = client.post("/api/order/v1/", payload, format="json")
+        assert response.status_code == 201, response.json()
+        return response.json(), len(queries)
+
+    def test_prices_resolved_server_side(self, user, priced_variations):
+        payload = order_payload(priced_variations, 2)
+        payload["items"][0]["price"] = "0.01"
+        payload["total_amount"] = "0.01"
+        data, _ = self.create(user, payload)
+        assert sorted(item["price"] for item in data["items"]) == ["10.00", "11.00"]
+        assert data["total_amount"] == "21.00"
+        assert data["order_number"].startswith("ORD-")
+        assert set(data) >= {"id", "items", "payments", "shipping", "status"}
+        order = Order.objects.get(pk=data["id"])
+        assert order.payments.count() == 1
+        assert [v.stock for v in ProductVariation.objects.order_by("pk")[:2]] == [4, 4]
+
+    def test_cached_lists_show_the_new_stock(
+        self, user, priced_variations, django_capture_on_commit_callbacks
+    ):
+        cache.clear()
+        url = "/api/product/v1/list/"
+        APIClient().get(url)
+        with django_capture_on_commit_callbacks(execute=True):
+            self.create(user, order_payload(priced_variations, 1))
+        variations = APIClient().get(url).json()["results"][0]["variations"]
+        stock = {variation["id"]: variation["stock"] for variation in variations}
+        assert stock[priced_variations[0].pk] == 4
+
+    def test_round_trips_do_not_grow_with_lines(self, user, priced_variations):
+        _, one_line = self.create(user, order_payload(priced_variations, 1))
+        _, ten_lines = self.create(user, order_payload(priced_variations, 10))
+        assert ten_lines == one_line
+
+    def test_unknown_product_is_rejected(self, user, priced_variations):
+        payload = order_payload(priced_variations, 1)
+        payload["items"][0]["product"] = 0
+        client = APIClient()
+        client.force_authenticate(user)
+        response = client.post("/api/order/v1/", payload, format="json")
+        assert response.status_code == 400
+
+    def test_cancel_and_refund_release_stock_once(self, user, priced_variations):
+        def stock():
+            return [v.stock for v in ProductVariation.objects.order_by("pk")[:2]]
+
+        data, _ = self.create(user, order_payload(priced_variations, 2))
+        order = Order.objects.get(pk=data["id"])
+        order.status = Order.OrderStatus.CANCELLED
+        order.save()
+        assert stock() == [5, 5]
+        order.status = Order.OrderStatus.REFUNDED
+        order.save()
+        assert stock() == [5, 5]
+
+        data, _ = self.create(user, order_payload(priced_variations, 2))
+        rows = [{"id": data["id"], "status": "refunded"}]
+        report = bulk_write(get_table("order:order"), "update", rows)
+        assert report["counts"] == {"updated": 1}
+        assert stock() == [5, 5]
+
+    def test_unpaid_orders_expire(self, user, priced_variations):
+        unpaid, _ = self.create(user, order_payload(priced_variations, 1))
+        paid, _ = self.create(user, order_payload(priced_variations, 1))
+        Payment.objects.filter(order_id=paid["id"]).update(
+            status=Payment.PaymentStatus.SUCCESS
+        )
+        Order.objects.update(updated_at=datetime.now() - timedelta(days=2))
+        fresh, _ = self.create(user, order_payload(priced_variations, 1))
+
+        assert expire_unpaid_orders() == 1
+        assert dict(Order.objects.values_list("pk", "status")) == {
+            unpaid["id"]: "canceled",
+            paid["id"]: "pending",
+            fresh["id"]: "pending",
+        }
+        assert ProductVariation.objects.get(pk=priced_variations[0].pk).stock == 3
+
+    def test_benchmark_command(self, user, priced_variations):
+        out = StringIO()
+        call_command(
+            "benchmark_order_create", lines=[1, 2], repeat=1, stdout=out, stderr=out
+        )
+        assert "2 lines:" in out.getvalue()
+
+
+class TestDailyOrderStats:
+    @pytest.fixture
+    def make_order(self, user, django_capture_on_commit_callbacks):
+        def make_order(day, total, status=Order.OrderStatus.PENDING):
+            with django_capture_on_commit_callbacks(execute=True):
+                return Order.objects.create(
+                    user=user,
+                    order_number=next_order_number(),
+                    status=status,
+                    shipping_address="-",
+                    billing_address="-",
+                    phone="-",
+                    created_at=datetime.combine(day, datetime.min.time()),
+                    total_amount=Decimal(total),
+                )
+
+        return make_order
+
+    def rollup(self):
+        return {
+            (row.date, row.status): (row.order_count, row.revenue)
+            for row in DailyOrderStats.objects.filter(order_count__gt=0)
+        }
+
+    def test_follows_status_transitions(
+        self, make_order, django_capture_on_commit_callbacks
+    ):
+        day = date(2026, 10, 1)
+        first = make_order(day, "10")
+        make_order(day, "5")
+        order = Order.objects.get(pk=first.pk)
+        order.status = Order.OrderStatus.COMPLETED
+        order.total_amount = Decimal("12")
+        with django_capture_on_commit_callbacks(execute=True):
+            order.save()
+        assert self.rollup() == {
+            (day, "pending"): (1, Decimal("5.00")),
+            (day, "completed"): (1, Decimal("12.00")),
+        }
+        with django_capture_on_commit_callbacks(execute=True):
+            order.delete()
+        assert self.rollup() == {(day, "pending"): (1, Decimal("5.00"))}
+
+    def test_rebuild_matches_incremental(self, make_order):
+        days = [date(2026, 9, 29), date(2026, 9, 30), date(2026, 10, 1)]
+        for day in days:
+            make_order(day, "7", Order.OrderStatus.COMPLETED)
+        make_order(days[1], "3")
+        incremental = self.rollup()
+
+        DailyOrderStats.objects.filter(date=days[1]).update(order_count=99)
+        assert rebuild_daily_order_stats(days[1], days[1]) == 2
+        assert self.rollup() == incremental
+        DailyOrderStats.objects.all().delete()
+        call_command("rebuild_daily_order_stats", stdout=StringIO())
+        assert self.rollup() == incremental
+
+    def test_chart_reads_the_rollup(self, user, make_order):
+        today = date.today()
+        make_order(today - timedelta(days=2), "7", Order.OrderStatus.COMPLETED)
+        make_order(today - timedelta(days=2), "7", Order.OrderStatus.COMPLETED)
+        make_order(today - timedelta(days=9), "7", Order.OrderStatus.COMPLETED)
+        make_order(today - timedelta(days=1), "7")
+        user.is_staff = True
+        user.save()
+        client = APIClient()
+        client.force_authenticate(user)
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get("/api/order/dashboard/chart-data/?period=7d")
+        assert response.json() == {
+            "days": [{"day": str(today - timedelta(days=2)), "count": 2}],
+            "total_count": 2,
+            "growth_percent": 100,
+        }
+        assert "order_order" not in " ".join(q["sql"] for q in queries)
+
+
+@pytest.fixture
+def orders(user, product):
+    Product.objects.filter(pk=product.pk).update(discounted_price=Decimal("10"))
+    ProductImage.objects.create(product=product, image="products/runner.jpg")
+    orders = []
+    for index in range(5):
+        order = Order.objects.create(
+            user=user,
+            order_number=next_order_number(),
+            shipping_address="-",
+            billing_address="-",
+            phone="-",
+            created_at=datetime(2026, 10, 1 + index),
+            total_amount=Decimal("20"),
+        )
+        OrderItem.objects.create(
+            order=order, product=product, quantity=2, price=Decimal("10")
+        )
+        orders.append(order)
+    return orders
+
+
+class TestOrderHistory:
+    def get(self, user, url):
+        client = APIClient()
+        client.force_authenticate(user)
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(url)
+        assert response.status_code == 200
+        selects = [q for q in queries if q["sql"].startswith("SELECT")]
+        return response.json(), len(selects)
+
+    def test_pages_are_one_query_of_summaries(self, user, orders):
+        page, selects = self.get(user, "/api/order/v1/?page_size=2")
+        # the live page and the archived one, see OrderCursorPagination
+        assert selects == 2
+        assert [row["id"] for row in page["results"]] == [
+            orders[4].pk,
+            orders[3].pk,
+        ]
+        row = page["results"][0]
+        assert set(row) == {
+            "id",
+            "order_number",
+            "status",
+            "total_amount",
+            "created_at",
+            "item_count",
+            "image",
+            "image_srcset",
+        }
+        assert row["item_count"] == 2
+        assert row["image"].endswith("products/runner.jpg")
+
+        ids = [row["id"] for row in page["results"]]
+        while page["next"]:
+            page, selects = self.get(user, page["next"])
+            assert selects == 2
+            ids += [row["id"] for row in page["results"]]
+        assert ids == [order.pk for order in reversed(orders)]
+
+    def test_scoped_to_the_user(self, user, orders):
+        other = UserFactory()
+        page, _ = self.get(other, "/api/order/v1/")
+        assert page["results"] == []
+        client = APIClient()
+        client.force_authenticate(other)
+        assert client.get(f"/api/order/v1/{orders[0].pk}/").status_code == 404
+
+
+class TestOrderExport:
+    url = "/api/order/dashboard/export/"
+
+    def export(self, user, params):
+        user.is_staff = True
+        user.save()
+        client = APIClient()
+        client.force_authenticate(user)
+        response = client.get(self.url, params)
+        assert response.status_code == 200, response.content
+        return b"".join(response.streaming_content).decode()
+
+    def test_csv_has_a_row_per_item(self, user, orders, product):
+        OrderItem.objects.create(
+            order=orders[1], product=product, quantity=1, price=Decimal("5")
+        )
+        content = self.export(user, {"start": "2026-10-02", "end": "2026-10-03"})
+        rows = list(csv.DictReader(content.splitlines()))
+        assert [row["order_number"] for row in rows] == [
+            orders[1].order_number,
+            orders[1].order_number,
+            orders[2].order_number,
+        ]
+        assert rows[0]["customer_email"] == user.email
+        assert [row["item_quantity"] for row in rows] == ["2", "1", "2"]
+
+    def test_ndjson_nests_an_order_per_line(self, user, orders):
+        Order.objects.filter(pk=orders[0].pk).update(status="completed")
+        content = self.export(user, {"type": "ndjson", "status": "completed"})
+        records = [json.loads(line) for line in content.splitlines()]
+        assert [record["order_number"] for record in records] == [
+            orders[0].order_number
+        ]
+        assert records[0]["items"][0]["price"] == "10.00"
+        assert records[0]["shipping"] is None
+
+    def test_includes_archived_orders(self, user, orders, product, tmp_path):
+        Order.objects.filter(pk__in=[orders[1].pk, orders[3].pk]).update(
+            status=Order.OrderStatus.COMPLETED
+        )
+        archive_batch([orders[1].pk, orders[3].pk], before=datetime(2026, 11, 1))
+
+        content = self.export(user, {"start": "2026-10-01", "end": "2026-10-03"})
+        rows = list(csv.DictReader(content.splitlines()))
+        assert [row["order_number"] for row in rows] == [
+            order.order_number for order in orders[:3]
+        ]
+        assert rows[1]["customer_email"] == user.email
+        assert (rows[1]["item_product_name"], rows[1]["item_price"]) == (
+            product.name,
+            "10.00",
+        )
+
+        output = tmp_path / "orders.ndjson"
+        call_command("export_orders", type="ndjson", output=str(output), chunk_size=2)
+        records = [json.loads(line) for line in output.read_text().splitlines()]
+        assert [record["order_number"] for record in records] == [
+            order.order_number for order in orders
+        ]
+        assert records[3]["status"] == "completed"
+
+    def test_fetches_in_chunks(self, orders):
+        queryset = export_queryset()
+        with CaptureQueriesContext(connection) as queries:
+            records = list(order_records(queryset, chunk_size=2))
+        assert len(records) == 5
+        item_fetches = [q for q in queries if 'FROM "order_orderitem"' in q["sql"]]
+        assert len(item_fetches) == 3
+
+    def test_admin_only(self, user, orders):
+        client = APIClient()
+        client.force_authenticate(user)
+        assert client.get(self.url).status_code == 403
+
+    def test_command(self, orders, tmp_path):
+        output = tmp_path / "orders.ndjson"
+        call_command(
+            "export_orders",
+            type="ndjson",
+            start=date(2026, 10, 5),
+            output=str(output),
+            chunk_size=2,
+        )
+        assert len(output.read_text().splitlines()) == 1
+
+    def test_async_stream_closes_the_export(self):
+        closed = []
+
+        def batches():
+            try:
+                yield from (b"a", b"b", b"c")
+            finally:
+                closed.append(True)
+
+        async def first():
+            stream = _async_batches(batches())
+            chunk = await anext(stream)
+            await stream.aclose()
+            return chunk
+
+        assert asyncio.run(first()) == b"a"
+        assert closed == [True]
+
+
+class TestOrderArchive:
+    def test_cutoff_keeps_whole_months(self):
+        assert archive_cutoff(12, date(2026, 10, 18)) == date(2025, 10, 1)
+        assert archive_cutoff(1, date(2026, 1, 31)) == date(2025, 12, 1)
+
+    def test_moves_closed_orders_of_closed_months(
+        self, user, orders, django_capture_on_commit_callbacks
+    ):
+        old, still_open = orders[0], orders[1]
+        Order.objects.filter(pk__in=[old.pk, still_open.pk]).update(
+            created_at=datetime(2026, 9, 15)
+        )
+        Order.objects.filter(pk__in=[old.pk, orders[4].pk]).update(
+            status=Order.OrderStatus.COMPLETED
+        )
+        Shipping.objects.create(
+            order=old,
+            tracking_number="T1",
+            carrier="post",
+            estimated_delivery="2026-10-05",
+        )
+        Payment.objects.create(order=old, amount=Decimal("20"), payment_method="card")
+        Refund.objects.create(
+            order=old,
+            order_item=old.items.get(),
+            requested_by=user,
+            amount=Decimal("5"),
+        )
+        rebuild_daily_order_stats()
+        stats = list(DailyOrderStats.objects.values().order_by("date", "status"))
+
+        out = StringIO()
+        call_command("archive_orders", before=date(2026, 10, 1), stdout=out)
+        assert "Archived 1 orders" in out.getvalue()
+        # the open order stays live even though its month is closed
+        assert set(Order.objects.values_list("pk", flat=True)) == {
+            order.pk for order in orders[1:]
+        }
+        assert not Refund.objects.exists() and not Payment.objects.exists()
+        archived = ArchivedOrder.objects.get()
+        assert (archived.pk, archived.order_number) == (old.pk, old.order_number)
+        assert archived.data["items"][0]["quantity"] == 2
+        assert archived.data["shipping"]["tracking_number"] == "T1"
+        assert archived.data["refunds"][0]["amount"] == "5.00"
+
+        assert (
+            list(DailyOrderStats.objects.values().order_by("date", "status")) == stats
+        )
+        rebuild_daily_order_stats()
+        assert [
+            {key: row[key] for key in ("date", "status", "order_count", "revenue")}
+            for row in DailyOrderStats.objects.values().order_by("date", "status")
+        ] == [
+            {key: row[key] for key in ("date", "status", "order_count", "revenue")}
+            for row in stats
+        ]
+
+    def test_archived_orders_stay_visible(self, user, orders):
+        archived, still_open = orders[0], orders[1]
+        Order.objects.filter(pk=archived.pk).update(
+            created_at=datetime(2026, 9, 15), status=Order.OrderStatus.COMPLETED
+        )
+        Order.objects.filter(pk=still_open.pk).update(created_at=datetime(2026, 9, 10))
+        call_command("archive_orders", before=date(2026, 10, 1), stdout=StringIO())
+        assert not Order.objects.filter(pk=archived.pk).exists()
+
+        client = APIClient()
+        client.force_authenticate(user)
+        page = client.get("/api/order/v1/?page_size=2").json()
+        rows = page["results"]
+        while page["next"]:
+            page = client.get(page["next"]).json()
+            rows += page["results"]
+        # merged on (created_at, id) with the live orders
+        assert [row["id"] for row in rows] == [
+            orders[4].pk,
+            orders[3].pk,
+            orders[2].pk,
+            archived.pk,
+            still_open.pk,
+        ]
+        assert rows[3]["item_count"] == 2
+        assert rows[3]["image"].endswith("products/runner.jpg")
+
+        response = client.get(f"/api/order/v1/{archived.pk}/")
+        assert response.status_code == 200
+        assert response.data["order_number"] == archived.order_number
+        assert response.data["status"] == Order.OrderStatus.COMPLETED
+        assert response.data["items"][0]["quantity"] == 2
+        assert response.data["items"][0]["product"]["name"] == "Runner"
+        assert response.data["shipping"] is None
+
+        client.force_authenticate(UserFactory())
+        assert client.get(f"/api/order/v1/{archived.pk}/").status_code == 404
+
+    def test_dry_run(self, orders):
+        Order.objects.update(status=Order.OrderStatus.CANCELLED)
+        out = StringIO()
+        call_command(
+            "archive_orders", before=date(2026, 11, 1), dry_run=True, stdout=out
+        )
+        assert out.getvalue().startswith("5 orders")
+        assert Order.objects.count() == 5
@@ -1,3 +1,4 @@
+from django.urls import reverse
 from rest_framework import serializers
 
 from shopping.product.models import Category
@@ -8,27 +9,29 @@ from shopping.product.models import AttributeType
 from shopping.product.models import AttributeValue
 from shopping.product.models import ProductVariation, ProductAttribute
 from shopping.users.models import User
-from shopping.users.api.serializers import UserSerializer
+from shopping.product.media import media_srcset
+from shopping.product.media import media_url
+from shopping.product.paginations import ReviewCursorPagination
+from shopping.product.selectors import EMBEDDED_REVIEWS_COUNT
 import logging
 
-
 logger = logging.getLogger("django")
 
 
-class ProductReviewSerializer(serializers.ModelSerializer):
-    user = UserSerializer(read_only=True)
-
-    class Meta:
-        model = Review
-        exclude = ("product",)
-
-
 class VendorSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ("id", "name")
 
 
+class ProductReviewSerializer(serializers.ModelSerializer):
+    user = VendorSerializer(read_only=True)
+
+    class Meta:
+        model = Review
+        fields = ("id", "user", "rating", "comment", "created_at", "updated_at")
+
+
 class CategorySerializer(serializers.ModelSerializer):
     ancestors = serializers.SerializerMethodField()
 
@@ -114,36 +117,41 @@ class ProductListSerializer(serializers.ModelSerializer):
             ]
 
     image = serializers.SerializerMethodField(read_only=True)
+    image_srcset = serializers.SerializerMethodField(read_only=True)
     variations = ProductVariationSerializer(many=True, read_only=True)
+    rating = serializers.DecimalField(
+        source="rating_avg", max_digits=3, decimal_places=2, read_only=True
+    )
+    rating_histogram = serializers.DictField(read_only=True)
 
     class Meta:
         model = Product
-        exclude = ("vendor",)
+        exclude = (
+            "vendor",
+            "rating_avg",
+            "rating_1_count",
+            "rating_2_count",
+            "rating_3_count",
+            "rating_4_count",
+            "rating_5_count",
+            "attribute_value_ids",
+            "search_vector",
+        )
 
     def get_image(self, obj):
         request = self.context.get("request")
-        # Use prefetched data if available, otherwise fallback to query
-        try:
-            image = getattr(obj, "image", None)
-            logger.info(f"thia is {image}")
-
-            if image is None:
-                image = obj.images.order_by("-is_featured").first()
-            else:
-                return request.build_absolute_uri(image) if request else image.image.url
-            if image.image and hasattr(image.image, "url"):
-                return (
-                    request.build_absolute_uri(image.image.url)
-                    if request
-                    else image.image.url
-                )
-        except Exception as e:
-            logger.error(
-                "unexpected error happend while serializing product image: {0}".format(
-                    e
-                )
-            )
-            return None
+        # product_list() annotates the featured image key, fall back to a query
+        if hasattr(obj, "image"):
+            return media_url(obj.image, request)
+        image = obj.images.order_by("-is_featured").first()
+        return media_url(image.image, request) if image else None
+
+    def get_image_srcset(self, obj):
+        request = self.context.get("request")
+        if hasattr(obj, "image_derivatives"):
+            return media_srcset(obj.image_derivatives, request)
+        image = obj.images.order_by("-is_featured").first()
+        return media_srcset(image.image_derivatives, request) if image else {}
 
 
 class ProductSerializer(serializers.ModelSerializer):
@@ -172,13 +180,17 @@ class ProductSerializer(serializers.ModelSerializer):
                 "attribute_value_slug",
             ]
 
-    reviews = ProductReviewSerializer(many=True, read_only=True)
     vendor = VendorSerializer(many=False, read_only=True)
     variations = serializers.SerializerMethodField()
     images = serializers.SerializerMethodField(read_only=True)
+    images_srcset = serializers.SerializerMethodField(read_only=True)
     attributes = ProductAttributeSerializer(many=True, read_only=True)
     category = CategorySerializer(read_only=True)
-    reviews = ProductReviewSerializer(many=True, read_only=True)
+    reviews = serializers.SerializerMethodField()
+    rating = serializers.DecimalField(
+        source="rating_avg", max_digits=3, decimal_places=2, read_only=True
+    )
+    rating_histogram = serializers.DictField(read_only=True)
 
     class Meta:
         model = Product
@@ -190,27 +202,60 @@ class ProductSerializer(serializers.ModelSerializer):
             "discounted_price",
             "available",
             "images",
+            "images_srcset",
             "attributes",
             "rating",
+            "rating_count",
+            "rating_histogram",
             "vendor",
             "reviews",
             "category",
             "variations",
         ]
 
-    def get_images(self, obj):
-        request = self.context.get("request")
+    def _images(self, obj):
         # Use prefetched data if available, otherwise fallback to query
         images = getattr(obj, "_prefetched_objects_cache", {}).get("images", None)
         if images is None:
             images = obj.images.all().order_by("-is_featured")
+        return [image for image in images if image.image]
 
+    def get_images(self, obj):
+        request = self.context.get("request")
+        return [media_url(image.image, request) for image in self._images(obj)]
+
+    def get_images_srcset(self, obj):
+        # same order as `images`
+        request = self.context.get("request")
         return [
-            request.build_absolute_uri(image.image.url) if request else image.image.url
-            for image in images
-            if image.image and hasattr(image.image, "url")
+            media_srcset(image.image_derivatives, request)
+            for image in self._images(obj)
         ]
 
+    def get_reviews(self, obj):
+        # first page only, `next` continues on the product review list
+        reviews = getattr(obj, "latest_reviews", None)
+        if reviews is None:
+            reviews = list(
+                obj.reviews.select_related("user").order_by("-created_at", "-id")[
+                    : EMBEDDED_REVIEWS_COUNT + 1
+                ]
+            )
+        page = reviews[:EMBEDDED_REVIEWS_COUNT]
+        next_link = None
+        if len(reviews) > EMBEDDED_REVIEWS_COUNT:
+            request = self.context.get("request")
+            url = reverse("product:product_review_list", kwargs={"pk": obj.pk})
+            if request:
+                url = request.build_absolute_uri(url)
+            next_link = ReviewCursorPagination().get_cursor_link(url, page[-1])
+        return {
+            "next": next_link,
+            "results": ProductReviewSerializer(
+                page, many=True, context=self.context
+            ).data,
+        }
+
     def get_variations(self, obj):
         attributes = getattr(obj, "_prefetched_objects_cache", {}).get(
             "variations", None
@@ -243,16 +288,3 @@ class ProductSerializer(serializers.ModelSerializer):
             }
             for pc in category
         ]
-
-
-class CategoryListSerializer(serializers.ModelSerializer):
-    children = serializers.SerializerMethodField()
-
-    class Meta:
-        model = Category
-        fields = ["id", "name", "children"]
-
-    def get_children(self, obj):
-        if obj.get_children():
-            return CategorySerializer(obj.get_children(), many=True).data
-        return []
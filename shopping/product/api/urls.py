@@ -1,6 +1,7 @@
 from django.urls import path
 
 from shopping.product.api.views import ProductListAPIView
+from shopping.product.api.views import ProductFacetAPIView
 from shopping.product.api.views import ProductRetrieveAPIView
 from shopping.product.api.views import ProductReviewListAPIView
 from shopping.product.api.views import CategoryListAPIView
@@ -8,6 +9,7 @@ from shopping.product.api.views import CategoryListAPIView
 app_name = "product"
 urlpatterns = [
     path("v1/list/", ProductListAPIView.as_view(), name="product_list"),
+    path("v1/facets/", ProductFacetAPIView.as_view(), name="product_facets"),
     path(
         "v1/retrieve/<int:pk>",
         ProductRetrieveAPIView.as_view(),
@@ -23,4 +25,9 @@ urlpatterns = [
         CategoryListAPIView.as_view(),
         name="category_list",
     ),
+    path(
+        "v1/categories/<slug:slug>",
+        CategoryListAPIView.as_view(),
+        name="category_subtree",
+    ),
 ]
@@ -1,12 +1,15 @@
 from django.db.models import Prefetch
+from rest_framework.generics import GenericAPIView
 from rest_framework.generics import ListAPIView
 from rest_framework.generics import RetrieveAPIView
 from rest_framework import viewsets
+from rest_framework.exceptions import NotFound
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
 
 from shopping.product.api.serializers import ProductListSerializer
 from shopping.product.api.serializers import ProductReviewSerializer
 from shopping.product.api.serializers import ProductSerializer
-from shopping.product.api.serializers import CategoryListSerializer
 from shopping.product.models import Product, Category
 from shopping.product.models import ProductImage
 from shopping.product.models import Review
@@ -14,17 +17,55 @@ from shopping.product.models import ProductVariation, ProductAttribute
 from django_filters import rest_framework as filters
 from shopping.product.filters import ProductFilter
 from shopping.product.selectors import product_list, product_detail
+from shopping.product.selectors import category_subtree
+from shopping.product.selectors import category_tree
+from shopping.product.selectors import trim_category_tree
+from shopping.product.selectors import product_facet_counts
+from shopping.product.selectors import product_reviews
+from shopping.product.cache import cached_category_tree
+from shopping.product.cache import cached_product_list
+from shopping.product.cache import category_scope
+from shopping.product.cache import product_scope
+from shopping.product.paginations import ProductCursorPagination
+from shopping.product.paginations import ReviewCursorPagination
 
 
 class ProductListAPIView(ListAPIView):
     serializer_class = ProductListSerializer
     filter_backends = (filters.DjangoFilterBackend,)
     filterset_class = ProductFilter
+    pagination_class = ProductCursorPagination
     queryset = Product.objects.all()  # Define base queryset
 
     def get_queryset(self):
         return product_list()
 
+    def list(self, request, *args, **kwargs):
+        def loader():
+            response = super(ProductListAPIView, self).list(request, *args, **kwargs)
+            data = response.data
+            products = data["results"] if isinstance(data, dict) else data
+            scopes = {product_scope(product["id"]) for product in products}
+            scopes |= {category_scope(product["category"]) for product in products}
+            return data, scopes
+
+        return Response(cached_product_list(request.query_params, loader))
+
+
+class ProductFacetAPIView(GenericAPIView):
+    """Per attribute value product counts for the filtered catalog."""
+
+    filter_backends = (filters.DjangoFilterBackend,)
+    filterset_class = ProductFilter
+    queryset = Product.objects.all()
+
+    def get_queryset(self):
+        return Product.objects.filter(is_active=True)
+
+    def get(self, request):
+        queryset = self.filter_queryset(self.get_queryset())
+        return Response(product_facet_counts(queryset))
+
 
 class ProductRetrieveAPIView(RetrieveAPIView):
     queryset = product_detail()
@@ -33,11 +74,43 @@ class ProductRetrieveAPIView(RetrieveAPIView):
 
 
 class ProductReviewListAPIView(ListAPIView):
-    queryset = Review.objects.select_related("user").order_by("created_at")
+    queryset = Review.objects.all()
     serializer_class = ProductReviewSerializer
+    pagination_class = ReviewCursorPagination
     lookup_field = "pk"
 
+    def get_queryset(self):
+        return product_reviews(self.kwargs[self.lookup_field])
+
+
+class CategoryListAPIView(GenericAPIView):
+    """
+    The category tree, or the subtree rooted at `slug`.
+
+    `?depth=N` limits how many levels of children are returned below the
+    top nodes. The tree is built from one query and served from the cache
+    until a category changes.
+    """
+
+    queryset = Category.objects.all()
+
+    def get(self, request, slug=None):
+        tree = cached_category_tree(category_tree)
+        if slug is not None:
+            node = category_subtree(tree, slug)
+            if node is None:
+                raise NotFound("Category not found")
+            tree = [node]
 
-class CategoryListAPIView(ListAPIView):
-    queryset = Category.objects.root_nodes()  # only root nodes
-    serializer_class = CategoryListSerializer
+        depth = request.query_params.get("depth")
+        if depth is not None:
+            try:
+                depth = int(depth)
+                if depth < 0:
+                    raise ValueError
+            except ValueError:
+                raise ValidationError(
+                    {"depth": "Must be a non-negative integer."}
+                ) from None
+            tree = trim_category_tree(tree, depth)
+        return Response(tree)
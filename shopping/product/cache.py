@@ -0,0 +1,147 @@
+import hashlib
+import json
+import logging
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger("selector")
+
+KEY_PREFIX = "product_list"
+CATALOG_SCOPE = "catalog"
+HITS_KEY = f"{KEY_PREFIX}:stats:hits"
+MISSES_KEY = f"{KEY_PREFIX}:stats:misses"
+TREE_KEY_PREFIX = "category_tree"
+TREE_VERSION_KEY = f"{TREE_KEY_PREFIX}:version"
+
+
+def product_scope(product_id):
+    return f"product:{product_id}"
+
+
+def category_scope(category_id):
+    return f"category:{category_id}"
+
+
+def _version_key(scope):
+    return f"{KEY_PREFIX}:version:{scope}"
+
+
+def _initial_version():
+    # A fresh version must never collide with one recorded before the key was
+    # evicted, otherwise an old entry would be considered valid again.
+    return time.time_ns()
+
+
+def _incr(key, initial):
+    try:
+        return cache.incr(key)
+    except ValueError:
+        cache.add(key, initial, timeout=None)
+        return initial
+
+
+def bump_versions(*scopes):
+    """
+    Invalidates every cached product list that depends on one of the scopes.
+
+    Entries are not deleted, their recorded versions simply stop matching so
+    they are rebuilt on the next read and expire on their own timeout.
+    """
+    for scope in scopes:
+        _incr(_version_key(scope), _initial_version())
+
+
+def current_versions(scopes):
+    keys = {_version_key(scope): scope for scope in scopes}
+    found = cache.get_many(list(keys))
+    missing = {key: _initial_version() for key in keys if key not in found}
+    if missing:
+        cache.set_many(missing, timeout=None)
+        found.update(missing)
+    return {keys[key]: version for key, version in found.items()}
+
+
+def product_list_cache_key(query_params):
+    """
+    Builds the cache key from the normalized query params.
+
+    Param order and repeated values are normalized and empty values are
+    dropped, so `?b=1&a=2` and `?a=2&b=1&c=` share the same entry.
+    """
+    normalized = sorted(
+        (key, sorted(value for value in values if value != ""))
+        for key, values in query_params.lists()
+        if any(value != "" for value in values)
+    )
+    digest = hashlib.sha256(json.dumps(normalized).encode()).hexdigest()
+    return f"{KEY_PREFIX}:entry:{digest}"
+
+
+def cached_product_list(query_params, loader):
+    """
+    Read-through cache in front of the product list.
+
+    Args:
+        query_params (QueryDict): The request query params (filters and page).
+        loader (callable): Builds the list on a miss. Must return a tuple of
+            the serialized data and the version scopes it depends on.
+
+    Returns:
+        The serialized product list, either cached or freshly built.
+    """
+    key = product_list_cache_key(query_params)
+    entry = cache.get(key)
+    if entry is not None and current_versions(entry["versions"]) == entry["versions"]:
+        _incr(HITS_KEY, 1)
+        return entry["data"]
+
+    _incr(MISSES_KEY, 1)
+    data, scopes = loader()
+    entry = {
+        "versions": current_versions({CATALOG_SCOPE, *scopes}),
+        "data": data,
+    }
+    cache.set(key, entry, timeout=settings.PRODUCT_LIST_CACHE_TIMEOUT)
+    return data
+
+
+def cache_stats():
+    counters = cache.get_many([HITS_KEY, MISSES_KEY])
+    hits = counters.get(HITS_KEY, 0)
+    misses = counters.get(MISSES_KEY, 0)
+    total = hits + misses
+    return {
+        "hits": hits,
+        "misses": misses,
+        "hit_ratio": round(hits / total, 4) if total else 0.0,
+    }
+
+
+def reset_cache_stats():
+    cache.delete_many([HITS_KEY, MISSES_KEY])
+
+
+def bump_category_tree():
+    """Invalidates the cached category tree, see `cached_category_tree`."""
+    _incr(TREE_VERSION_KEY, _initial_version())
+
+
+def cached_category_tree(loader):
+    """
+    Read-through cache for the serialized category tree.
+
+    The entry key embeds the tree version, so a bump makes every reader build
+    and store the new tree while the old entry simply expires.
+    """
+    version = cache.get(TREE_VERSION_KEY)
+    if version is None:
+        cache.add(TREE_VERSION_KEY, _initial_version(), timeout=None)
+        version = cache.get(TREE_VERSION_KEY)
+    key = f"{TREE_KEY_PREFIX}:entry:{version}"
+    tree = cache.get(key)
+    if tree is None:
+        tree = loader()
+        cache.set(key, tree, timeout=settings.CATEGORY_TREE_CACHE_TIMEOUT)
+    return tree
@@ -1,12 +1,21 @@
+from functools import reduce
+from operator import or_
+
+from django.db.models import Q
 from django_filters import rest_framework as filters
 
-from shopping.product.models import Product, Category
+from shopping.product.models import Product, Category, AttributeValue
+from shopping.product.selectors import product_search
 
 
 class ProductFilter(filters.FilterSet):
+    # query params consumed by the view (pagination) rather than the filterset
+    non_attribute_params = ("cursor", "page_size", "format")
+
     min_price = filters.NumberFilter(field_name="variations__price", lookup_expr="gte")
     max_price = filters.NumberFilter(field_name="variations__price", lookup_expr="lte")
     name = filters.CharFilter(field_name="name", lookup_expr="icontains")
+    q = filters.CharFilter(method="search")
     categories = filters.CharFilter(
         field_name="category__name", lookup_expr="icontains"
     )
@@ -19,6 +28,9 @@ class ProductFilter(filters.FilterSet):
             "name",
         ]
 
+    def search(self, queryset, name, value):
+        return product_search(queryset, value)
+
     def filter_queryset(self, queryset):
         """
         Override filter_queryset to handle dynamic attribute filters
@@ -30,13 +42,26 @@ class ProductFilter(filters.FilterSet):
             key: value
             for key, value in self.request.query_params.items()
             if key not in self.filters  # Exclude predefined filters
+            and key not in self.non_attribute_params
         }
 
-        # Apply attribute filters
-        for attr_slug, value_slug in attribute_filters.items():
-            queryset = queryset.filter(
-                attributes__attribute__attribute_type__slug=attr_slug,
-                attributes__attribute__slug=value_slug,
-            ).distinct()
+        if not attribute_filters:
+            return queryset
+
+        # Resolve the slugs to AttributeValue ids, then apply every attribute
+        # filter at once as a containment lookup on the GIN indexed array
+        value_ids = list(
+            AttributeValue.objects.filter(
+                reduce(
+                    or_,
+                    (
+                        Q(attribute_type__slug=attr_slug, slug=value_slug)
+                        for attr_slug, value_slug in attribute_filters.items()
+                    ),
+                )
+            ).values_list("id", flat=True)
+        )
+        if len(value_ids) < len(attribute_filters):
+            return queryset.none()
 
-        return queryset
+        return queryset.filter(attribute_value_ids__contains=value_ids)
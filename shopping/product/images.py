@@ -0,0 +1,84 @@
+import posixpath
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from PIL import Image
+from PIL import ImageOps
+
+# format name -> (Pillow format, save options)
+DERIVATIVE_FORMATS = {
+    "webp": ("WEBP", {"quality": 80, "method": 4}),
+    "jpeg": ("JPEG", {"quality": 82, "optimize": True, "progressive": True}),
+}
+
+
+def derivative_key(name, width, extension):
+    """`images/a/photo.jpg` -> `images/a/derivatives/photo/320w.webp`"""
+    directory, filename = posixpath.split(name)
+    stem = posixpath.splitext(filename)[0]
+    return posixpath.join(directory, "derivatives", stem, f"{width}w.{extension}")
+
+
+def derivatives_are_current(derivatives, name):
+    """Whether `derivatives` were generated from `name` with today's widths."""
+    return bool(derivatives) and (
+        derivatives.get("source") == name
+        and derivatives.get("widths") == list(settings.IMAGE_DERIVATIVE_WIDTHS)
+    )
+
+
+def _target_widths(width):
+    # never upscale, an image narrower than every target keeps its own width
+    widths = [target for target in settings.IMAGE_DERIVATIVE_WIDTHS if target < width]
+    return widths or [width]
+
+
+def _save(storage, key, content):
+    # derivative keys are deterministic, overwrite instead of getting a suffix
+    if storage.exists(key):
+        storage.delete(key)
+    storage.save(key, ContentFile(content))
+
+
+def generate_derivatives(field_file):
+    """
+    Writes the resized WebP/JPEG copies of `field_file` next to the original.
+
+    Returns:
+        dict: What to store on the model, e.g.
+            {"source": "images/a.jpg", "widths": [160, ...],
+             "width": 2000, "height": 1500,
+             "sizes": [{"width": 160, "height": 120,
+                        "webp": "images/derivatives/a/160w.webp",
+                        "jpeg": "images/derivatives/a/160w.jpeg"}, ...]}
+    """
+    storage = field_file.storage
+    with storage.open(field_file.name, "rb") as source:
+        original = ImageOps.exif_transpose(Image.open(source))
+        original.load()
+
+    width, height = original.size
+    sizes = []
+    for target in _target_widths(width):
+        resized = original.copy()
+        resized.thumbnail((target, round(height * target / width) or 1))
+        size = {"width": resized.width, "height": resized.height}
+        for extension, (image_format, options) in DERIVATIVE_FORMATS.items():
+            image = resized
+            if image_format == "JPEG" and image.mode not in ("RGB", "L"):
+                image = image.convert("RGB")
+            buffer = BytesIO()
+            image.save(buffer, image_format, **options)
+            key = derivative_key(field_file.name, target, extension)
+            _save(storage, key, buffer.getvalue())
+            size[extension] = key
+        sizes.append(size)
+
+    return {
+        "source": field_file.name,
+        "widths": list(settings.IMAGE_DERIVATIVE_WIDTHS),
+        "width": width,
+        "height": height,
+        "sizes": sizes,
+    }
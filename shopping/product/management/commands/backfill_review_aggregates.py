@@ -0,0 +1,61 @@
+from django.db import transaction
+from django.db.models import Avg
+from django.db.models import Count
+from django.db.models import Q
+from django.core.management.base import BaseCommand
+
+from shopping.product.models import Product
+from shopping.product.models import Review
+
+AGGREGATE_FIELDS = [
+    "rating_avg",
+    "rating_count",
+    *(f"rating_{rating}_count" for rating in range(1, 6)),
+]
+
+
+class Command(BaseCommand):
+    help = "Recomputes the review aggregates of every product from Review rows."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of products written per UPDATE batch.",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        aggregates = (
+            Review.objects.values("product")
+            .annotate(
+                rating_avg=Avg("rating"),
+                rating_count=Count("id"),
+                **{
+                    f"rating_{rating}_count": Count("id", filter=Q(rating=rating))
+                    for rating in range(1, 6)
+                },
+            )
+            .order_by("product")
+        )
+
+        with transaction.atomic():
+            # products without reviews are not part of the aggregate query
+            Product.objects.update(**{field: 0 for field in AGGREGATE_FIELDS})
+
+            batch = []
+            updated = 0
+            for row in aggregates.iterator(chunk_size=batch_size):
+                product = Product(pk=row.pop("product"), **row)
+                product.rating_avg = round(product.rating_avg, 2)
+                batch.append(product)
+                if len(batch) >= batch_size:
+                    updated += Product.objects.bulk_update(batch, AGGREGATE_FIELDS)
+                    batch = []
+            if batch:
+                updated += Product.objects.bulk_update(batch, AGGREGATE_FIELDS)
+
+        self.stdout.write(
+            self.style.SUCCESS(f"review aggregates rebuilt for {updated} products")
+        )
@@ -0,0 +1,72 @@
+import timeit
+from itertools import cycle
+from itertools import islice
+
+from django.core.management.base import BaseCommand
+from django.core.management.base import CommandError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory
+
+from config.renderers import ORJSONRenderer
+from shopping.order.api.serializers import OrderSerializer
+from shopping.order.models import Order
+from shopping.product.api.serializers import ProductListSerializer
+from shopping.product.selectors import product_list
+
+
+class Command(BaseCommand):
+    help = (
+        "Compares the stdlib and orjson renderers on a product list and an "
+        "order list page built from the rows in the database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--rows",
+            type=int,
+            default=50,
+            help="Rows per page, existing rows are repeated to fill it.",
+        )
+        parser.add_argument(
+            "--repeat", type=int, default=20, help="Runs per renderer, best is kept."
+        )
+
+    def _page(self, serializer_class, queryset, rows, request):
+        data = serializer_class(
+            queryset[:rows], many=True, context={"request": request}
+        ).data
+        if not data:
+            raise CommandError(f"No rows to build a {serializer_class.__name__} page.")
+        return {
+            "next": None,
+            "previous": None,
+            "results": list(islice(cycle(data), rows)),
+        }
+
+    def handle(self, *args, **options):
+        request = APIRequestFactory().get("/")
+        rows = options["rows"]
+        orders = Order.objects.select_related("shipping").prefetch_related(
+            "items__product__images", "items__variation", "payments"
+        )
+        pages = {
+            "product list": self._page(
+                ProductListSerializer, product_list(), rows, request
+            ),
+            "order list": self._page(OrderSerializer, orders, rows, request),
+        }
+        for label, page in pages.items():
+            timings = {}
+            for renderer in (JSONRenderer(), ORJSONRenderer()):
+                timings[type(renderer).__name__] = min(
+                    timeit.repeat(
+                        lambda: renderer.render(page, "application/json"),
+                        number=1,
+                        repeat=options["repeat"],
+                    )
+                )
+            stdlib, fast = timings["JSONRenderer"], timings["ORJSONRenderer"]
+            self.stdout.write(
+                f"{label} ({rows} rows): json {stdlib * 1000:.3f} ms, "
+                f"orjson {fast * 1000:.3f} ms, {stdlib / fast:.1f}x faster"
+            )
@@ -0,0 +1,51 @@
+import tempfile
+import timeit
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory
+from django.test.utils import override_settings
+
+from shopping.product.media import media_url
+from shopping.product.models import ProductImage
+
+
+class Command(BaseCommand):
+    help = (
+        "Compares storage-backed image URLs with media_url() offline, using a "
+        "local filesystem storage as a stand-in for MinIO."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--rows", type=int, default=1000, help="Images serialized per run."
+        )
+        parser.add_argument(
+            "--repeat", type=int, default=5, help="Runs per variant, best is kept."
+        )
+
+    @override_settings(ALLOWED_HOSTS=["testserver"])
+    def handle(self, *args, **options):
+        request = RequestFactory().get("/api/product/v1/list/")
+        with tempfile.TemporaryDirectory() as location:
+            storage = FileSystemStorage(
+                location=location, base_url=settings.MEDIA_PUBLIC_URL
+            )
+            images = []
+            for index in range(options["rows"]):
+                image = ProductImage(image=f"images/product_images/{index}.jpg")
+                image.image.storage = storage
+                images.append(image)
+
+            def through_storage():
+                return [request.build_absolute_uri(i.image.url) for i in images]
+
+            def formatted():
+                return [media_url(i.image, request) for i in images]
+
+            for label, run in (("storage", through_storage), ("media_url", formatted)):
+                best = min(timeit.repeat(run, number=1, repeat=options["repeat"]))
+                self.stdout.write(
+                    f"{label}: {best * 1000:.2f} ms for {options['rows']} rows"
+                )
@@ -0,0 +1,88 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from shopping.product.models import Category
+from shopping.product.models import ProductImage
+from shopping.product.tasks import generate_category_image_derivatives
+from shopping.product.tasks import generate_product_image_derivatives
+
+TASKS = {
+    "product": (ProductImage, generate_product_image_derivatives),
+    "category": (Category, generate_category_image_derivatives),
+}
+
+
+def _init_worker():
+    # no-op after a fork, sets Django up under the spawn start method
+    django.setup()
+
+
+def _process(kind, ids, force):
+    task = TASKS[kind][1]
+    for pk in ids:
+        task(pk, force=force)
+    return len(ids)
+
+
+class Command(BaseCommand):
+    help = (
+        "Generates missing or outdated image thumbnails for product and "
+        "category images, spread over worker processes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=4,
+            help="Worker processes, 1 runs in this process.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=100,
+            help="Images handed to a worker at a time.",
+        )
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Regenerate thumbnails that are already up to date.",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        batches = []
+        for kind, (model, _) in TASKS.items():
+            ids = list(
+                model.objects.exclude(image="")
+                .exclude(image__isnull=True)
+                .order_by("pk")
+                .values_list("pk", flat=True)
+            )
+            batches += [
+                (kind, ids[start : start + batch_size])
+                for start in range(0, len(ids), batch_size)
+            ]
+
+        done = 0
+        if options["workers"] <= 1:
+            for kind, ids in batches:
+                done += _process(kind, ids, options["force"])
+        else:
+            # children must open their own connections instead of sharing ours
+            connections.close_all()
+            with ProcessPoolExecutor(
+                max_workers=options["workers"], initializer=_init_worker
+            ) as executor:
+                futures = [
+                    executor.submit(_process, kind, ids, options["force"])
+                    for kind, ids in batches
+                ]
+                for future in futures:
+                    done += future.result()
+                    self.stdout.write(f"{done} images checked")
+
+        self.stdout.write(self.style.SUCCESS(f"Done, {done} images checked."))
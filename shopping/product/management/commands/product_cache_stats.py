@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from shopping.product.cache import cache_stats
+from shopping.product.cache import reset_cache_stats
+
+
+class Command(BaseCommand):
+    help = "Shows hit/miss counters of the product list cache."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--reset",
+            action="store_true",
+            help="Reset the counters after printing them.",
+        )
+
+    def handle(self, *args, **options):
+        stats = cache_stats()
+        self.stdout.write(
+            "hits: {hits}, misses: {misses}, hit ratio: {hit_ratio}".format(**stats)
+        )
+        if options["reset"]:
+            reset_cache_stats()
+            self.stdout.write(self.style.SUCCESS("counters reset"))
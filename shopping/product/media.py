@@ -0,0 +1,80 @@
+import time
+from datetime import timedelta
+from functools import lru_cache
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.files.storage import storages
+
+
+def media_url(name, request=None):
+    """
+    Returns the URL of the stored object `name` without asking the storage.
+
+    Public buckets (the default) get the key appended to MEDIA_PUBLIC_URL with
+    plain string formatting. With MINIO_STORAGE_MEDIA_USE_PRESIGNED the
+    storage signs the URL, memoized per key for a MEDIA_PRESIGNED_URL_TTL
+    window. Relative bases are made absolute against `request`.
+
+    Args:
+        name (str | FieldFile): The object key or the file field holding it.
+        request (HttpRequest, optional): Used for relative bases only.
+
+    Returns:
+        The URL, or None when there is no file.
+    """
+    name = getattr(name, "name", name)
+    if not name:
+        return None
+    if settings.MINIO_STORAGE_MEDIA_USE_PRESIGNED:
+        ttl = settings.MEDIA_PRESIGNED_URL_TTL
+        return _presigned_url(name, int(time.time() // ttl))
+
+    url = _public_base() + quote(name.lstrip("/"))
+    if request is not None and "://" not in url:
+        url = request.build_absolute_uri(url)
+    return url
+
+
+def media_srcset(derivatives, request=None):
+    """
+    Turns stored image derivatives into `srcset` strings per format.
+
+    Returns:
+        dict: e.g. {"webp": "https://…/160w.webp 160w, https://…/320w.webp 320w",
+            "jpeg": "…"}, empty until the derivatives have been generated.
+    """
+    srcset = {}
+    for size in (derivatives or {}).get("sizes", []):
+        for extension in ("webp", "jpeg"):
+            if size.get(extension):
+                url = media_url(size[extension], request)
+                srcset.setdefault(extension, []).append(f"{url} {size['width']}w")
+    return {extension: ", ".join(urls) for extension, urls in srcset.items()}
+
+
+def clear_media_url_cache():
+    _public_base.cache_clear()
+    _presigned_url_cache().cache_clear()
+
+
+@lru_cache(maxsize=1)
+def _public_base():
+    return settings.MEDIA_PUBLIC_URL.rstrip("/") + "/"
+
+
+@lru_cache(maxsize=1)
+def _presigned_url_cache():
+    # sized from settings, so the memo is created on first use
+    @lru_cache(maxsize=settings.MEDIA_URL_CACHE_SIZE)
+    def presign(name, window):
+        # valid for two windows so a URL handed out late in its window still
+        # outlives the window it is cached for
+        max_age = timedelta(seconds=2 * settings.MEDIA_PRESIGNED_URL_TTL)
+        return storages["default"].url(name, max_age=max_age)
+
+    return presign
+
+
+def _presigned_url(name, window):
+    return _presigned_url_cache()(name, window)
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:45
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("product", "0002_product_is_active"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(
+                condition=models.Q(("is_active", True)),
+                fields=["-created_at", "-id"],
+                name="product_active_created_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:46
+
+import django.contrib.postgres.fields
+import django.contrib.postgres.indexes
+from django.conf import settings
+from django.contrib.postgres.expressions import ArraySubquery
+from django.db import migrations, models
+from django.db.models import OuterRef
+
+
+def backfill_attribute_value_ids(apps, schema_editor):
+    Product = apps.get_model("product", "Product")
+    ProductAttribute = apps.get_model("product", "ProductAttribute")
+    Product.objects.update(
+        attribute_value_ids=ArraySubquery(
+            ProductAttribute.objects.filter(
+                product=OuterRef("pk"), attribute__isnull=False
+            )
+            .order_by("attribute_id")
+            .values("attribute_id")
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("product", "0003_product_active_created_idx"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="product",
+            name="attribute_value_ids",
+            field=django.contrib.postgres.fields.ArrayField(
+                base_field=models.BigIntegerField(),
+                blank=True,
+                default=list,
+                editable=False,
+                size=None,
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="product",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["attribute_value_ids"], name="product_attr_values_gin"
+            ),
+        ),
+        migrations.RunPython(backfill_attribute_value_ids, migrations.RunPython.noop),
+    ]
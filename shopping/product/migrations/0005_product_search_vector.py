@@ -0,0 +1,77 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:49
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.conf import settings
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.operations import TrigramExtension
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+from django.db.models import OuterRef, Subquery, TextField, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_search_vector(apps, schema_editor):
+    Category = apps.get_model("product", "Category")
+    Product = apps.get_model("product", "Product")
+    ProductAttribute = apps.get_model("product", "ProductAttribute")
+    config = settings.PRODUCT_SEARCH_CONFIG
+    category_name = Subquery(
+        Category.objects.filter(pk=OuterRef("category_id")).values("name")[:1]
+    )
+    attribute_values = Subquery(
+        ProductAttribute.objects.filter(product=OuterRef("pk"))
+        .values("product")
+        .annotate(values=StringAgg("attribute__value", delimiter=" "))
+        .values("values")
+    )
+    Product.objects.update(
+        search_vector=(
+            SearchVector("name", weight="A", config=config)
+            + SearchVector(
+                Coalesce(category_name, Value(""), output_field=TextField()),
+                weight="B",
+                config=config,
+            )
+            + SearchVector(
+                Coalesce(attribute_values, Value(""), output_field=TextField()),
+                weight="C",
+                config=config,
+            )
+            + SearchVector("description", weight="D", config=config)
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("product", "0004_product_attribute_value_ids"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddField(
+            model_name="product",
+            name="search_vector",
+            field=django.contrib.postgres.search.SearchVectorField(
+                editable=False, null=True
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="product",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["search_vector"], name="product_search_vector_gin"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="product",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["name"],
+                name="product_name_trgm_gin",
+                opclasses=["gin_trgm_ops"],
+            ),
+        ),
+        migrations.RunPython(backfill_search_vector, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("product", "0005_product_search_vector"),
+    ]
+
+    operations = [
+        migrations.RenameField(
+            model_name="product",
+            old_name="rating",
+            new_name="rating_avg",
+        ),
+        migrations.AddField(
+            model_name="product",
+            name="rating_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="product",
+            name="rating_1_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="product",
+            name="rating_2_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="product",
+            name="rating_3_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="product",
+            name="rating_4_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="product",
+            name="rating_5_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:04
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("product", "0006_product_review_aggregates"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="review",
+            index=models.Index(
+                fields=["product", "-created_at", "-id"],
+                name="review_product_created_idx",
+            ),
+        ),
+    ]
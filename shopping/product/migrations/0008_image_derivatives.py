@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("product", "0007_review_product_created_idx"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="category",
+            name="image_derivatives",
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.AddField(
+            model_name="productimage",
+            name="image_derivatives",
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
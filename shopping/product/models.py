@@ -1,3 +1,6 @@
+from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
 from django.conf import settings
 from minio_storage.storage import MinioMediaStorage
@@ -19,6 +22,8 @@ class Category(MPTTModel):
         null=True,
         storage=MinioMediaStorage(),
     )
+    # thumbnails written by shopping.product.tasks, see images.generate_derivatives
+    image_derivatives = models.JSONField(default=dict, blank=True, editable=False)
 
     class Meta:
         verbose_name_plural = "Categories"
@@ -29,6 +34,13 @@ class Category(MPTTModel):
     def __str__(self):
         return self.name
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # category filters and search match on the name, see Product.from_db
+        instance._loaded_name = instance.__dict__.get("name")
+        return instance
+
 
 class Product(models.Model):
     name = models.CharField(max_length=200)
@@ -47,12 +59,76 @@ class Product(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     vendor = models.ForeignKey(User, related_name="products", on_delete=models.CASCADE)
-    rating = models.DecimalField(max_digits=3, decimal_places=2, default=0.0)
+    # review aggregates, maintained incrementally by services.apply_review_delta
+    rating_avg = models.DecimalField(max_digits=3, decimal_places=2, default=0.0)
+    rating_count = models.PositiveIntegerField(default=0)
+    rating_1_count = models.PositiveIntegerField(default=0)
+    rating_2_count = models.PositiveIntegerField(default=0)
+    rating_3_count = models.PositiveIntegerField(default=0)
+    rating_4_count = models.PositiveIntegerField(default=0)
+    rating_5_count = models.PositiveIntegerField(default=0)
     is_active = models.BooleanField(default=True)
+    # denormalized AttributeValue ids of `attributes`, kept in sync by
+    # services.sync_attribute_index so filtering is one GIN containment lookup
+    attribute_value_ids = ArrayField(
+        models.BigIntegerField(),
+        default=list,
+        blank=True,
+        editable=False,
+    )
+    # weighted name/category/attributes/description vector, kept in sync by
+    # services.update_search_vector
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    class Meta:
+        indexes = [
+            GinIndex(fields=["attribute_value_ids"], name="product_attr_values_gin"),
+            GinIndex(fields=["search_vector"], name="product_search_vector_gin"),
+            GinIndex(
+                fields=["name"],
+                name="product_name_trgm_gin",
+                opclasses=["gin_trgm_ops"],
+            ),
+            # keyset pagination of the active catalog on (created_at, id)
+            models.Index(
+                fields=["-created_at", "-id"],
+                name="product_active_created_idx",
+                condition=models.Q(is_active=True),
+            ),
+        ]
 
     def __str__(self):
         return self.name
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # remembered so a change that moves the product in or out of a
+        # filtered list invalidates every cached list
+        instance._loaded_listing = instance.listing_entry()
+        return instance
+
+    def listing_entry(self):
+        """The fields deciding which product lists this product appears in."""
+        return tuple(
+            self.__dict__.get(field)
+            for field in (
+                "is_active",
+                "available",
+                "category_id",
+                "discounted_price",
+                "name",
+                "description",
+            )
+        )
+
+    @property
+    def rating_histogram(self):
+        return {
+            str(rating): getattr(self, f"rating_{rating}_count")
+            for rating in range(1, 6)
+        }
+
 
 class ProductImage(models.Model):
     product = models.ForeignKey(
@@ -64,6 +140,7 @@ class ProductImage(models.Model):
         upload_to="images/product_images/",
         storage=MinioMediaStorage(),
     )
+    image_derivatives = models.JSONField(default=dict, blank=True, editable=False)
     is_featured = models.BooleanField(default=False)
 
     class Meta:
@@ -153,6 +230,13 @@ class ProductVariation(models.Model):
     class Meta:
         unique_together = ("product", "attribute")
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # price filters match on variations, see Product.from_db
+        instance._loaded_price = instance.__dict__.get("price_modifier")
+        return instance
+
     def __str__(self):
         return f"{self.product.name} - {self.attribute}"
 
@@ -171,6 +255,20 @@ class Review(models.Model):
 
     class Meta:
         unique_together = ("product", "user")
+        indexes = [
+            # keyset pagination of a product's reviews on (created_at, id)
+            models.Index(
+                fields=["product", "-created_at", "-id"],
+                name="review_product_created_idx",
+            ),
+        ]
 
     def __str__(self):
         return f"Review by {self.user.username} for {self.product.name}"
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # remembered so the product aggregates can be adjusted by the delta
+        instance._loaded_rating = instance.__dict__.get("rating")
+        return instance
@@ -0,0 +1,211 @@
+import binascii
+import json
+from base64 import b64decode
+from base64 import b64encode
+from functools import reduce
+from operator import or_
+
+from django.core.exceptions import FieldDoesNotExist
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination that seeks on the full ordering tuple.
+
+    Unlike DRF's CursorPagination it never falls back to an OFFSET for rows
+    sharing the same first ordering value and never issues a COUNT, so every
+    page costs one index range scan no matter how deep it is. The ordering
+    must end on a unique field (usually `id`) and should be backed by a
+    matching composite index.
+    """
+
+    ordering = ("-created_at", "-id")
+    page_size = 20
+    page_size_query_param = "page_size"
+    max_page_size = 100
+    cursor_query_param = "cursor"
+    invalid_cursor_message = "Invalid cursor"
+
+    def get_page_size(self, request):
+        if self.page_size_query_param:
+            try:
+                page_size = int(request.query_params[self.page_size_query_param])
+                if page_size > 0:
+                    return min(page_size, self.max_page_size)
+            except (KeyError, ValueError):
+                pass
+        return self.page_size
+
+    def get_ordering(self, request, queryset, view):
+        return self.ordering
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.model = queryset.model
+        self.current_ordering = self.get_ordering(request, queryset, view)
+        page_size = self.get_page_size(request)
+        values, reverse = self.decode_cursor(request)
+
+        ordering = self.current_ordering
+        if reverse:
+            ordering = tuple(self._flip(field) for field in ordering)
+        results = self.fetch(queryset, ordering, values, page_size + 1)
+        has_more = len(results) > page_size
+        results = results[:page_size]
+        if reverse:
+            results.reverse()
+            self.has_previous, self.has_next = has_more, True
+        else:
+            self.has_previous, self.has_next = values is not None, has_more
+
+        self.page = results
+        return results
+
+    def fetch(self, queryset, ordering, values, limit):
+        """The first `limit` rows of `queryset` past the cursor `values`."""
+        queryset = queryset.order_by(*ordering)
+        if values is not None:
+            queryset = queryset.filter(self._seek(ordering, values))
+        return list(queryset[:limit])
+
+    def _flip(self, field):
+        return field[1:] if field.startswith("-") else f"-{field}"
+
+    def _seek(self, ordering, values):
+        """
+        Builds `(a, b, c) > (x, y, z)` honouring each field's direction.
+
+        The leading `a >= x` bound is redundant but lets the planner turn the
+        OR chain into a single index range scan.
+        """
+        names = [field.lstrip("-") for field in ordering]
+        lookups = ["lt" if field.startswith("-") else "gt" for field in ordering]
+        branches = []
+        for index, (name, lookup) in enumerate(zip(names, lookups)):
+            equal = {prev: values[prev] for prev in names[:index]}
+            branches.append(Q(**equal, **{f"{name}__{lookup}": values[name]}))
+        bound_lookup = "lte" if ordering[0].startswith("-") else "gte"
+        bound = Q(**{f"{names[0]}__{bound_lookup}": values[names[0]]})
+        return bound & reduce(or_, branches)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            payload = json.loads(b64decode(encoded.encode("ascii")).decode("utf-8"))
+            values = {}
+            for field, value in zip(self.current_ordering, payload["v"], strict=True):
+                name = field.lstrip("-")
+                values[name] = self._to_python(name, value)
+            return values, bool(payload.get("r"))
+        except (
+            ValueError,
+            KeyError,
+            TypeError,
+            binascii.Error,
+            UnicodeDecodeError,
+            ValidationError,
+        ):
+            raise NotFound(self.invalid_cursor_message) from None
+
+    def _to_python(self, name, value):
+        try:
+            return self.model._meta.get_field(name).to_python(value)
+        except FieldDoesNotExist:
+            # annotations (e.g. a search rank) are stored as plain JSON values
+            return value
+
+    def encode_cursor(self, obj, reverse=False):
+        return self.get_cursor_link(
+            self.request.build_absolute_uri(), obj, self.current_ordering, reverse
+        )
+
+    def get_cursor_link(self, url, obj, ordering=None, reverse=False):
+        """
+        Returns `url` pointing at the page that follows `obj`.
+
+        Usable outside of a request cycle, e.g. to link an embedded first
+        page to the full listing.
+        """
+        values = []
+        for field in ordering or self.ordering:
+            value = getattr(obj, field.lstrip("-"))
+            values.append(value.isoformat() if hasattr(value, "isoformat") else value)
+        payload = {"v": values, "r": int(reverse)}
+        encoded = b64encode(json.dumps(payload, default=str).encode("utf-8"))
+        return replace_query_param(url, self.cursor_query_param, encoded.decode())
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1])
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            url = self.request.build_absolute_uri()
+            return remove_query_param(url, self.cursor_query_param)
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response(
+            {
+                "next": self.get_next_link(),
+                "previous": self.get_previous_link(),
+                "results": data,
+            }
+        )
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "previous": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                "name": self.cursor_query_param,
+                "required": False,
+                "in": "query",
+                "description": "The pagination cursor value.",
+                "schema": {"type": "string"},
+            },
+            {
+                "name": self.page_size_query_param,
+                "required": False,
+                "in": "query",
+                "description": "Number of results to return per page.",
+                "schema": {"type": "integer"},
+            },
+        ]
+
+
+class ProductCursorPagination(KeysetPagination):
+    ordering = ("-created_at", "-id")
+    search_ordering = ("-rank", "-id")
+
+    def get_ordering(self, request, queryset, view):
+        # `?q=` searches annotate a relevance rank, order by it instead
+        if "rank" in queryset.query.annotations:
+            return self.search_ordering
+        return self.ordering
+
+
+class ReviewCursorPagination(KeysetPagination):
+    ordering = ("-created_at", "-id")
+    page_size = 10
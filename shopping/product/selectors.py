@@ -1,25 +1,45 @@
-from django.db.models import Prefetch, OuterRef, Subquery
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery
+from django.contrib.postgres.search import SearchRank
+from django.contrib.postgres.search import TrigramSimilarity
+from django.db import connection
+from django.db.models import Prefetch, OuterRef, Subquery, Q, F, FloatField
+from django.db.models.functions import Cast
 from shopping.product.models import Product, Category
+from shopping.product.models import AttributeType, AttributeValue
 from shopping.product.models import ProductImage
 from shopping.product.models import Review
 from shopping.product.models import ProductVariation, ProductAttribute
 import logging
 
-
 logger = logging.getLogger("selector")
 
+# reviews embedded in the product detail, the rest are behind the review cursor
+EMBEDDED_REVIEWS_COUNT = 5
+REVIEW_FIELDS = (
+    "id",
+    "product_id",
+    "rating",
+    "comment",
+    "created_at",
+    "updated_at",
+    "user__id",
+    "user__name",
+)
+
 
 def product_list():
     try:
         queryset = Product.objects.filter(is_active=True).select_related("vendor")
 
         # Featured image annotation
-        featured_image_subquery = (
-            ProductImage.objects.filter(product=OuterRef("pk"))
-            .order_by("-is_featured", "id")
-            .values("image")[:1]
+        featured_image = ProductImage.objects.filter(product=OuterRef("pk")).order_by(
+            "-is_featured", "id"
+        )
+        queryset = queryset.annotate(
+            image=Subquery(featured_image.values("image")[:1]),
+            image_derivatives=Subquery(featured_image.values("image_derivatives")[:1]),
         )
-        queryset = queryset.annotate(image=Subquery(featured_image_subquery))
 
         # Prefetch attributes with related attribute and type
         attributes_qs = ProductAttribute.objects.select_related(
@@ -39,6 +59,26 @@ def product_list():
         logger.error(f"while fetching product_list, Exception: {e}")
 
 
+def product_search(queryset, term):
+    """
+    Filters `queryset` by `term` and annotates a relevance `rank`.
+
+    Full-text matches on the stored search vector are combined with a pg_trgm
+    similarity match on the name (typo tolerance), both served by GIN indexes
+    in a single query. The trigram cutoff is pg_trgm.similarity_threshold.
+    """
+    query = SearchQuery(
+        term, search_type="websearch", config=settings.PRODUCT_SEARCH_CONFIG
+    )
+    rank = SearchRank(F("search_vector"), query) + TrigramSimilarity("name", term)
+    return queryset.filter(
+        Q(search_vector=query) | Q(name__trigram_similar=term)
+    ).annotate(
+        # float8 so the rank survives the pagination cursor round trip exactly
+        rank=Cast(rank, FloatField())
+    )
+
+
 def product_detail():
     try:
         # Prefetch querysets with ordering
@@ -57,7 +97,12 @@ def product_detail():
                 Prefetch("attributes", queryset=attributes_qs),
                 Prefetch("variations", queryset=variations_qs),
                 Prefetch("images", queryset=images_qs),
-                "reviews__user",
+                Prefetch(
+                    "reviews",
+                    # one extra row tells whether there is a next page
+                    queryset=product_reviews()[: EMBEDDED_REVIEWS_COUNT + 1],
+                    to_attr="latest_reviews",
+                ),
             )
         )
         logger.debug(str(queryset.query))
@@ -65,3 +110,118 @@ def product_detail():
     except Exception as e:
         logger.error(f"while fetching product_detail, Exception: {e}")
         return None
+
+
+def product_reviews(product_id=None):
+    """
+    Reviews newest first, with only the columns the review serializer needs.
+
+    The `(product, -created_at, -id)` index serves both the scoped listing
+    and the keyset seek.
+    """
+    queryset = (
+        Review.objects.select_related("user")
+        .only(*REVIEW_FIELDS)
+        .order_by("-created_at", "-id")
+    )
+    if product_id is not None:
+        queryset = queryset.filter(product_id=product_id)
+    return queryset
+
+
+def category_tree():
+    """
+    Builds the whole category forest from a single query.
+
+    Rows ordered by `(tree_id, lft)` always list a parent before its
+    children, so every node can be attached to its already built parent in
+    one pass. Each node also carries its `ancestors`, the path from the root
+    down to itself, as the category list has always returned it.
+    """
+    nodes = {}
+    roots = []
+    categories = Category.objects.order_by("tree_id", "lft").values(
+        "id", "parent_id", "name", "slug", "level"
+    )
+    for category in categories:
+        parent = nodes.get(category.pop("parent_id"))
+        path = {key: category[key] for key in ("id", "name", "level")}
+        ancestors = [*parent["ancestors"], path] if parent else [path]
+        node = nodes[category["id"]] = {
+            **category,
+            "ancestors": ancestors,
+            "children": [],
+        }
+        (parent["children"] if parent else roots).append(node)
+    return roots
+
+
+def category_subtree(tree, slug):
+    """Returns the node of `tree` with the given slug, or None."""
+    stack = list(tree)
+    while stack:
+        node = stack.pop()
+        if node["slug"] == slug:
+            return node
+        stack.extend(node["children"])
+    return None
+
+
+def trim_category_tree(tree, depth):
+    """Copies `tree` keeping `depth` levels of children below its nodes."""
+    return [
+        {
+            **node,
+            "children": (
+                trim_category_tree(node["children"], depth - 1) if depth > 0 else []
+            ),
+        }
+        for node in tree
+    ]
+
+
+def product_facet_counts(queryset):
+    """
+    Counts the products of `queryset` per attribute value in one query.
+
+    The filtered products are unnested on `attribute_value_ids` so the counts
+    always describe the current result set, grouped by attribute type.
+    """
+    try:
+        products_sql, params = (
+            queryset.order_by().values("attribute_value_ids").query.sql_with_params()
+        )
+        sql = f"""
+            SELECT t.name, t.slug, v.value, v.slug, v.hex_code, f.count
+            FROM (
+                SELECT u.value_id, COUNT(*) AS count
+                FROM ({products_sql}) p
+                CROSS JOIN LATERAL unnest(p.attribute_value_ids) AS u(value_id)
+                GROUP BY u.value_id
+            ) f
+            JOIN {AttributeValue._meta.db_table} v ON v.id = f.value_id
+            JOIN {AttributeType._meta.db_table} t ON t.id = v.attribute_type_id
+            ORDER BY t.name, v.value
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            rows = cursor.fetchall()
+
+        facets = {}
+        for type_name, type_slug, value, value_slug, hex_code, count in rows:
+            facet = facets.setdefault(
+                type_slug,
+                {"attribute": type_name, "attribute_slug": type_slug, "values": []},
+            )
+            facet["values"].append(
+                {
+                    "value": value,
+                    "value_slug": value_slug,
+                    "hex_code": hex_code,
+                    "count": count,
+                }
+            )
+        return list(facets.values())
+    except Exception as e:
+        logger.error(f"while fetching product_facet_counts, Exception: {e}")
+        return []
@@ -0,0 +1,110 @@
+from django.conf import settings
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.expressions import ArraySubquery
+from django.contrib.postgres.search import SearchVector
+from django.db.models import DecimalField
+from django.db.models import F
+from django.db.models import OuterRef
+from django.db.models import Subquery
+from django.db.models import TextField
+from django.db.models import Value
+from django.db.models.functions import Cast
+from django.db.models.functions import Coalesce
+from django.db.models.functions import NullIf
+
+from shopping.product.models import Category
+from shopping.product.models import Product
+from shopping.product.models import ProductAttribute
+
+
+def sync_attribute_index(product_ids=None):
+    """
+    Rebuilds `Product.attribute_value_ids` from the ProductAttribute rows.
+
+    Runs as a single UPDATE with a correlated ARRAY(subquery), for the given
+    products or for the whole catalog when `product_ids` is None.
+    """
+    value_ids = ArraySubquery(
+        ProductAttribute.objects.filter(product=OuterRef("pk"), attribute__isnull=False)
+        .order_by("attribute_id")
+        .values("attribute_id")
+    )
+    queryset = Product.objects.all()
+    if product_ids is not None:
+        queryset = queryset.filter(pk__in=product_ids)
+    return queryset.update(attribute_value_ids=value_ids)
+
+
+def update_search_vector(product_ids=None):
+    """
+    Recomputes `Product.search_vector` with a single UPDATE.
+
+    Name, category name, attribute values and description are weighted A to D
+    so the rank favours name matches. Pass `product_ids` (ids or a subquery)
+    to limit the update, or None to rebuild the whole catalog.
+    """
+    config = settings.PRODUCT_SEARCH_CONFIG
+    category_name = Subquery(
+        Category.objects.filter(pk=OuterRef("category_id")).values("name")[:1]
+    )
+    attribute_values = Subquery(
+        ProductAttribute.objects.filter(product=OuterRef("pk"))
+        .values("product")
+        .annotate(values=StringAgg("attribute__value", delimiter=" "))
+        .values("values")
+    )
+    vector = (
+        SearchVector("name", weight="A", config=config)
+        + SearchVector(
+            Coalesce(category_name, Value(""), output_field=TextField()),
+            weight="B",
+            config=config,
+        )
+        + SearchVector(
+            Coalesce(attribute_values, Value(""), output_field=TextField()),
+            weight="C",
+            config=config,
+        )
+        + SearchVector("description", weight="D", config=config)
+    )
+    queryset = Product.objects.all()
+    if product_ids is not None:
+        queryset = queryset.filter(pk__in=product_ids)
+    return queryset.update(search_vector=vector)
+
+
+def apply_review_delta(product_id, added=None, removed=None):
+    """
+    Adjusts the product review aggregates for one review change.
+
+    `added` is the rating of a created/updated review and `removed` the
+    rating it replaces or that got deleted. Counts are moved with F
+    expressions and the average is derived from the histogram in the same
+    UPDATE, so concurrent reviews never re-aggregate or overwrite each other.
+    """
+    if added == removed:
+        return 0
+
+    deltas = {rating: 0 for rating in range(1, 6)}
+    if added is not None:
+        deltas[added] += 1
+    if removed is not None:
+        deltas[removed] -= 1
+
+    count = F("rating_count") + sum(deltas.values())
+    total = sum(
+        (F(f"rating_{rating}_count") + delta) * rating
+        for rating, delta in deltas.items()
+    )
+    updates = {
+        f"rating_{rating}_count": F(f"rating_{rating}_count") + delta
+        for rating, delta in deltas.items()
+        if delta
+    }
+    updates["rating_count"] = count
+    updates["rating_avg"] = Coalesce(
+        Cast(total, DecimalField(max_digits=12, decimal_places=6)) / NullIf(count, 0),
+        Value(0),
+        output_field=DecimalField(max_digits=3, decimal_places=2),
+    )
+    return Product.objects.filter(pk=product_id).update(**updates)
@@ -1,43 +1,147 @@
-# from django.db import transaction
-# from django.db.models.signals import post_save
-# from django.dispatch import receiver
-
-# from shopping.product.models import Product
-
-
-# @receiver(post_save, sender=Product)
-# def add_category(sender, instance, created, **kwargs):
-#     if created:
-#         return
-
-#     def _add_parent():
-#         # Get all existing categories for the product with their hierarchy
-#         existing_categories = set(
-#             instance.categories.values_list("category_id", flat=True),
-#         )
-#         new_relationships = []
-
-#         # Process each category to find ancestors
-#         for pc in instance.categories.select_related("category__parent").all():
-#             current_category = pc.category
-#             depth = pc.depth
-
-#             # Walk up the parent hierarchy
-#             while current_category.parent:
-#                 current_category = current_category.parent
-#                 depth += 1
-
-#                 # if current_category.id not in existing_categories:
-#                 #     new_relationships.append(
-#                 #         ProductCategory(
-#                 #             product=instance,
-#                 #             category=current_category,
-#                 #             depth=depth,
-#                 #         ),
-#                 #     )
-#                 #     existing_categories.add(current_category.id)
-
-#         if new_relationships:
-#             ProductCategory.objects.bulk_create(new_relationships)
-
-#     transaction.on_commit(_add_parent)
+from django.db import transaction
+from django.db.models.signals import post_delete
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from mptt.signals import node_moved
+
+from shopping.product.cache import CATALOG_SCOPE
+from shopping.product.cache import bump_category_tree
+from shopping.product.cache import bump_versions
+from shopping.product.cache import category_scope
+from shopping.product.cache import product_scope
+from shopping.product.images import derivatives_are_current
+from shopping.product.models import Category
+from shopping.product.models import Product
+from shopping.product.models import ProductAttribute
+from shopping.product.models import ProductImage
+from shopping.product.models import ProductVariation
+from shopping.product.models import Review
+from shopping.product.services import apply_review_delta
+from shopping.product.services import sync_attribute_index
+from shopping.product.services import update_search_vector
+from shopping.product.tasks import enqueue
+from shopping.product.tasks import generate_category_image_derivatives
+from shopping.product.tasks import generate_product_image_derivatives
+
+
+def _bump_on_commit(*scopes):
+    transaction.on_commit(lambda: bump_versions(*scopes))
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def invalidate_product(sender, instance, created=False, **kwargs):
+    scopes = [product_scope(instance.pk), category_scope(instance.category_id)]
+    # creating, deleting, (de)activating, recategorizing, repricing or
+    # renaming a product shifts every list it could appear in
+    listing = instance.listing_entry()
+    if (
+        created
+        or kwargs["signal"] is post_delete
+        or getattr(instance, "_loaded_listing", None) != listing
+    ):
+        scopes.append(CATALOG_SCOPE)
+    instance._loaded_listing = listing
+    _bump_on_commit(*scopes)
+
+
+@receiver(post_save, sender=ProductImage)
+@receiver(post_delete, sender=ProductImage)
+@receiver(post_save, sender=ProductVariation)
+@receiver(post_delete, sender=ProductVariation)
+@receiver(post_save, sender=ProductAttribute)
+@receiver(post_delete, sender=ProductAttribute)
+def invalidate_product_relation(sender, instance, **kwargs):
+    _bump_on_commit(product_scope(instance.product_id))
+
+
+@receiver(post_save, sender=ProductVariation)
+@receiver(post_delete, sender=ProductVariation)
+def invalidate_price_filters(sender, instance, created=False, **kwargs):
+    # a new, deleted or repriced variation can move its product in or out of
+    # a price range, see invalidate_product
+    price = instance.__dict__.get("price_modifier")
+    if (
+        created
+        or kwargs["signal"] is post_delete
+        or getattr(instance, "_loaded_price", None) != price
+    ):
+        _bump_on_commit(CATALOG_SCOPE)
+    instance._loaded_price = price
+
+
+@receiver(post_save, sender=ProductAttribute)
+@receiver(post_delete, sender=ProductAttribute)
+def invalidate_attribute_filters(sender, instance, **kwargs):
+    # attribute filters and search match on the product's attributes
+    _bump_on_commit(CATALOG_SCOPE)
+
+
+@receiver(post_save, sender=ProductAttribute)
+@receiver(post_delete, sender=ProductAttribute)
+def update_attribute_index(sender, instance, **kwargs):
+    sync_attribute_index([instance.product_id])
+    update_search_vector([instance.product_id])
+
+
+@receiver(post_save, sender=Product)
+def update_product_search_vector(sender, instance, update_fields=None, **kwargs):
+    if update_fields and not {"name", "description", "category"} & set(update_fields):
+        return
+    update_search_vector([instance.pk])
+
+
+@receiver(post_save, sender=Category)
+def update_category_search_vectors(sender, instance, created, **kwargs):
+    if not created:
+        update_search_vector(instance.products.values("pk"))
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_category(sender, instance, created=False, **kwargs):
+    scopes = [category_scope(instance.pk)]
+    # category filters and search match on the name
+    name = instance.__dict__.get("name")
+    if kwargs["signal"] is post_delete or (
+        not created and getattr(instance, "_loaded_name", None) != name
+    ):
+        scopes.append(CATALOG_SCOPE)
+    instance._loaded_name = name
+    _bump_on_commit(*scopes)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(node_moved, sender=Category)
+def invalidate_category_tree(sender, instance, **kwargs):
+    transaction.on_commit(bump_category_tree)
+
+
+@receiver(post_save, sender=Review)
+def add_review_to_aggregates(sender, instance, created, **kwargs):
+    removed = None if created else getattr(instance, "_loaded_rating", None)
+    apply_review_delta(instance.product_id, added=instance.rating, removed=removed)
+    instance._loaded_rating = instance.rating
+    _bump_on_commit(product_scope(instance.product_id))
+
+
+@receiver(post_delete, sender=Review)
+def remove_review_from_aggregates(sender, instance, **kwargs):
+    apply_review_delta(instance.product_id, removed=instance.rating)
+    _bump_on_commit(product_scope(instance.product_id))
+
+
+@receiver(post_save, sender=ProductImage)
+@receiver(post_save, sender=Category)
+def queue_image_derivatives(sender, instance, **kwargs):
+    if not instance.image or derivatives_are_current(
+        instance.image_derivatives, instance.image.name
+    ):
+        return
+    task = (
+        generate_product_image_derivatives
+        if sender is ProductImage
+        else generate_category_image_derivatives
+    )
+    transaction.on_commit(lambda: enqueue(task, instance.pk))
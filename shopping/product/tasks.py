@@ -0,0 +1,81 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections
+
+from shopping.product.cache import bump_versions
+from shopping.product.cache import product_scope
+from shopping.product.images import derivatives_are_current
+from shopping.product.images import generate_derivatives
+from shopping.product.models import Category
+from shopping.product.models import ProductImage
+
+logger = logging.getLogger("django")
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def enqueue(func, *args):
+    """
+    Runs `func(*args)` on a background thread, off the request path.
+
+    Jobs lost to a restart are picked up by `generate_image_derivatives`,
+    the tasks below are idempotent. With IMAGE_DERIVATIVE_WORKERS = 0 the
+    job runs inline.
+    """
+    global _executor
+    if not settings.IMAGE_DERIVATIVE_WORKERS:
+        return func(*args)
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.IMAGE_DERIVATIVE_WORKERS,
+                thread_name_prefix="image-derivatives",
+            )
+    return _executor.submit(_run, func, *args)
+
+
+def _run(func, *args):
+    try:
+        func(*args)
+    except Exception:
+        logger.exception(f"background task {func.__name__}{args} failed")
+    finally:
+        # the thread got its own connection, don't leak it
+        connections.close_all()
+
+
+def _generate(model, pk, force):
+    instance = model.objects.filter(pk=pk).first()
+    if instance is None or not instance.image:
+        return None
+    name = instance.image.name
+    if not force and derivatives_are_current(instance.image_derivatives, name):
+        return None
+
+    derivatives = generate_derivatives(instance.image)
+    # a re-upload while we were resizing has its own task queued, keep the
+    # row consistent by recording only against the source we processed
+    updated = model.objects.filter(pk=pk, image=name).update(
+        image_derivatives=derivatives
+    )
+    return instance if updated else None
+
+
+def generate_product_image_derivatives(image_id, force=False):
+    """
+    Generates the thumbnails of a ProductImage, a no-op when they are current.
+    """
+    image = _generate(ProductImage, image_id, force)
+    if image is not None:
+        bump_versions(product_scope(image.product_id))
+
+
+def generate_category_image_derivatives(category_id, force=False):
+    """
+    Generates the thumbnails of a Category image, a no-op when they are current.
+    """
+    _generate(Category, category_id, force)
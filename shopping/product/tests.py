@@ -1,3 +1,514 @@
-from django.test import TestCase
+from base64 import b64encode
+from decimal import Decimal
+from io import BytesIO
+from io import StringIO
 
-# Create your tests here.
+import pytest
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.core.management import call_command
+from django.db import connection
+from django.http import QueryDict
+from django.test.utils import CaptureQueriesContext
+from PIL import Image
+from rest_framework.test import APIClient
+
+from shopping.product.cache import cache_stats
+from shopping.product.cache import cached_product_list
+from shopping.product.cache import product_list_cache_key
+from shopping.product.cache import product_scope
+from shopping.product import media
+from shopping.product.media import clear_media_url_cache
+from shopping.product.media import media_url
+from shopping.product.models import AttributeType
+from shopping.product.models import AttributeValue
+from shopping.product.models import Category
+from shopping.product.models import Product
+from shopping.product.models import ProductAttribute
+from shopping.product.models import ProductImage
+from shopping.product.models import ProductVariation
+from shopping.product.models import Review
+from shopping.product.selectors import EMBEDDED_REVIEWS_COUNT
+from shopping.product.tasks import generate_product_image_derivatives
+from shopping.users.tests.factories import UserFactory
+
+
+@pytest.fixture(autouse=True)
+def _clear_cache():
+    cache.clear()
+
+
+class TestProductListCache:
+    def test_cache_key_is_normalized(self):
+        assert product_list_cache_key(
+            QueryDict("b=1&a=2&c=")
+        ) == product_list_cache_key(QueryDict("a=2&b=1"))
+        assert product_list_cache_key(QueryDict("a=1")) != product_list_cache_key(
+            QueryDict("a=2")
+        )
+
+    def test_read_through(self):
+        calls = []
+
+        def loader():
+            calls.append(1)
+            return ["data"], {product_scope(1)}
+
+        params = QueryDict("name=runner")
+        assert cached_product_list(params, loader) == ["data"]
+        assert cached_product_list(params, loader) == ["data"]
+        assert len(calls) == 1
+        assert cache_stats() == {"hits": 1, "misses": 1, "hit_ratio": 0.5}
+
+    def test_related_write_invalidates_only_its_product(
+        self, product, django_capture_on_commit_callbacks
+    ):
+        variation = ProductVariation.objects.create(product=product, stock=3)
+        variation = ProductVariation.objects.get(pk=variation.pk)
+
+        def loader_for(product_id):
+            return lambda: ([product_id], {product_scope(product_id)})
+
+        cached_product_list(QueryDict("p=mine"), loader_for(product.pk))
+        cached_product_list(QueryDict("p=other"), loader_for(0))
+
+        with django_capture_on_commit_callbacks(execute=True):
+            variation.stock = 2
+            variation.save()
+
+        cached_product_list(QueryDict("p=mine"), loader_for(product.pk))
+        cached_product_list(QueryDict("p=other"), loader_for(0))
+        assert cache_stats()["misses"] == 3
+        assert cache_stats()["hits"] == 1
+
+    def test_listing_change_invalidates_every_list(
+        self, product, django_capture_on_commit_callbacks
+    ):
+        product = Product.objects.get(pk=product.pk)
+        category = Category.objects.get(pk=product.category_id)
+        variation = ProductVariation.objects.create(product=product, stock=3)
+        variation = ProductVariation.objects.get(pk=variation.pk)
+        red = AttributeValue.objects.create(
+            attribute_type=AttributeType.objects.create(name="Color", slug="color"),
+            value="Red",
+            slug="red",
+        )
+
+        def loader():
+            return [0], set()
+
+        def save(instance, **values):
+            for name, value in values.items():
+                setattr(instance, name, value)
+            instance.save()
+
+        changes = [
+            lambda: save(product, is_active=False),
+            lambda: save(product, discounted_price=10),
+            lambda: save(product, name="Trail runner"),
+            lambda: save(product, description="Trail shoe"),
+            lambda: save(variation, price_modifier=5),
+            lambda: ProductVariation.objects.create(product=product, stock=1),
+            lambda: ProductVariation.objects.filter(product=product).last().delete(),
+            lambda: ProductAttribute.objects.create(product=product, attribute=red),
+            lambda: ProductAttribute.objects.filter(product=product).delete(),
+            lambda: save(category, name="Trail"),
+        ]
+        cached_product_list(QueryDict("p=other"), loader)
+        for change in changes:
+            with django_capture_on_commit_callbacks(execute=True):
+                change()
+            cached_product_list(QueryDict("p=other"), loader)
+        assert cache_stats() == {
+            "hits": 0,
+            "misses": len(changes) + 1,
+            "hit_ratio": 0.0,
+        }
+
+
+class TestProductCursorPagination:
+    @pytest.fixture
+    def products(self, product):
+        # share one created_at so the id tiebreaker is exercised
+        for index in range(4):
+            Product.objects.create(
+                name=f"Runner {index}",
+                slug=f"runner-{index}",
+                description="Running shoe",
+                category=product.category,
+                vendor=product.vendor,
+            )
+        Product.objects.update(created_at=product.created_at)
+        return list(Product.objects.order_by("-id"))
+
+    def test_walks_all_pages_without_count_or_offset(self, products):
+        client = APIClient()
+        url = "/api/product/v1/list/?page_size=2"
+        seen = []
+        with CaptureQueriesContext(connection) as ctx:
+            while url:
+                data = client.get(url).json()
+                seen += [item["id"] for item in data["results"]]
+                url = data["next"]
+        assert seen == [product.pk for product in products]
+        sql = " ".join(query["sql"] for query in ctx.captured_queries).upper()
+        assert "COUNT(" not in sql
+        assert "OFFSET" not in sql
+
+    def test_previous_link(self, products):
+        client = APIClient()
+        first = client.get("/api/product/v1/list/?page_size=2").json()
+        second = client.get(first["next"]).json()
+        back = client.get(second["previous"]).json()
+        assert back["results"] == first["results"]
+
+    def test_cursor_params_are_not_attribute_filters(self, products):
+        data = APIClient().get("/api/product/v1/list/?page_size=1").json()
+        assert len(data["results"]) == 1
+
+    def test_invalid_cursor_is_not_found(self, products):
+        client = APIClient()
+        for payload in ("[]", '{"v": [1]}', '{"v": ["soon", 1]}', "\xff"):
+            cursor = b64encode(payload.encode("latin-1")).decode()
+            response = client.get("/api/product/v1/list/", {"cursor": cursor})
+            assert response.status_code == 404
+        response = client.get("/api/product/v1/list/", {"cursor": "not base64!"})
+        assert response.status_code == 404
+
+
+class TestAttributeFacetIndex:
+    @pytest.fixture
+    def values(self, db):
+        color = AttributeType.objects.create(name="Color", slug="color")
+        size = AttributeType.objects.create(name="Size", slug="size")
+        return {
+            "red": AttributeValue.objects.create(
+                attribute_type=color, value="Red", slug="red"
+            ),
+            "blue": AttributeValue.objects.create(
+                attribute_type=color, value="Blue", slug="blue"
+            ),
+            "xl": AttributeValue.objects.create(
+                attribute_type=size, value="XL", slug="xl"
+            ),
+        }
+
+    @pytest.fixture
+    def other(self, product):
+        return Product.objects.create(
+            name="Walker",
+            slug="walker",
+            description="Walking shoe",
+            category=product.category,
+            vendor=product.vendor,
+        )
+
+    def test_index_follows_attribute_writes(self, product, values):
+        attribute = ProductAttribute.objects.create(
+            product=product, attribute=values["red"]
+        )
+        ProductAttribute.objects.create(product=product, attribute=values["xl"])
+        product.refresh_from_db()
+        assert sorted(product.attribute_value_ids) == sorted(
+            [values["red"].pk, values["xl"].pk]
+        )
+
+        attribute.delete()
+        product.refresh_from_db()
+        assert product.attribute_value_ids == [values["xl"].pk]
+
+    def test_filter_and_facets(self, product, other, values):
+        ProductAttribute.objects.create(product=product, attribute=values["red"])
+        ProductAttribute.objects.create(product=product, attribute=values["xl"])
+        ProductAttribute.objects.create(product=other, attribute=values["blue"])
+        ProductAttribute.objects.create(product=other, attribute=values["xl"])
+        client = APIClient()
+
+        data = client.get("/api/product/v1/list/?color=red&size=xl").json()
+        assert [item["id"] for item in data["results"]] == [product.pk]
+        data = client.get("/api/product/v1/list/?color=green").json()
+        assert data["results"] == []
+
+        facets = client.get("/api/product/v1/facets/?size=xl").json()
+        counts = {
+            (facet["attribute_slug"], value["value_slug"]): value["count"]
+            for facet in facets
+            for value in facet["values"]
+        }
+        assert counts == {("color", "blue"): 1, ("color", "red"): 1, ("size", "xl"): 2}
+
+
+class TestProductSearch:
+    @pytest.fixture
+    def catalog(self, product):
+        color = AttributeType.objects.create(name="Color", slug="color")
+        red = AttributeValue.objects.create(
+            attribute_type=color, value="Crimson", slug="crimson"
+        )
+        ProductAttribute.objects.create(product=product, attribute=red)
+        return [
+            product,
+            Product.objects.create(
+                name="Leather boot",
+                slug="leather-boot",
+                description="A boot for running errands",
+                category=product.category,
+                vendor=product.vendor,
+            ),
+        ]
+
+    def search(self, term):
+        data = APIClient().get("/api/product/v1/list/", {"q": term}).json()
+        return [item["id"] for item in data["results"]]
+
+    def test_vector_covers_category_and_attributes(self, catalog):
+        runner, boot = catalog
+        assert self.search("crimson") == [runner.pk]
+        # both sit in the "Shoes" category, the runner's description adds weight
+        assert self.search("shoes") == [runner.pk, boot.pk]
+
+    def test_ranks_name_matches_first(self, catalog):
+        runner, boot = catalog
+        assert self.search("runner")[0] == runner.pk
+
+    def test_typo_tolerance(self, catalog):
+        runner, boot = catalog
+        assert self.search("lether boot") == [boot.pk]
+
+    def test_category_rename_updates_vector(self, catalog):
+        runner, boot = catalog
+        runner.category.name = "Sneakers"
+        runner.category.save()
+        assert set(self.search("sneakers")) == {runner.pk, boot.pk}
+
+    def test_pages_through_ranked_results(self, catalog):
+        client = APIClient()
+        url = "/api/product/v1/list/?q=shoes&page_size=1"
+        seen = []
+        while url:
+            data = client.get(url).json()
+            seen += [item["id"] for item in data["results"]]
+            url = data["next"]
+        assert seen == self.search("shoes")
+
+
+class TestReviewAggregates:
+    @pytest.fixture
+    def reviewers(self, db):
+        return [UserFactory() for _ in range(3)]
+
+    def test_create_update_delete(self, product, reviewers):
+        first = Review.objects.create(
+            product=product, user=reviewers[0], rating=5, comment="great"
+        )
+        Review.objects.create(
+            product=product, user=reviewers[1], rating=2, comment="meh"
+        )
+        product.refresh_from_db()
+        assert product.rating_count == 2
+        assert product.rating_avg == Decimal("3.50")
+        assert product.rating_histogram == {"1": 0, "2": 1, "3": 0, "4": 0, "5": 1}
+
+        first = Review.objects.get(pk=first.pk)
+        first.rating = 3
+        first.save()
+        product.refresh_from_db()
+        assert product.rating_avg == Decimal("2.50")
+        assert product.rating_histogram == {"1": 0, "2": 1, "3": 1, "4": 0, "5": 0}
+
+        Review.objects.filter(pk=first.pk).delete()
+        product.refresh_from_db()
+        assert product.rating_count == 1
+        assert product.rating_avg == Decimal("2.00")
+
+    def test_backfill_command(self, product, reviewers):
+        for user, rating in zip(reviewers, (4, 4, 1)):
+            Review.objects.create(product=product, user=user, rating=rating, comment="")
+        Product.objects.update(rating_avg=0, rating_count=0, rating_4_count=0)
+
+        call_command("backfill_review_aggregates", stdout=StringIO())
+        product.refresh_from_db()
+        assert product.rating_count == 3
+        assert product.rating_avg == Decimal("3.00")
+        assert product.rating_histogram == {"1": 1, "2": 0, "3": 0, "4": 2, "5": 0}
+
+
+class TestProductReviews:
+    @pytest.fixture
+    def reviews(self, product):
+        other = Product.objects.create(
+            name="Other", slug="other", category=product.category, vendor=product.vendor
+        )
+        Review.objects.create(product=other, user=UserFactory(), rating=1, comment="")
+        return [
+            Review.objects.create(
+                product=product, user=UserFactory(), rating=4, comment=str(index)
+            )
+            for index in range(7)
+        ]
+
+    def test_list_is_scoped_and_paginated(self, product, reviews):
+        client = APIClient()
+        url = f"/api/product/v1/review_list/{product.pk}?page_size=3"
+        seen = []
+        while url:
+            data = client.get(url).json()
+            seen += [review["id"] for review in data["results"]]
+            url = data["next"]
+        assert seen == [review.pk for review in reversed(reviews)]
+        assert set(data["results"][0]["user"]) == {"id", "name"}
+
+    def test_detail_embeds_first_page(self, product, reviews):
+        client = APIClient()
+        data = client.get(f"/api/product/v1/retrieve/{product.pk}").json()
+        embedded = data["reviews"]
+        assert len(embedded["results"]) == EMBEDDED_REVIEWS_COUNT
+        rest = client.get(embedded["next"]).json()
+        assert [review["id"] for review in embedded["results"] + rest["results"]] == [
+            review.pk for review in reversed(reviews)
+        ]
+        assert rest["next"] is None
+
+
+def _selects(queries):
+    # ATOMIC_REQUESTS wraps every request in savepoints, only count reads
+    return [query for query in queries if query["sql"].startswith("SELECT")]
+
+
+class TestCategoryTree:
+    @pytest.fixture
+    def tree(self, category):
+        men = Category.objects.create(name="Men", slug="men", parent=category)
+        Category.objects.create(name="Trail", slug="trail", parent=men)
+        Category.objects.create(name="Women", slug="women", parent=category)
+        return category
+
+    def test_single_query_and_cached(self, tree):
+        client = APIClient()
+        with CaptureQueriesContext(connection) as queries:
+            data = client.get("/api/product/v1/categories").json()
+        assert len(_selects(queries)) == 1
+        assert data[0]["slug"] == "shoes"
+        assert [child["slug"] for child in data[0]["children"]] == ["men", "women"]
+        assert data[0]["children"][0]["children"][0]["slug"] == "trail"
+
+        with CaptureQueriesContext(connection) as queries:
+            client.get("/api/product/v1/categories")
+        assert _selects(queries) == []
+
+    def test_keeps_the_list_contract(self, tree):
+        data = APIClient().get("/api/product/v1/categories").json()
+        assert {"id", "name", "children"} <= data[0].keys()
+        trail = data[0]["children"][0]["children"][0]
+        assert trail["ancestors"] == [
+            {"id": tree.pk, "name": "Shoes", "level": 0},
+            {"id": data[0]["children"][0]["id"], "name": "Men", "level": 1},
+            {"id": trail["id"], "name": "Trail", "level": 2},
+        ]
+
+    def test_depth_and_subtree(self, tree):
+        client = APIClient()
+        data = client.get("/api/product/v1/categories?depth=1").json()
+        assert all(child["children"] == [] for child in data[0]["children"])
+
+        data = client.get("/api/product/v1/categories/men").json()
+        assert [node["slug"] for node in data] == ["men"]
+        assert data[0]["children"][0]["slug"] == "trail"
+
+        assert client.get("/api/product/v1/categories/nope").status_code == 404
+        assert client.get("/api/product/v1/categories?depth=-1").status_code == 400
+
+    def test_move_invalidates(self, tree, django_capture_on_commit_callbacks):
+        client = APIClient()
+        client.get("/api/product/v1/categories")
+        with django_capture_on_commit_callbacks(execute=True):
+            Category.objects.get(slug="trail").move_to(
+                Category.objects.get(slug="women")
+            )
+        data = client.get("/api/product/v1/categories/women").json()
+        assert data[0]["children"][0]["slug"] == "trail"
+
+
+class TestMediaUrl:
+    @pytest.fixture(autouse=True)
+    def _fresh_memo(self):
+        clear_media_url_cache()
+        yield
+        clear_media_url_cache()
+
+    def test_public_url_is_formatted(self, settings, rf):
+        settings.MEDIA_PUBLIC_URL = "https://cdn.example.com/media"
+        image = ProductImage(image="images/product_images/a b.jpg")
+        assert media_url(image.image, rf.get("/")) == (
+            "https://cdn.example.com/media/images/product_images/a%20b.jpg"
+        )
+        assert media_url(ProductImage().image) is None
+
+    def test_relative_base_uses_request(self, settings, rf):
+        settings.MEDIA_PUBLIC_URL = "/media/"
+        assert media_url("x.jpg", rf.get("/")) == "http://testserver/media/x.jpg"
+
+    def test_presigned_urls_are_memoized(self, settings, monkeypatch):
+        calls = []
+
+        class Storage:
+            def url(self, name, max_age=None):
+                calls.append(name)
+                return f"https://minio/{name}?sig={len(calls)}"
+
+        monkeypatch.setattr(media, "storages", {"default": Storage()})
+        settings.MINIO_STORAGE_MEDIA_USE_PRESIGNED = True
+        assert media_url("a.jpg") == media_url("a.jpg") == "https://minio/a.jpg?sig=1"
+        media_url("b.jpg")
+        assert calls == ["a.jpg", "b.jpg"]
+
+    def test_benchmark_command(self):
+        out = StringIO()
+        call_command("benchmark_media_urls", rows=10, repeat=1, stdout=out)
+        assert "media_url" in out.getvalue()
+
+
+class TestImageDerivatives:
+    @pytest.fixture
+    def storage(self, tmp_path, monkeypatch):
+        storage = FileSystemStorage(location=tmp_path, base_url="/media/")
+        monkeypatch.setattr(ProductImage._meta.get_field("image"), "storage", storage)
+        return storage
+
+    @pytest.fixture
+    def upload(self, product, storage, django_capture_on_commit_callbacks):
+        buffer = BytesIO()
+        Image.new("RGBA", (800, 600), "red").save(buffer, "PNG")
+        with django_capture_on_commit_callbacks(execute=True):
+            image = ProductImage.objects.create(
+                product=product, image=ContentFile(buffer.getvalue(), "photo.png")
+            )
+        image.refresh_from_db()
+        return image
+
+    def test_generated_on_upload(self, upload, storage):
+        derivatives = upload.image_derivatives
+        assert derivatives["source"] == upload.image.name
+        assert (derivatives["width"], derivatives["height"]) == (800, 600)
+        assert [size["width"] for size in derivatives["sizes"]] == [160, 320, 640]
+        assert derivatives["sizes"][0]["height"] == 120
+        for size in derivatives["sizes"]:
+            with storage.open(size["webp"]) as webp, storage.open(size["jpeg"]) as jpeg:
+                assert Image.open(webp).format == "WEBP"
+                assert Image.open(jpeg).size == (size["width"], size["height"])
+
+        data = APIClient().get("/api/product/v1/list/").json()
+        assert "160w" in data["results"][0]["image_srcset"]["webp"]
+
+    def test_idempotent(self, upload, storage):
+        key = upload.image_derivatives["sizes"][0]["jpeg"]
+        modified = storage.get_modified_time(key)
+        generate_product_image_derivatives(upload.pk)
+        assert storage.get_modified_time(key) == modified
+
+    def test_backfill_command(self, upload):
+        ProductImage.objects.update(image_derivatives={})
+        call_command("generate_image_derivatives", workers=1, stdout=StringIO())
+        upload.refresh_from_db()
+        assert len(upload.image_derivatives["sizes"]) == 3
@@ -0,0 +1,144 @@
+import threading
+from decimal import Decimal
+
+import pytest
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from config.idempotency import REPLAYED_HEADER
+from config.idempotency import cache_keys
+from shopping.cart.models import Cart
+from shopping.cart.models import CartItem
+from shopping.order.management.commands.benchmark_order_create import order_payload
+from shopping.order.models import Order
+from shopping.product.models import Category
+from shopping.product.models import Product
+from shopping.product.models import ProductVariation
+from shopping.users.tests.factories import UserFactory
+
+ORDER_URL = "/api/order/v1/"
+
+
+@pytest.fixture
+def user(db):
+    return UserFactory()
+
+
+@pytest.fixture
+def client(user):
+    cache.clear()
+    client = APIClient()
+    client.force_authenticate(user)
+    return client
+
+
+@pytest.fixture
+def variations(user):
+    category = Category.objects.create(name="Shoes", slug="shoes")
+    product = Product.objects.create(
+        name="Runner",
+        slug="runner",
+        category=category,
+        vendor=user,
+        discounted_price=Decimal("10"),
+    )
+    return [
+        ProductVariation.objects.create(product=product, price_modifier=0, stock=5)
+        for _ in range(2)
+    ]
+
+
+def post_order(client, payload, key):
+    return client.post(ORDER_URL, payload, format="json", HTTP_IDEMPOTENCY_KEY=key)
+
+
+def test_retry_replays_without_queries(
+    client, variations, django_capture_on_commit_callbacks
+):
+    payload = order_payload(variations, 2)
+    with django_capture_on_commit_callbacks(execute=True):
+        first = post_order(client, payload, "retry-1")
+    assert first.status_code == 201
+
+    with CaptureQueriesContext(connection) as queries:
+        retry = post_order(client, payload, "retry-1")
+    # only the savepoint of the ATOMIC_REQUESTS wrapper
+    assert not [q for q in queries if "SAVEPOINT" not in q["sql"]]
+    assert retry.status_code == 201
+    assert retry.json() == first.json()
+    assert retry.headers[REPLAYED_HEADER] == "true"
+    assert Order.objects.count() == 1
+    assert [v.stock for v in ProductVariation.objects.order_by("pk")] == [4, 4]
+
+
+def test_key_reused_for_another_body(
+    client, variations, django_capture_on_commit_callbacks
+):
+    with django_capture_on_commit_callbacks(execute=True):
+        post_order(client, order_payload(variations, 1), "reused")
+    response = post_order(client, order_payload(variations, 2), "reused")
+    assert response.status_code == 422
+    assert Order.objects.count() == 1
+
+
+def test_keys_are_per_user(client, variations, django_capture_on_commit_callbacks):
+    payload = order_payload(variations, 1)
+    with django_capture_on_commit_callbacks(execute=True):
+        post_order(client, payload, "shared")
+    other = APIClient()
+    other.force_authenticate(UserFactory())
+    response = post_order(other, payload, "shared")
+    assert response.status_code == 201
+    assert REPLAYED_HEADER not in response.headers
+    assert Order.objects.count() == 2
+
+
+def test_errors_are_not_stored(client, variations):
+    payload = order_payload(variations, 1)
+    payload["items"][0]["quantity"] = 50
+    assert post_order(client, payload, "fails").status_code == 400
+    ProductVariation.objects.update(stock=100)
+    assert post_order(client, payload, "fails").status_code == 201
+
+
+def test_duplicate_waits_for_in_flight_request(
+    client, user, variations, settings, django_capture_on_commit_callbacks
+):
+    payload = order_payload(variations, 1)
+    with django_capture_on_commit_callbacks(execute=True):
+        first = post_order(client, payload, "in-flight")
+    # put the request back in flight: lock held, response not stored yet
+    entry_key, lock_key = cache_keys(user.pk, "in-flight")
+    entry = cache.get(entry_key)
+    cache.delete(entry_key)
+    cache.add(lock_key, "busy")
+    settings.IDEMPOTENCY_LOCK_WAIT = 0.2
+    assert post_order(client, payload, "in-flight").status_code == 409
+
+    threading.Timer(0.05, cache.set, (entry_key, entry)).start()
+    settings.IDEMPOTENCY_LOCK_WAIT = 2
+    retry = post_order(client, payload, "in-flight")
+    assert retry.status_code == 201
+    assert retry.json() == first.json()
+    assert Order.objects.count() == 1
+
+
+def test_cart_patch_applied_once(
+    client, user, variations, django_capture_on_commit_callbacks
+):
+    variation = variations[0]
+    cart = Cart.objects.create(user=user)
+    payload = {
+        "items": [
+            {"product": variation.product_id, "variation": variation.pk, "quantity": 2}
+        ]
+    }
+    for _ in range(3):
+        with django_capture_on_commit_callbacks(execute=True):
+            response = client.patch(
+                "/api/cart/", payload, format="json", HTTP_IDEMPOTENCY_KEY="cart-1"
+            )
+        assert response.status_code == 200
+    assert CartItem.objects.get(cart=cart).quantity == 2
@@ -0,0 +1,187 @@
+import datetime
+import decimal
+import importlib
+import inspect
+import uuid
+from io import BytesIO
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from rest_framework import serializers
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory
+from rest_framework.utils.serializer_helpers import ReturnDict
+
+from config.parsers import ORJSONParser
+from config.renderers import ORJSONRenderer
+from shopping.cart.models import Cart
+from shopping.cart.models import CartItem
+from shopping.crm.models import Company
+from shopping.crm.models import Contact
+from shopping.order.models import ArchivedOrder
+from shopping.order.models import Order
+from shopping.order.models import OrderItem
+from shopping.order.models import Payment
+from shopping.order.models import Refund
+from shopping.order.models import Shipping
+from shopping.product.models import AttributeType
+from shopping.product.models import AttributeValue
+from shopping.product.models import Category
+from shopping.product.models import Product
+from shopping.product.models import ProductAttribute
+from shopping.product.models import ProductVariation
+from shopping.product.models import Review
+from shopping.users.tests.factories import UserFactory
+
+SERIALIZER_MODULES = (
+    "shopping.cart.api.serializers",
+    "shopping.dashboard.api.serializers",
+    "shopping.order.api.serializers",
+    "shopping.product.api.serializers",
+    "shopping.users.api.serializers",
+)
+
+
+def assert_same_bytes(data, **context):
+    expected = JSONRenderer().render(data, "application/json", context)
+    assert ORJSONRenderer().render(data, "application/json", context) == expected
+
+
+@pytest.mark.parametrize(
+    "data",
+    [
+        {"price": decimal.Decimal("19.90"), "zero": decimal.Decimal("0.00")},
+        {"at": datetime.datetime(2024, 5, 1, 10, 30, 15, 123456, tzinfo=datetime.UTC)},
+        {"at": datetime.datetime(2024, 5, 1, 10, 30, 15), "day": datetime.date.today()},
+        {"time": datetime.time(8, 15, 30, 250000), "delta": datetime.timedelta(1)},
+        {"label": gettext_lazy("Shipped"), "id": uuid.uuid4()},
+        {
+            1: "int key",
+            "nested": ReturnDict({"list": [1, 2.5, None, True]}, serializer=None),
+        },
+        {"text": "ünïcode   line   separators"},
+        {"huge": 2**70},
+        [],
+        "plain",
+    ],
+)
+def test_render_matches_json_renderer(data):
+    assert_same_bytes(data)
+
+
+def test_render_none_and_indent():
+    assert ORJSONRenderer().render(None) == b""
+    assert_same_bytes({"a": [1, 2]}, indent=4)
+
+
+@pytest.fixture
+def shop(db):
+    """One row of every model the API serializers expose."""
+    user = UserFactory()
+    category = Category.objects.create(name="Shoes", slug="shoes")
+    product = Product.objects.create(
+        name="Runner",
+        slug="runner",
+        description="Running shoe",
+        discounted_price=decimal.Decimal("79.99"),
+        category=category,
+        vendor=user,
+    )
+    size = AttributeType.objects.create(name="Size", slug="size")
+    value = AttributeValue.objects.create(attribute_type=size, value="42", slug="42")
+    ProductAttribute.objects.create(product=product, attribute=value)
+    variation = ProductVariation.objects.create(
+        product=product, attribute=value, price_modifier=5, stock=3
+    )
+    Review.objects.create(product=product, user=user, rating=4, comment="Nice ✓")
+    order = Order.objects.create(
+        user=user,
+        order_number="ORD-1",
+        shipping_address="Street 1",
+        billing_address="Street 1",
+        phone="123",
+        created_at=timezone.now(),
+        total_amount=decimal.Decimal("84.99"),
+    )
+    item = OrderItem.objects.create(
+        order=order,
+        product=product,
+        variation=variation,
+        quantity=1,
+        price=decimal.Decimal("84.99"),
+    )
+    Payment.objects.create(order=order, amount=decimal.Decimal("84.99"))
+    Shipping.objects.create(
+        order=order, tracking_number="T1", estimated_delivery=datetime.date.today()
+    )
+    Refund.objects.create(
+        order=order, order_item=item, requested_by=user, amount=decimal.Decimal("10")
+    )
+    cart = Cart.objects.create(user=user)
+    CartItem.objects.create(cart=cart, product=product, variation=variation)
+    company = Company.objects.create(name="Acme")
+    Contact.objects.create(name="Sara", email="sara@example.com", company=company)
+    ArchivedOrder.objects.create(
+        id=order.pk + 1,
+        user=user,
+        order_number="ORD-0",
+        status=Order.OrderStatus.COMPLETED,
+        created_at=timezone.now(),
+        total_amount=decimal.Decimal("84.99"),
+        data={"items": [], "payments": [], "shipping": None, "refunds": []},
+    )
+
+
+def test_every_serializer_renders_the_same(shop):
+    request = APIRequestFactory().get("/")
+    checked = []
+    for module in map(importlib.import_module, SERIALIZER_MODULES):
+        for name, serializer_class in inspect.getmembers(module, inspect.isclass):
+            if (
+                not issubclass(serializer_class, serializers.ModelSerializer)
+                or serializer_class.__module__ != module.__name__
+            ):
+                continue
+            model = serializer_class.Meta.model
+            serializer = serializer_class(
+                model.objects.all(), many=True, context={"request": request}
+            )
+            assert serializer.data, name
+            assert_same_bytes(serializer.data)
+            checked.append(name)
+    assert "OrderSerializer" in checked and "ProductListSerializer" in checked
+
+
+@pytest.mark.parametrize(
+    ("body", "encoding"),
+    [
+        (b'{"price": "1.50", "qty": 2, "items": [1.5, null, true]}', "utf-8"),
+        ('{"name": "ünïcode"}'.encode("latin-1"), "latin-1"),
+        (b'{"huge": 123456789012345678901234567890}', "utf-8"),
+    ],
+)
+def test_parse_matches_json_parser(body, encoding):
+    context = {"encoding": encoding}
+    expected = JSONParser().parse(BytesIO(body), parser_context=context)
+    assert ORJSONParser().parse(BytesIO(body), parser_context=context) == expected
+
+
+@pytest.mark.parametrize("body", [b'{"a": ', b'{"a": NaN}'])
+def test_parse_errors_match_json_parser(body):
+    with pytest.raises(ParseError) as expected:
+        JSONParser().parse(BytesIO(body))
+    with pytest.raises(ParseError) as error:
+        ORJSONParser().parse(BytesIO(body))
+    assert str(error.value) == str(expected.value)
+
+
+def test_benchmark_command(shop):
+    out = StringIO()
+    call_command("benchmark_json_renderers", rows=5, repeat=1, stdout=out)
+    assert "product list (5 rows)" in out.getvalue()
+    assert "order list (5 rows)" in out.getvalue()